@@ -2,24 +2,37 @@ import os
 import logging
 import tempfile
 from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 import uvicorn
 import shutil
-import json
-import laspy
-import open3d as o3d
+import importlib
+import threading
+import time
 import numpy as np
 #from pointcloud_predictor import 
 import traceback
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional
-import torch
-from torch_geometric.data import Data
-from pointcloud_predictor import PointCloudHandler
+from pointcloud_predictor import PointCloudHandler, DEFAULT_LINE_THRESHOLDS, TOWER_METHODS
+from ground_filter import DEFAULT_GROUND_PARAMS
+from las_io import iter_las_chunks, las_point_count
+from job_queue import JobManager, QueueFullError
+from result_cache import ResultCache, make_cache_key
+from octree_tiles import DEFAULT_NODE_BUDGET, METADATA_NAME, OctreeTileWriter
+from range_response import file_response
+from metadata_store import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ReconstructionStore
+from metrics import REGISTRY, profile_job, stage
+from normal_orientation import NORMAL_ORIENTATIONS, orient_normals
+from resolution_planner import DEFAULT_MEMORY_BUDGET_MB, apply_plan, plan_resolution
+from spatial_tiles import MortonTiling
+from block_executor import run_blocks
 import uuid
+import hashlib
+import re
 
 # 配置日志
 logging.basicConfig(
@@ -28,8 +41,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
-processor = PointCloudHandler()
+# open3d、sklearn、laspy等重型库只在流水线首次用到时导入，服务启动时不加载
+HEAVY_MODULES = ("open3d", "sklearn.cluster", "sklearn.decomposition", "laspy")
+# 设置 POINTCLOUD_WARMUP=1 时，启动后在后台线程预先导入重型库并创建处理器，首个请求无需等待导入
+WARMUP_ON_STARTUP = os.environ.get("POINTCLOUD_WARMUP", "").lower() in ("1", "true", "yes")
+
+def env_int(name: str, default: int, minimum: int = 0) -> int:
+    """
+    读取整数型环境变量，未设置时返回默认值。
+    参数：
+        name (str): 环境变量名
+        default (int): 默认值
+        minimum (int): 允许的最小值
+    返回：
+        int: 配置值
+    异常：
+        ValueError: 不是整数或小于minimum
+    """
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"环境变量{name}应为整数: {value}")
+    if number < minimum:
+        raise ValueError(f"环境变量{name}不能小于{minimum}: {number}")
+    return number
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # 配置CORS
 app.add_middleware(
@@ -40,6 +86,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_stage(request: Request, call_next):
+    """
+    把每个请求记录为一个阶段（按路由模板命名，如 "api POST /predict"），计入 /metrics。
+    """
+    with stage("api") as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        span.name = f"api {request.method} {route.path}" if route is not None else "api unmatched"
+    return response
+
 # 创建临时目录
 TEMP_DIR = Path("temp")
 TEMP_DIR.mkdir(exist_ok=True)
@@ -49,19 +106,19 @@ logger.info(f"临时目录创建在: {TEMP_DIR.absolute()}")
 RESULTS_DIR = Path("results")
 RESULTS_DIR.mkdir(exist_ok=True)
 
-# 创建元数据文件
+# 重建结果目录（SQLite），首次启动时导入旧版JSON元数据
 METADATA_FILE = RESULTS_DIR / "reconstruction_metadata.json"
-if not METADATA_FILE.exists():
-    with open(METADATA_FILE, "w", encoding="utf-8") as f:
-        json.dump({"reconstructions": []}, f, ensure_ascii=False, indent=2)
+METADATA_DB = RESULTS_DIR / "reconstructions.db"
+metadata_store = ReconstructionStore(METADATA_DB)
+metadata_store.import_json(METADATA_FILE)
 
-# 创建预测器实例（单例模式）
-logger.info("正在初始化预测器...")
+# 预测器实例（单例模式，首次使用时创建）
 predictor = None
+_predictor_lock = threading.Lock()
 
 def get_predictor():
     """
-    获取全局唯一的点云预测器实例。
+    获取全局唯一的点云预测器实例，首次调用时创建（后台任务线程并发调用时只创建一次）。
     返回：
         PointCloudHandler: 预测器对象
     用法：
@@ -69,14 +126,138 @@ def get_predictor():
     """
     global predictor
     if predictor is None:
-        predictor = PointCloudHandler()
-        logger.info("预测器初始化完成")
+        with _predictor_lock:
+            if predictor is None:
+                predictor = PointCloudHandler()
+                logger.info("预测器初始化完成")
     return predictor
 
+def warm_up() -> dict:
+    """
+    预热：导入HEAVY_MODULES中的重型库并创建预测器。设置 POINTCLOUD_WARMUP=1 时在启动后自动执行。
+    返回：
+        dict: {模块名: 导入耗时（秒）}，已导入的模块耗时接近0
+    用法：
+        timings = warm_up()
+    """
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"预热导入{name}失败: {e}")
+            continue
+        timings[name] = round(time.perf_counter() - start, 3)
+    get_predictor()
+    logger.info(f"预热完成，导入耗时: {timings}")
+    return timings
+
 # 配置参数
 VOXEL_SIZE = 0.05  # 体素大小（米）
 DISTANCE_THRESHOLD = 0.5  # 距离阈值（米）
 TARGET_POINTS = 1000000  # 目标点数
+BLOCK_WORKERS = min(4, os.cpu_count() or 1)  # 分块并行处理的进程数
+TILE_OVERLAP_FACTOR = 4  # 分批重建时瓦片重叠区宽度 = voxel_size * 此系数（覆盖法向量估计半径 voxel_size*2）
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 上传文件每次写盘的字节数
+MAX_UPLOAD_SIZE = 8 * 1024 ** 3  # 上传文件大小上限（字节）
+JOB_WORKERS = env_int("POINTCLOUD_JOB_WORKERS", 2, minimum=1)  # 同时执行的后台任务数
+JOB_QUEUE_DEPTH = env_int("POINTCLOUD_JOB_QUEUE_DEPTH", 8)  # 最多排队等待的任务数，超出时提交返回503
+RESULT_CACHE_DIR = RESULTS_DIR / "cache"  # 电力线提取结果缓存目录
+RESULT_CACHE_MAX_BYTES = 20 * 1024 ** 3  # 结果缓存总大小上限（字节），超出按LRU淘汰
+PREDICT_OUTPUT_FORMATS = ("ply", "las", "laz")  # 电力线提取结果格式：ply为彩色电力线点云，las/laz为分类点云
+TILES_DIR = RESULTS_DIR / "tiles"  # 电力线提取结果的八叉树瓦片目录（每个结果一个子目录）
+TILE_NODE_BUDGET = DEFAULT_NODE_BUDGET  # 八叉树每个节点的点数上限
+TILE_FILE_PATTERN = re.compile(r"^(metadata\.json|r[0-7]*\.bin)$")
+
+PROFILE_SUFFIX = ".profile.json"  # 任务剖析报告与结果文件同名，使用此后缀
+
+def remove_result_tiles(cache_key: str):
+    """结果缓存条目被淘汰时删除对应的八叉树瓦片和剖析报告。"""
+    shutil.rmtree(TILES_DIR / cache_key, ignore_errors=True)
+    (RESULT_CACHE_DIR / f"{cache_key}{PROFILE_SUFFIX}").unlink(missing_ok=True)
+
+# 按输入内容和参数寻址的结果缓存
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES,
+                           suffix=tuple(f".{fmt}" for fmt in PREDICT_OUTPUT_FORMATS), on_evict=remove_result_tiles)
+
+# 后台任务队列：耗时的点云处理不在事件循环中执行
+job_manager = JobManager(max_workers=JOB_WORKERS, max_queued=JOB_QUEUE_DEPTH)
+
+def submit_job(kind, fn, *args, **kwargs):
+    """
+    提交后台任务，队列已满时返回503。
+    参数：
+        kind (str): 任务类型
+        fn (callable): 任务函数，需接受progress关键字参数
+    返回：
+        Job: 任务对象
+    用法：
+        job = submit_job("predict", run_predict, path, output_file)
+    """
+    try:
+        return job_manager.submit(kind, fn, *args, **kwargs)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def save_profile(prof, result_path: Path) -> Optional[dict]:
+    """
+    把任务剖析报告保存在结果文件旁（同名，后缀 .profile.json）。
+    参数：
+        prof (JobProfile|None): profile_job返回的剖析对象，未开启时为None
+        result_path (Path): 结果文件路径
+    返回：
+        dict|None: {"profile_file": 报告路径, "stages": 按阶段汇总}，未开启时为None
+    """
+    if prof is None:
+        return None
+    profile_path = prof.save(result_path.with_name(result_path.stem + PROFILE_SUFFIX))
+    return {"profile_file": str(profile_path), "stages": prof.summary()}
+
+# 各格式文件头的魔数
+FILE_SIGNATURES = {
+    '.las': b'LASF',
+    '.laz': b'LASF',
+    '.ply': b'ply',
+}
+
+async def save_upload_stream(file: UploadFile, dest_path, max_size: int = MAX_UPLOAD_SIZE, hasher=None) -> int:
+    """
+    按固定大小分块把上传文件写入磁盘，不在内存中缓存整个文件。
+    读到第一块时按扩展名校验文件头（LAS/LAZ为"LASF"，PLY为"ply"），超过大小上限立即中止。
+    失败时删除已写入的部分文件。
+    参数：
+        file (UploadFile): 上传的文件
+        dest_path (str|Path): 目标文件路径
+        max_size (int): 文件大小上限（字节）
+        hasher (hashlib对象|None): 指定时边写边更新内容摘要
+    返回：
+        int: 写入的字节数
+    用法：
+        size = await save_upload_stream(file, 'temp/xxx.las')
+    """
+    ext = os.path.splitext(file.filename or '')[1].lower()
+    signature = FILE_SIGNATURES.get(ext)
+    written = 0
+    try:
+        with open(dest_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if written == 0 and signature is not None and not chunk.startswith(signature):
+                    raise HTTPException(status_code=400, detail=f"文件头校验失败，不是有效的{ext[1:].upper()}文件")
+                written += len(chunk)
+                if written > max_size:
+                    raise HTTPException(status_code=413, detail=f"上传文件超过大小上限({max_size}字节)")
+                f.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.unlink(dest_path)
+        raise
+    return written
 
 def preprocess_point_cloud(points: np.ndarray) -> np.ndarray:
     """
@@ -88,6 +269,7 @@ def preprocess_point_cloud(points: np.ndarray) -> np.ndarray:
     用法：
         new_points = preprocess_point_cloud(points)
     """
+    import open3d as o3d
     # 创建Open3D点云对象
     pcd = o3d.geometry.PointCloud()
     pcd.points = o3d.utility.Vector3dVector(points)
@@ -127,19 +309,23 @@ def downsample_point_cloud(points: np.ndarray, target_points: int = TARGET_POINT
 
 def read_las_file(file_path: str) -> np.ndarray:
     """
-    读取LAS格式点云文件。
+    流式分块读取LAS格式点云文件。
     参数：
         file_path (str): LAS文件路径
     返回：
-        np.ndarray: 点云坐标 (N, 3)
+        np.ndarray: float32点云坐标 (N, 3)
     用法：
         points = read_las_file('xxx.las')
     """
     try:
-        with laspy.open(file_path) as f:
-            las = f.read()
-            points = np.vstack((las.x, las.y, las.z)).transpose()
-            return points
+        total = las_point_count(file_path)
+        points = np.empty((total, 3), dtype=np.float32)
+        filled = 0
+        for chunk_points, _, _ in iter_las_chunks(file_path, with_colors=False, with_intensity=False):
+            end = min(filled + len(chunk_points), total)
+            points[filled:end] = chunk_points[:end - filled]
+            filled = end
+        return points[:filled]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"读取LAS文件失败: {str(e)}")
 
@@ -163,94 +349,347 @@ async def health_check():
     logger.info("收到健康检查请求")
     return {"status": "ok"}
 
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+def predict_params(use_csf: bool, block_length: float, tower_method: str = "dbscan",
+                   output_format: str = "ply") -> dict:
     """
-    上传点云文件并提取电力线。
+    汇总影响电力线提取结果的参数，用于生成结果缓存键。
     参数：
-        file (UploadFile): 上传的点云文件（.las）
+        use_csf (bool): 是否使用CSF地面分离
+        block_length (float): 分块长度
+        tower_method (str): 电力塔检测方法（dbscan / grid）
+        output_format (str): 结果格式（ply / las / laz）
+    返回：
+        dict: 处理参数
+    异常：
+        HTTPException: 电力塔检测方法或结果格式不支持时返回400
+    """
+    if tower_method not in TOWER_METHODS:
+        raise HTTPException(status_code=400, detail=f"不支持的电力塔检测方法: {tower_method}，可选: {list(TOWER_METHODS)}")
+    if output_format not in PREDICT_OUTPUT_FORMATS:
+        raise HTTPException(status_code=400,
+                            detail=f"不支持的结果格式: {output_format}，可选: {list(PREDICT_OUTPUT_FORMATS)}")
+    return {
+        "pipeline": "extract_powerlines_csf_pca_blockwise",
+        "use_csf": bool(use_csf),
+        "block_length": float(block_length),
+        "line_thresholds": DEFAULT_LINE_THRESHOLDS,
+        "ground_params": DEFAULT_GROUND_PARAMS,
+        "tower_method": tower_method,
+        "output_format": output_format,
+    }
+
+def check_predict_input(filename: str, output_format: str):
+    """
+    校验上传文件能否生成指定格式的结果：las/laz分类点云按输入逐点写出分类，输入须为LAS/LAZ。
+    参数：
+        filename (str): 上传文件名（无扩展名的文件按LAS处理，见save_predict_upload）
+        output_format (str): 结果格式
+    异常：
+        HTTPException: 输入为PLY而结果格式为las/laz时返回400
+    """
+    if output_format != "ply" and os.path.splitext(filename)[1].lower() == ".ply":
+        raise HTTPException(status_code=400, detail=f"结果格式为{output_format}时输入文件须为LAS/LAZ")
+
+def result_download_url(result_file: Path) -> str:
+    """返回结果文件的下载地址（/reconstructions/{filename}，支持Range和条件请求）。"""
+    return f"/reconstructions/{result_file.name}"
+
+def orientation_params(normal_orientation: str, sensor: Optional[str]) -> dict:
+    """
+    校验重建接口的法向量定向参数。
+    参数：
+        normal_orientation (str): 定向方法，tangent_plane / up / sensor / voxel
+        sensor (str|None): 传感器位置 "x,y,z"，normal_orientation为sensor时必填
+    返回：
+        dict: {"orientation": 方法, "sensor": [x, y, z]|None}，可直接作为重建函数的关键字参数
+    """
+    if normal_orientation not in NORMAL_ORIENTATIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"不支持的法向量定向方法: {normal_orientation}，可选: {list(NORMAL_ORIENTATIONS)}")
+    position = None
+    if sensor is not None:
+        try:
+            position = [float(value) for value in sensor.split(",")]
+        except ValueError:
+            position = []
+        if len(position) != 3:
+            raise HTTPException(status_code=400, detail=f"传感器位置格式应为 x,y,z: {sensor}")
+    if normal_orientation == "sensor" and position is None:
+        raise HTTPException(status_code=400, detail="sensor定向方法需要sensor参数（x,y,z）")
+    return {"orientation": normal_orientation, "sensor": position}
+
+def resolution_budget(auto_resolution: bool, memory_budget_mb: Optional[float], time_budget_s: Optional[float],
+                      max_points: Optional[int] = None) -> Optional[dict]:
+    """
+    校验重建接口的自动分辨率参数。
+    参数：
+        auto_resolution (bool): 是否按预算自动选择Poisson深度和下采样
+        memory_budget_mb (float|None): 内存预算（MB），None表示不限
+        time_budget_s (float|None): 耗时预算（秒），None表示不限
+        max_points (int|None): 点数上限
+    返回：
+        dict|None: 预算 {"memory_mb", "seconds", "max_points"}，未开启自动分辨率时为None
+    """
+    if not auto_resolution:
+        return None
+    for name, value in (("memory_budget_mb", memory_budget_mb), ("time_budget_s", time_budget_s),
+                        ("max_points", max_points)):
+        if value is not None and value <= 0:
+            raise HTTPException(status_code=400, detail=f"{name}必须大于0: {value}")
+    return {"memory_mb": memory_budget_mb, "seconds": time_budget_s, "max_points": max_points}
+
+def result_tiles_info(cache_key: str) -> Optional[dict]:
+    """
+    返回结果八叉树瓦片的访问信息，供前端 PointCloudViewer 按节点加载。
+    参数：
+        cache_key (str): 结果缓存键
+    返回：
+        dict|None: {"metadata_path": ...}，瓦片不存在时为None
+    """
+    if not (TILES_DIR / cache_key / METADATA_NAME).exists():
+        return None
+    return {"metadata_path": f"/tiles/{cache_key}/{METADATA_NAME}", "node_budget": TILE_NODE_BUDGET}
+
+def build_result_tiles(result_file: Path, cache_key: str) -> Optional[dict]:
+    """
+    由电力线提取结果流式构建多分辨率八叉树瓦片。构建失败只记录日志，不影响结果文件。
+    参数：
+        result_file (Path): 结果点云文件
+        cache_key (str): 结果缓存键，瓦片保存在 TILES_DIR/cache_key
+    返回：
+        dict|None: 同result_tiles_info
+    """
+    try:
+        handler = get_predictor()
+        writer = OctreeTileWriter(TILES_DIR / cache_key, node_budget=TILE_NODE_BUDGET)
+        # 分块以局部坐标（float64相减后再转float32）读入，瓦片offset再加回原点
+        origin = handler.point_cloud_origin(result_file)
+        writer.build(lambda: handler.iter_point_chunks(result_file, origin=origin), origin=origin)
+        return result_tiles_info(cache_key)
+    except Exception as e:
+        logger.error(f"生成八叉树瓦片失败: {str(e)}")
+        shutil.rmtree(TILES_DIR / cache_key, ignore_errors=True)
+        return None
+
+def cached_predict_result(cache_key: str, original_filename: str, output_format: str = "ply") -> Optional[dict]:
+    """
+    查询电力线提取结果缓存。
+    参数：
+        cache_key (str): 缓存键
+        original_filename (str): 原始文件名
+        output_format (str): 结果格式，决定缓存条目的后缀
+    返回：
+        dict|None: 命中时返回结果信息，否则为None
+    """
+    cached = result_cache.get(cache_key, f".{output_format}")
+    if cached is None:
+        return None
+    return {
+        'result_file': str(cached),
+        'download_url': result_download_url(cached),
+        'original_filename': original_filename,
+        'potree_data': result_tiles_info(cache_key),
+        'cached': True,
+        'message': '命中结果缓存，直接返回已有结果',
+    }
+
+def run_predict(input_path: str, cache_key: str, params: dict, original_filename: str, progress=None,
+                profile: bool = False) -> dict:
+    """
+    电力线提取任务：结果写入结果缓存，处理完成后删除输入临时文件。
+    params["output_format"]为las/laz时写出分类点云（保留全部点和属性），否则写出彩色电力线点云。
+    参数：
+        input_path (str): 输入点云临时文件路径
+        cache_key (str): 结果缓存键（输入内容和参数的哈希）
+        params (dict): predict_params生成的处理参数
+        original_filename (str): 原始文件名
+        progress (callable|None): 进度回调 progress(已完成块数, 总块数)
+        profile (bool): 是否生成剖析报告（各阶段耗时、点数和峰值内存），保存在结果文件旁
     返回：
         dict: 结果文件路径和处理信息
     """
-    temp_file_path = None
+    suffix = f".{params.get('output_format', 'ply')}"
+    output_file = TEMP_DIR / f"predict_{uuid.uuid4().hex}{suffix}"
     try:
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.las') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        # 生成输出文件名
-        base_name = Path(file.filename).stem
-        output_file = RESULTS_DIR / f"{base_name}_预测.ply"
-        # 处理点云数据
         handler = get_predictor()
-        handler.extract_powerlines_csf_pca_blockwise(temp_file_path, output_file, use_csf=False, block_length=200)
-        # 返回结果文件路径和状态
+        with profile_job(profile) as prof:
+            handler.extract_powerlines_csf_pca_blockwise(input_path, str(output_file), use_csf=params["use_csf"],
+                                                         block_length=params["block_length"], workers=BLOCK_WORKERS,
+                                                         progress_callback=progress,
+                                                         line_thresholds=params["line_thresholds"],
+                                                         ground_params=params["ground_params"],
+                                                         tower_method=params["tower_method"])
+            if not output_file.exists():
+                return {
+                    'result_file': None,
+                    'original_filename': original_filename,
+                    'cached': False,
+                    'message': '未检测到有效点，未生成结果文件',
+                }
+            # 按内容哈希命名，不同文件同名上传不会互相覆盖
+            result_file = result_cache.put(cache_key, output_file, suffix)
+            with stage("tiles"):
+                potree_data = build_result_tiles(result_file, cache_key)
         return {
-            'result_file': str(output_file),
+            'result_file': str(result_file),
+            'download_url': result_download_url(result_file),
+            'original_filename': original_filename,
+            'potree_data': potree_data,
+            'profile': save_profile(prof, result_file),
+            'cached': False,
             'message': '点云电力线提取完成，结果已保存',
         }
+    finally:
+        # 清理临时文件
+        if input_path and os.path.exists(input_path):
+            os.unlink(input_path)
+        if output_file.exists():
+            output_file.unlink()
+
+async def save_predict_upload(file: UploadFile):
+    """
+    流式保存上传的点云文件，同时计算内容摘要。
+    参数：
+        file (UploadFile): 上传的点云文件
+    返回：
+        tuple: (临时文件路径, 内容sha256摘要)
+    """
+    # 创建临时文件
+    ext = os.path.splitext(file.filename)[1].lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=ext if ext in FILE_SIGNATURES else '.las') as temp_file:
+        temp_file_path = temp_file.name
+    hasher = hashlib.sha256()
+    await save_upload_stream(file, temp_file_path, hasher=hasher)
+    return temp_file_path, hasher.hexdigest()
+
+@app.post("/predict")
+async def predict(file: UploadFile = File(...), use_csf: bool = False, block_length: float = 200,
+                  tower_method: str = "dbscan", output_format: str = "ply", profile: bool = False):
+    """
+    上传点云文件并提取电力线。相同文件和参数直接返回缓存结果；
+    否则在后台任务池中处理，不阻塞其他请求。
+    参数：
+        file (UploadFile): 上传的点云文件（.las）
+        use_csf (bool): 是否使用CSF地面分离
+        block_length (float): 分块长度
+        tower_method (str): 电力塔检测方法，dbscan 或 grid（柱状格网检测，线性时间、结果确定）
+        output_format (str): 结果格式：ply（默认，彩色电力线点云）、las/laz（分类点云，
+            保留全部点和原有属性，classification为 地面2、电力线14、电力塔15、离群点7、其余1；输入须为LAS/LAZ）
+        profile (bool): 是否生成剖析报告（命中缓存时不重新处理，也不生成报告）
+    返回：
+        dict: 结果文件路径、下载地址（download_url）和处理信息
+    """
+    temp_file_path = None
+    try:
+        params = predict_params(use_csf, block_length, tower_method, output_format)
+        check_predict_input(file.filename, output_format)
+        temp_file_path, digest = await save_predict_upload(file)
+        cache_key = make_cache_key(digest, params)
+        cached = cached_predict_result(cache_key, file.filename, output_format)
+        if cached is not None:
+            return cached
+        job = submit_job("predict", run_predict, temp_file_path, cache_key, params, file.filename, profile=profile)
+        temp_file_path = None
+        return await asyncio.wrap_future(job.future)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        # 清理临时文件
+        # 缓存命中或任务未提交成功时清理临时文件
         if temp_file_path and os.path.exists(temp_file_path):
             os.unlink(temp_file_path)
 
-@app.post("/reconstruct")
-async def reconstruct(
-    file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
-):
+def run_reconstruct(input_path: str, output_path: str, progress=None, orientation: str = "tangent_plane",
+                    sensor: Optional[list] = None, budget: Optional[dict] = None) -> str:
     """
-    上传点云文件（ply/las），重建为三角网格并返回下载。
+    网格重建任务：处理完成后删除输入文件。
+    参数：
+        input_path (str): 输入点云文件路径
+        output_path (str): 输出网格文件路径
+        progress (callable|None): 进度回调
+        orientation (str): 法向量定向方法
+        sensor (list|None): 传感器位置 [x, y, z]
+        budget (dict|None): 自动分辨率预算，见resolution_budget
+    返回：
+        str: 输出网格文件路径
+    """
+    try:
+        handler = get_predictor()
+        if progress is not None:
+            progress(0, 1)
+        mesh, _ = handler.reconstruct_mesh(input_path, output_path, orientation=orientation, sensor=sensor,
+                                           budget=budget)
+        logger.info(f"网格重建完成，已保存到: {output_path}")
+        if progress is not None:
+            progress(1, 1)
+        return output_path
+    finally:
+        # 只删除输入文件
+        if os.path.exists(input_path):
+            os.remove(input_path)
+
+async def save_reconstruct_upload(file: UploadFile) -> str:
+    """
+    用uuid生成唯一文件名保存上传的点云文件，防止冲突和安全问题。
     参数：
         file (UploadFile): 上传的点云文件
-        background_tasks (BackgroundTasks): FastAPI后台任务
     返回：
-        FileResponse: 下载重建网格文件
+        str: 保存后的文件路径
     """
-    handler = get_predictor()
     temp_dir = os.path.join(os.path.dirname(__file__), "temp")
     os.makedirs(temp_dir, exist_ok=True)
-    # 用uuid生成唯一文件名，防止冲突和安全问题
     ext = os.path.splitext(file.filename)[-1].lower()
     input_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}{ext}")
-    output_path = os.path.join(temp_dir, f"reconstructed_{uuid.uuid4().hex}.ply")
+    await save_upload_stream(file, input_path)
+    logger.info(f"文件已保存到: {input_path}")
+    return input_path
+
+@app.post("/reconstruct")
+async def reconstruct(
+    file: UploadFile = File(...),
+    compress: bool = False,
+    normal_orientation: str = "tangent_plane",
+    sensor: Optional[str] = None,
+    auto_resolution: bool = False,
+    memory_budget_mb: Optional[float] = DEFAULT_MEMORY_BUDGET_MB,
+    time_budget_s: Optional[float] = None
+):
+    """
+    上传点云文件（ply/las），重建为三角网格。网格保存在结果目录，返回其下载地址
+    /reconstructions/{filename}，可用Range断点续传或重复下载（不再在第一次响应后删除）；
+    compress=True时下载地址带上compress参数，客户端接受gzip时即时压缩。
+    参数：
+        file (UploadFile): 上传的点云文件
+        compress (bool): 是否允许gzip压缩传输
+        normal_orientation (str): 法向量定向方法：tangent_plane（默认）、up、sensor、voxel；
+            机载数据用up/sensor/voxel远快于tangent_plane
+        sensor (str|None): 传感器位置 "x,y,z"，normal_orientation=sensor时必填
+        auto_resolution (bool): 按点数、范围和点间距自动选择Poisson深度和下采样（替代固定depth=9）
+        memory_budget_mb (float|None): 自动分辨率的内存预算（MB）
+        time_budget_s (float|None): 自动分辨率的耗时预算（秒）
+    返回：
+        dict: 结果文件名（filename）、路径（result_file）和下载地址（download_url）
+    """
     try:
-        # 保存上传的文件
-        content = await file.read()
-        with open(input_path, "wb") as f:
-            f.write(content)
-        logger.info(f"文件已保存到: {input_path}")
-        # 调用 handler 进行重建
-        mesh, _ = handler.reconstruct_mesh(input_path, output_path)
-        logger.info(f"网格重建完成，已保存到: {output_path}")
-        # 下载完成后自动删除输出文件
-        if background_tasks is not None:
-            background_tasks.add_task(os.remove, output_path)
-        # 只删除输入文件
-        if os.path.exists(input_path):
+        orientation = orientation_params(normal_orientation, sensor)
+        budget = resolution_budget(auto_resolution, memory_budget_mb, time_budget_s)
+        input_path = await save_reconstruct_upload(file)
+        try:
+            job = submit_job("reconstruct", run_reconstruct_to_results, input_path, uuid.uuid4().hex, budget=budget,
+                             **orientation)
+        except HTTPException:
             os.remove(input_path)
-        return FileResponse(
-            output_path,
-            media_type="application/octet-stream",
-            filename=os.path.basename(output_path)
-        )
+            raise
+        result = await asyncio.wrap_future(job.future)
+        download_url = f"/reconstructions/{result['filename']}" + ("?compress=true" if compress else "")
+        return {"message": "重建完成", **result, "download_url": download_url}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"重建过程出错: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/reconstructions")
-async def get_reconstructions():
-    """
-    获取重建结果列表（未实现）。
-    返回：
-        list: 重建结果列表
-    """
-    # 这里可以添加获取重建结果列表的逻辑
-    return []
-
 def save_reconstruction_result(file_path: Path, original_filename: str) -> dict:
     """
     保存重建结果文件并记录元数据。
@@ -274,6 +713,7 @@ def save_reconstruction_result(file_path: Path, original_filename: str) -> dict:
         shutil.copy2(file_path, result_path)
         
         # 读取点云数据以获取点数
+        import open3d as o3d
         pcd = o3d.io.read_point_cloud(str(file_path))
         point_count = len(pcd.points)
         
@@ -287,13 +727,7 @@ def save_reconstruction_result(file_path: Path, original_filename: str) -> dict:
             "file_path": str(result_path)
         }
         
-        # 更新元数据文件
-        with open(METADATA_FILE, "r+", encoding="utf-8") as f:
-            data = json.load(f)
-            data["reconstructions"].append(metadata)
-            f.seek(0)
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            f.truncate()
+        metadata_store.add(metadata)
         
         logger.info(f"重建结果已保存: {result_filename}")
         return metadata
@@ -302,53 +736,45 @@ def save_reconstruction_result(file_path: Path, original_filename: str) -> dict:
         logger.error(f"保存重建结果失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"保存重建结果失败: {str(e)}")
 
-def process_point_cloud_batch(points: np.ndarray, batch_size: int = 100000) -> List[np.ndarray]:
+def merge_point_arrays(parts: List[tuple]) -> "o3d.geometry.PointCloud":
     """
-    将点云数据分批处理。
+    把各瓦片的点和法向量一次性合并为一个点云，结果数组预先分配，不逐个拼接点云对象。
     参数：
-        points (np.ndarray): 输入点云 (N, 3)
-        batch_size (int): 每批点数
-    返回：
-        List[np.ndarray]: 分批后的点云列表
-    用法：
-        batches = process_point_cloud_batch(points, 100000)
-    """
-    num_points = len(points)
-    batches = []
-    for i in range(0, num_points, batch_size):
-        end_idx = min(i + batch_size, num_points)
-        batches.append(points[i:end_idx])
-    return batches
-
-def merge_point_clouds(pcd_list: List[o3d.geometry.PointCloud]) -> o3d.geometry.PointCloud:
-    """
-    合并多个点云对象为一个。
-    参数：
-        pcd_list (List[PointCloud]): 点云对象列表
+        parts (List[tuple]): [(points (n, 3), normals (n, 3)), ...]
     返回：
         PointCloud: 合并后的点云
     用法：
-        merged = merge_point_clouds([pcd1, pcd2])
+        merged = merge_point_arrays([(points1, normals1), (points2, normals2)])
     """
-    if not pcd_list:
-        return o3d.geometry.PointCloud()
-    
-    merged_pcd = pcd_list[0]
-    for pcd in pcd_list[1:]:
-        merged_pcd += pcd
+    import open3d as o3d
+    total = sum(len(points) for points, _ in parts)
+    points = np.empty((total, 3), dtype=np.float64)
+    normals = np.empty((total, 3), dtype=np.float64)
+    offset = 0
+    for part_points, part_normals in parts:
+        points[offset:offset + len(part_points)] = part_points
+        normals[offset:offset + len(part_points)] = part_normals
+        offset += len(part_points)
+    merged_pcd = o3d.geometry.PointCloud()
+    merged_pcd.points = o3d.utility.Vector3dVector(points)
+    merged_pcd.normals = o3d.utility.Vector3dVector(normals)
     return merged_pcd
 
-def process_batch(pcd_batch: o3d.geometry.PointCloud, voxel_size: float) -> o3d.geometry.PointCloud:
+def process_batch(pcd_batch: "o3d.geometry.PointCloud", voxel_size: float, orientation: str = "tangent_plane",
+                  sensor: Optional[list] = None) -> "o3d.geometry.PointCloud":
     """
     对单个点云批次进行体素下采样和法线估计。
     参数：
         pcd_batch (PointCloud): 点云批次
         voxel_size (float): 体素大小
+        orientation (str): 法向量定向方法
+        sensor (list|None): 传感器位置 [x, y, z]
     返回：
         PointCloud: 处理后的点云
     用法：
         new_pcd = process_batch(pcd, 0.05)
     """
+    import open3d as o3d
     try:
         # 1. 体素下采样
         pcd_batch = pcd_batch.voxel_down_sample(voxel_size=voxel_size)
@@ -362,92 +788,126 @@ def process_batch(pcd_batch: o3d.geometry.PointCloud, voxel_size: float) -> o3d.
         )
         
         # 3. 法向量定向
-        pcd_batch.orient_normals_consistent_tangent_plane(50)
+        orient_normals(pcd_batch, orientation, k=50, sensor=sensor)
         
         return pcd_batch
     except Exception as e:
         logger.error(f"处理批次时出错: {str(e)}")
         return pcd_batch
 
-@app.post("/reconstruct_point_cloud")
-async def reconstruct_point_cloud(
-    file: UploadFile = File(...),
-    voxel_size: float = 0.05,
-    max_points: int = 1000000,
-    batch_size: int = 100000
-):
+def process_tile(idx: int, points: np.ndarray, tiling: MortonTiling, voxel_size: float,
+                 orientation: str = "tangent_plane", sensor: Optional[list] = None) -> tuple:
     """
-    上传PLY点云文件，分批重建为三角网格。
+    处理一个空间瓦片（含重叠点）：下采样、估计并定向法向量，只保留落在本瓦片Morton区间内的结果点，
+    重叠区的点只为边界处的邻域提供上下文。供run_blocks调用。
     参数：
-        file (UploadFile): 上传的PLY点云文件
+        idx (int): 瓦片序号
+        points (np.ndarray): 瓦片点云（核心点和重叠点）(n, 3)
+        tiling (MortonTiling): 瓦片划分
+        voxel_size (float): 体素大小
+        orientation (str): 法向量定向方法
+        sensor (list|None): 传感器位置 [x, y, z]
+    返回：
+        (points, normals): 本瓦片负责的点 (m, 3) 和法向量 (m, 3)
+    """
+    import open3d as o3d
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points)
+    with stage("normals_batch", len(points)) as span:
+        pcd = process_batch(pcd, voxel_size, orientation, sensor)
+        out_points = np.asarray(pcd.points)
+        out_normals = np.asarray(pcd.normals) if pcd.has_normals() else np.zeros_like(out_points)
+        owned = tiling.tile_of(out_points) == idx
+        span.set_output(int(owned.sum()))
+    return out_points[owned], out_normals[owned]
+
+def run_reconstruct_point_cloud(temp_input: Path, original_filename: str, voxel_size: float,
+                                max_points: int, batch_size: int, progress=None, profile: bool = False,
+                                **options) -> dict:
+    """
+    分批重建任务，profile=True时在结果网格旁保存剖析报告。参数见_run_reconstruct_point_cloud。
+    """
+    with profile_job(profile) as prof:
+        result = _run_reconstruct_point_cloud(temp_input, original_filename, voxel_size, max_points, batch_size,
+                                              progress, **options)
+    result["profile"] = save_profile(prof, RESULTS_DIR / result["filename"])
+    return result
+
+def _run_reconstruct_point_cloud(temp_input: Path, original_filename: str, voxel_size: float,
+                                 max_points: int, batch_size: int, progress=None, orientation: str = "tangent_plane",
+                                 sensor: Optional[list] = None, budget: Optional[dict] = None) -> dict:
+    """
+    分批重建任务：下采样、分批估计法线、Poisson重建并记录元数据，完成后删除输入临时文件。
+    参数：
+        temp_input (Path): 输入PLY临时文件路径
+        original_filename (str): 原始文件名
         voxel_size (float): 体素大小
         max_points (int): 最大点数
-        batch_size (int): 每批点数
+        batch_size (int): 每个空间瓦片的核心点数上限
+        progress (callable|None): 进度回调 progress(已完成瓦片数, 总瓦片数)
+        orientation (str): 法向量定向方法
+        sensor (list|None): 传感器位置 [x, y, z]
+        budget (dict|None): 自动分辨率预算，见resolution_budget；给出时由点云规划下采样、体素和Poisson深度，
+            替代超出max_points时按voxel_size*2下采样和固定深度8
     返回：
         dict: 重建结果信息
     """
+    import open3d as o3d
     try:
-        # 验证文件格式
-        if not file.filename.lower().endswith('.ply'):
-            raise HTTPException(status_code=400, detail="重建只支持PLY格式")
-        
-        # 保存上传的文件
-        temp_input = TEMP_DIR / f"input_{file.filename}"
-        with open(temp_input, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        if os.path.getsize(temp_input) == 0:
-            raise HTTPException(status_code=400, detail="上传的文件为空")
-        
-        logger.info(f"开始处理文件: {file.filename}")
+        logger.info(f"开始处理文件: {original_filename}")
         
         # 读取点云
-        pcd = o3d.io.read_point_cloud(str(temp_input))
+        with stage("read") as span:
+            pcd = o3d.io.read_point_cloud(str(temp_input))
+            span.set_output(len(pcd.points))
         if len(pcd.points) == 0:
             raise HTTPException(status_code=400, detail="点云数据为空")
         
-        # 检查点云大小
-        if len(pcd.points) > max_points:
+        depth = 8
+        if budget is not None:
+            # 按预算规划分辨率
+            with stage("plan_resolution", len(pcd.points)) as span:
+                plan = plan_resolution(np.asarray(pcd.points), **budget)
+                pcd = apply_plan(pcd, plan)
+                span.set_output(len(pcd.points))
+            depth = plan["depth"]
+            voxel_size = plan["voxel_size"] or plan["spacing"]
+        elif len(pcd.points) > max_points:
+            # 检查点云大小
             logger.warning(f"点云点数({len(pcd.points)})超过限制({max_points})，进行下采样")
             pcd = pcd.voxel_down_sample(voxel_size=voxel_size * 2)
         
         # 将点云转换为numpy数组
         points = np.asarray(pcd.points)
         
-        # 分批处理点云
+        # 按Morton序划分空间瓦片（带重叠区），并行估计法向量
         logger.info(f"开始分批处理点云，总点数: {len(points)}")
-        batches = process_point_cloud_batch(points, batch_size)
-        processed_batches = []
-        
-        for i, batch_points in enumerate(batches):
-            logger.info(f"处理第 {i+1}/{len(batches)} 批，点数: {len(batch_points)}")
-            
-            # 创建点云对象
-            batch_pcd = o3d.geometry.PointCloud()
-            batch_pcd.points = o3d.utility.Vector3dVector(batch_points)
-            
-            # 处理批次
-            processed_batch = process_batch(batch_pcd, voxel_size)
-            processed_batches.append(processed_batch)
-            
-            # 清理内存
-            del batch_pcd
-            torch.cuda.empty_cache()
+        with stage("split", len(points)):
+            tiling = MortonTiling(points, batch_size)
+            tiles = tiling.tiles(points, overlap=voxel_size * TILE_OVERLAP_FACTOR)
+        del pcd, points
+        logger.info(f"空间瓦片数: {len(tiles)}")
+        processed_tiles = run_blocks(process_tile, tiles, workers=BLOCK_WORKERS,
+                                     args=(tiling, voxel_size, orientation, sensor), progress=progress)
+        del tiles
         
         # 合并处理后的点云
         logger.info("合并处理后的点云...")
-        merged_pcd = merge_point_clouds(processed_batches)
+        with stage("merge") as span:
+            merged_pcd = merge_point_arrays(processed_tiles)
+            span.set_output(len(merged_pcd.points))
         
         # Poisson重建
         logger.info("正在进行Poisson重建...")
-        mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
-            merged_pcd,
-            depth=8,
-            width=0,
-            scale=1.1,
-            linear_fit=False
-        )
+        with stage("poisson", len(merged_pcd.points)) as span:
+            mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
+                merged_pcd,
+                depth=depth,
+                width=0,
+                scale=1.1,
+                linear_fit=False
+            )
+            span.set_output(len(mesh.vertices))
         
         if mesh.is_empty():
             raise ValueError("重建结果为空")
@@ -458,15 +918,19 @@ async def reconstruct_point_cloud(
         
         # 网格优化
         logger.info("正在进行网格优化...")
-        mesh = mesh.filter_smooth_taubin(number_of_iterations=5)
+        with stage("smooth", len(mesh.vertices)):
+            mesh = mesh.filter_smooth_taubin(number_of_iterations=5)
         
         # 网格简化
         logger.info("正在进行网格简化...")
         target_triangles = len(mesh.triangles) // 4
-        mesh = mesh.simplify_quadric_decimation(target_number_of_triangles=target_triangles)
+        with stage("simplify", len(mesh.vertices)) as span:
+            mesh = mesh.simplify_quadric_decimation(target_number_of_triangles=target_triangles)
+            span.set_output(len(mesh.vertices))
         
         # 最终平滑
-        mesh = mesh.filter_smooth_taubin(number_of_iterations=3)
+        with stage("smooth", len(mesh.vertices)):
+            mesh = mesh.filter_smooth_taubin(number_of_iterations=3)
         
         # 保存结果
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -474,12 +938,13 @@ async def reconstruct_point_cloud(
         result_path = RESULTS_DIR / result_filename
         
         # 保存重建结果
-        o3d.io.write_triangle_mesh(str(result_path), mesh)
+        with stage("write", len(mesh.vertices)):
+            o3d.io.write_triangle_mesh(str(result_path), mesh)
         
         # 更新元数据
         metadata = {
             "filename": result_filename,
-            "original_filename": file.filename,
+            "original_filename": original_filename,
             "timestamp": timestamp,
             "point_count": len(merged_pcd.points),
             "triangle_count": len(mesh.triangles),
@@ -487,72 +952,302 @@ async def reconstruct_point_cloud(
             "file_path": str(result_path)
         }
         
-        # 读取现有元数据
-        if METADATA_FILE.exists():
-            with open(METADATA_FILE, "r", encoding="utf-8") as f:
-                metadata_dict = json.load(f)
-        else:
-            metadata_dict = {"reconstructions": []}
-        
-        # 添加新的元数据
-        metadata_dict["reconstructions"].append(metadata)
-        
-        # 保存更新后的元数据
-        with open(METADATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(metadata_dict, f, ensure_ascii=False, indent=2)
+        metadata_store.add(metadata)
         
         return {
             "message": "重建完成",
             "filename": result_filename,
             "point_count": len(merged_pcd.points),
-            "triangle_count": len(mesh.triangles)
+            "triangle_count": len(mesh.triangles),
+            "depth": depth
         }
-        
-    except Exception as e:
-        logger.error(f"重建失败: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
-        
     finally:
         # 清理临时文件
         if temp_input.exists():
             temp_input.unlink()
 
+async def save_point_cloud_upload(file: UploadFile) -> Path:
+    """
+    校验并保存/reconstruct_point_cloud上传的PLY文件。
+    参数：
+        file (UploadFile): 上传的PLY点云文件
+    返回：
+        Path: 临时文件路径
+    """
+    # 验证文件格式
+    if not file.filename.lower().endswith('.ply'):
+        raise HTTPException(status_code=400, detail="重建只支持PLY格式")
+
+    # 保存上传的文件，加uuid前缀避免并发任务同名冲突
+    temp_input = TEMP_DIR / f"input_{uuid.uuid4().hex}_{Path(file.filename).name}"
+    size = await save_upload_stream(file, temp_input)
+
+    if size == 0:
+        temp_input.unlink()
+        raise HTTPException(status_code=400, detail="上传的文件为空")
+    return temp_input
+
+@app.post("/reconstruct_point_cloud")
+async def reconstruct_point_cloud(
+    file: UploadFile = File(...),
+    voxel_size: float = 0.05,
+    max_points: int = 1000000,
+    batch_size: int = 100000,
+    profile: bool = False,
+    normal_orientation: str = "tangent_plane",
+    sensor: Optional[str] = None,
+    auto_resolution: bool = False,
+    memory_budget_mb: Optional[float] = DEFAULT_MEMORY_BUDGET_MB,
+    time_budget_s: Optional[float] = None
+):
+    """
+    上传PLY点云文件，分批重建为三角网格。处理在后台任务池中执行。
+    参数：
+        file (UploadFile): 上传的PLY点云文件
+        voxel_size (float): 体素大小
+        max_points (int): 最大点数
+        batch_size (int): 每个空间瓦片的核心点数上限
+        profile (bool): 是否在结果网格旁生成剖析报告
+        normal_orientation (str): 法向量定向方法：tangent_plane（默认）、up、sensor、voxel
+        sensor (str|None): 传感器位置 "x,y,z"，normal_orientation=sensor时必填
+        auto_resolution (bool): 按点数、范围和点间距自动选择Poisson深度、体素和点数目标，max_points作为上限
+        memory_budget_mb (float|None): 自动分辨率的内存预算（MB）
+        time_budget_s (float|None): 自动分辨率的耗时预算（秒）
+    返回：
+        dict: 重建结果信息
+    """
+    try:
+        orientation = orientation_params(normal_orientation, sensor)
+        budget = resolution_budget(auto_resolution, memory_budget_mb, time_budget_s, max_points)
+        temp_input = await save_point_cloud_upload(file)
+        job = submit_job("reconstruct_point_cloud", run_reconstruct_point_cloud, temp_input, file.filename,
+                         voxel_size, max_points, batch_size, profile=profile, budget=budget, **orientation)
+        return await asyncio.wrap_future(job.future)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"重建失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/jobs/predict", status_code=202)
+async def submit_predict_job(file: UploadFile = File(...), use_csf: bool = False, block_length: float = 200,
+                             tower_method: str = "dbscan", output_format: str = "ply", profile: bool = False):
+    """
+    提交电力线提取任务，立即返回任务ID，通过 /jobs/{job_id} 查询状态和进度。
+    命中结果缓存时不创建任务，直接返回结果。
+    参数：
+        file (UploadFile): 上传的点云文件（.las）
+        use_csf (bool): 是否使用CSF地面分离
+        block_length (float): 分块长度
+        tower_method (str): 电力塔检测方法，dbscan 或 grid
+        output_format (str): 结果格式，ply / las / laz，同 /predict
+        profile (bool): 是否生成剖析报告
+    返回：
+        dict: 任务状态
+    """
+    params = predict_params(use_csf, block_length, tower_method, output_format)
+    check_predict_input(file.filename, output_format)
+    temp_file_path, digest = await save_predict_upload(file)
+    cache_key = make_cache_key(digest, params)
+    cached = cached_predict_result(cache_key, file.filename, output_format)
+    if cached is not None:
+        os.unlink(temp_file_path)
+        return {"job_id": None, "kind": "predict", "status": "succeeded", "result": cached}
+    try:
+        job = submit_job("predict", run_predict, temp_file_path, cache_key, params, file.filename, profile=profile)
+    except HTTPException:
+        os.unlink(temp_file_path)
+        raise
+    return job.to_dict()
+
+def run_reconstruct_to_results(input_path: str, job_id: str, progress=None, **options) -> dict:
+    """
+    异步重建任务：结果网格保存到结果目录，可通过 /reconstructions/{filename} 下载。
+    参数：
+        input_path (str): 输入点云文件路径
+        job_id (str): 任务ID，用于生成结果文件名
+        progress (callable|None): 进度回调
+        **options: 法向量定向参数（见orientation_params）和自动分辨率预算budget
+    返回：
+        dict: 结果文件名和路径
+    """
+    filename = f"reconstructed_{job_id}.ply"
+    output_path = str(RESULTS_DIR / filename)
+    run_reconstruct(input_path, output_path, progress=progress, **options)
+    return {"filename": filename, "result_file": output_path}
+
+@app.post("/jobs/reconstruct", status_code=202)
+async def submit_reconstruct_job(file: UploadFile = File(...), normal_orientation: str = "tangent_plane",
+                                 sensor: Optional[str] = None, auto_resolution: bool = False,
+                                 memory_budget_mb: Optional[float] = DEFAULT_MEMORY_BUDGET_MB,
+                                 time_budget_s: Optional[float] = None):
+    """
+    提交网格重建任务，立即返回任务ID。
+    参数：
+        file (UploadFile): 上传的点云文件（ply/las）
+        normal_orientation (str): 法向量定向方法，同 /reconstruct
+        sensor (str|None): 传感器位置 "x,y,z"
+        auto_resolution (bool): 自动分辨率，同 /reconstruct
+        memory_budget_mb (float|None): 内存预算（MB）
+        time_budget_s (float|None): 耗时预算（秒）
+    返回：
+        dict: 任务状态
+    """
+    orientation = orientation_params(normal_orientation, sensor)
+    budget = resolution_budget(auto_resolution, memory_budget_mb, time_budget_s)
+    input_path = await save_reconstruct_upload(file)
+    job_id = uuid.uuid4().hex
+    try:
+        job = submit_job("reconstruct", run_reconstruct_to_results, input_path, job_id, budget=budget, **orientation)
+    except HTTPException:
+        os.remove(input_path)
+        raise
+    return job.to_dict()
+
+@app.post("/jobs/reconstruct_point_cloud", status_code=202)
+async def submit_reconstruct_point_cloud_job(
+    file: UploadFile = File(...),
+    voxel_size: float = 0.05,
+    max_points: int = 1000000,
+    batch_size: int = 100000,
+    profile: bool = False,
+    normal_orientation: str = "tangent_plane",
+    sensor: Optional[str] = None,
+    auto_resolution: bool = False,
+    memory_budget_mb: Optional[float] = DEFAULT_MEMORY_BUDGET_MB,
+    time_budget_s: Optional[float] = None
+):
+    """
+    提交PLY分批重建任务，立即返回任务ID。
+    参数：
+        file (UploadFile): 上传的PLY点云文件
+        voxel_size (float): 体素大小
+        max_points (int): 最大点数
+        batch_size (int): 每个空间瓦片的核心点数上限
+        profile (bool): 是否在结果网格旁生成剖析报告
+        normal_orientation (str): 法向量定向方法，同 /reconstruct_point_cloud
+        sensor (str|None): 传感器位置 "x,y,z"
+        auto_resolution (bool): 自动分辨率，同 /reconstruct_point_cloud
+        memory_budget_mb (float|None): 内存预算（MB）
+        time_budget_s (float|None): 耗时预算（秒）
+    返回：
+        dict: 任务状态
+    """
+    orientation = orientation_params(normal_orientation, sensor)
+    budget = resolution_budget(auto_resolution, memory_budget_mb, time_budget_s, max_points)
+    temp_input = await save_point_cloud_upload(file)
+    try:
+        job = submit_job("reconstruct_point_cloud", run_reconstruct_point_cloud, temp_input, file.filename,
+                         voxel_size, max_points, batch_size, profile=profile, budget=budget, **orientation)
+    except HTTPException:
+        temp_input.unlink()
+        raise
+    return job.to_dict()
+
+@app.get("/jobs")
+async def list_jobs():
+    """
+    获取所有任务的状态列表及队列占用情况。
+    返回：
+        dict: 任务列表和队列状态
+    """
+    return {"queue": job_manager.stats(), "jobs": job_manager.list()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    查询任务状态、进度（当前块/总块数）和结果位置。
+    参数：
+        job_id (str): 任务ID
+    返回：
+        dict: 任务状态
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_dict()
+
 @app.get("/reconstructions")
-async def list_reconstructions():
+async def list_reconstructions(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                               original_filename: Optional[str] = None, since: Optional[str] = None,
+                               until: Optional[str] = None):
     """
-    获取所有重建结果的列表。
+    按时间倒序分页获取重建结果列表。
+    参数：
+        limit (int): 每页条数（1~MAX_PAGE_SIZE）
+        cursor (str|None): 上一页返回的next_cursor
+        original_filename (str|None): 只列出该原始文件的结果
+        since (str|None): 时间戳下限（含），格式 %Y%m%d_%H%M%S
+        until (str|None): 时间戳上限（含）
     返回：
-        list: 重建结果元数据列表
+        dict: {"items": 重建结果元数据列表, "next_cursor": 下一页游标（没有更多时为null）}
     """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit须在1~{MAX_PAGE_SIZE}之间")
     try:
-        with open(METADATA_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data["reconstructions"]
+        items, next_cursor = metadata_store.list(limit=limit, cursor=cursor, original_filename=original_filename,
+                                                 since=since, until=until)
+        return {"items": items, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取重建结果列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取重建结果列表失败: {str(e)}")
 
-@app.get("/reconstructions/{filename}")
-async def get_reconstruction(filename: str):
+@app.api_route("/reconstructions/{filename}", methods=["GET", "HEAD"])
+async def get_reconstruction(filename: str, request: Request, compress: bool = False):
     """
-    下载指定的重建结果文件。
+    下载指定的重建结果文件或电力线提取结果（结果缓存中的文件，见 /predict 返回的download_url）。
+    支持Range断点续传和部分读取（206）、ETag/Last-Modified条件请求（304），
+    compress=True且客户端接受gzip时即时压缩。
     参数：
         filename (str): 文件名
+        request (Request): 当前请求
+        compress (bool): 是否允许gzip压缩传输（压缩时不支持Range）
     返回：
-        FileResponse: 文件下载响应
+        StreamingResponse: 文件下载响应
     """
     try:
         file_path = RESULTS_DIR / filename
-        if not file_path.exists():
+        if not file_path.is_file():
+            file_path = RESULT_CACHE_DIR / filename
+        if not file_path.is_file():
             raise HTTPException(status_code=404, detail="文件不存在")
-        return FileResponse(file_path, media_type="application/octet-stream", filename=filename)
+        return file_response(request, file_path, filename=filename, compress=compress)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"获取重建结果文件失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取重建结果文件失败: {str(e)}")
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus指标：各处理阶段和API请求的耗时、峰值内存直方图及点数计数器。
+    返回：
+        PlainTextResponse: Prometheus文本格式
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/tiles/{cache_key}/{filename}")
+async def get_result_tile(cache_key: str, filename: str):
+    """
+    获取电力线提取结果的八叉树瓦片（metadata.json 或节点文件）。
+    参数：
+        cache_key (str): 结果缓存键
+        filename (str): metadata.json 或 r*.bin
+    返回：
+        FileResponse: 文件响应
+    """
+    if not re.fullmatch(r"[0-9a-f]{64}", cache_key) or not TILE_FILE_PATTERN.match(filename):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    file_path = TILES_DIR / cache_key / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="文件不存在")
+    media_type = "application/json" if filename == METADATA_NAME else "application/octet-stream"
+    return FileResponse(file_path, media_type=media_type)
+
 if __name__ == "__main__":
     logger.info("启动服务器...")
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,365 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from las_io import CLASS_CONDUCTOR, CLASS_GROUND, CLASS_TOWER
+from metrics import RSS_SAMPLE_INTERVAL, rss_bytes
+from synthetic_corridor import make_corridor, write_corridor_las
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('read', 'split', 'towers_dbscan', 'towers_grid', 'extract', 'orient', 'reconstruct')  # 可选的测试阶段
+ACCURACY_CLASSES = {'ground': CLASS_GROUND, 'conductor': CLASS_CONDUCTOR, 'tower': CLASS_TOWER}
+STARTUP_HEAVY_MODULES = ('open3d', 'sklearn', 'laspy', 'torch', 'torch_geometric')  # 服务启动时不应加载的重型库
+
+def _child_pids(pid):
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+class PeakRSS:
+    """
+    测量一段代码执行期间的峰值常驻内存（本进程及其子进程，如分块并行的工作进程之和）。
+    Linux下后台线程按固定间隔读取 /proc；其他平台退化为进程生命周期内的 ru_maxrss（见metrics.rss_bytes）。
+    用法：
+        with PeakRSS() as rss:
+            run()
+        print(rss.peak_mb)
+    """
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._proc = os.path.exists(f"/proc/{os.getpid()}/statm")
+
+    def _sample(self):
+        pid = os.getpid()
+        return rss_bytes(pid) + sum(rss_bytes(child) for child in _child_pids(pid))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._sample())
+
+    def __enter__(self):
+        if self._proc:
+            self.peak = self._sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, self._sample())
+        else:
+            self.peak = rss_bytes()
+        return False
+
+    @property
+    def peak_mb(self):
+        return self.peak / 1024 ** 2
+
+def measure(stage, n_points, fn, *args, **kwargs):
+    """
+    执行一个阶段并记录墙钟时间、峰值内存和吞吐量。
+    参数：
+        stage (str): 阶段名
+        n_points (int): 阶段输入点数（用于计算吞吐量）
+        fn (callable): 阶段函数
+    返回：
+        result: fn的返回值
+        record (dict): {"stage", "points", "seconds", "points_per_s", "peak_rss_mb"}
+    """
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    record = {
+        "stage": stage,
+        "points": int(n_points),
+        "seconds": round(seconds, 4),
+        "points_per_s": round(n_points / seconds) if seconds > 0 else None,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+    }
+    logger.info(f"{stage}: {record['seconds']}s，{record['points_per_s']}点/秒，峰值内存{record['peak_rss_mb']}MB")
+    return result, record
+
+def label_accuracy(truth, predicted):
+    """
+    按类别计算精确率、召回率和F1。
+    参数：
+        truth (np.ndarray): 真值分类码 (N,)
+        predicted (np.ndarray): 预测分类码 (N,)
+    返回：
+        dict: {类别名: {"precision", "recall", "f1", "support"}}
+    """
+    report = {}
+    for name, code in ACCURACY_CLASSES.items():
+        actual = truth == code
+        found = predicted == code
+        hit = np.count_nonzero(actual & found)
+        precision = hit / found.sum() if found.any() else 0.0
+        recall = hit / actual.sum() if actual.any() else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+        report[name] = {"precision": round(float(precision), 4), "recall": round(float(recall), 4),
+                        "f1": round(float(f1), 4), "support": int(actual.sum())}
+    return report
+
+def cluster_accuracy(truth, clusters):
+    """
+    电力塔检测结果（点索引列表）相对真值的精确率和召回率。
+    参数：
+        truth (np.ndarray): 检测输入点的真值分类码 (n,)
+        clusters (list): fit_towers_* 返回的索引数组列表
+    返回：
+        dict: {"towers", "precision", "recall"}
+    """
+    predicted = np.zeros(len(truth), dtype=np.uint8)
+    for ind in clusters:
+        predicted[ind] = CLASS_TOWER
+    tower = label_accuracy(truth, predicted)["tower"]
+    return {"towers": len(clusters), "precision": tower["precision"], "recall": tower["recall"]}
+
+def orientation_accuracy(normals, truth):
+    """
+    以地面点（真实法向朝上）检查法向量定向结果。
+    参数：
+        normals (np.ndarray): 定向后的法向量 (N, 3)
+        truth (np.ndarray): 真值分类码 (N,)
+    返回：
+        dict: {"ground_up": 朝上的地面点比例, "ground_consistency": 与多数方向一致的比例（不计整体翻转）}
+    """
+    up = float(np.mean(normals[truth == CLASS_GROUND, 2] > 0))
+    return {"ground_up": round(up, 4), "ground_consistency": round(max(up, 1 - up), 4)}
+
+def run_case(handler, length, density_scale=1.0, seed=0, work_dir='temp/benchmark', stages=STAGES, workers=1,
+             block_length=200, recon_points=20000, recon_depth=8, orient_points=100000):
+    """
+    生成一组合成走廊数据并依次测试各阶段。
+    参数：
+        handler (PointCloudHandler): 处理器
+        length (float): 走廊长度（米）
+        density_scale (float): 点密度倍数
+        seed (int): 随机种子
+        work_dir (str): 临时文件目录
+        stages (tuple): 要测试的阶段，见STAGES
+        workers (int): 分块提取的进程数
+        block_length (float): 分块长度
+        recon_points (int): 重建测试使用的电力塔和导线点数上限
+        recon_depth (int): Poisson重建深度
+        orient_points (int): 法向量定向测试的点数上限
+    返回：
+        dict: {"length", "points", "stages": [...], "accuracy": {...}}
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    points, truth = make_corridor(length, density_scale=density_scale, seed=seed)
+    las_path = work_dir / f"corridor_{int(length)}_{density_scale:g}_{seed}.las"
+    write_corridor_las(las_path, points)
+    n = len(points)
+    case = {"length": length, "density_scale": density_scale, "points": n, "stages": [], "accuracy": {}}
+    logger.info(f"合成走廊: 长度{length}米，点数{n}")
+    if 'read' in stages or 'split' in stages:
+        loaded, record = measure('read', n, handler.read_point_cloud, str(las_path))
+        case["stages"].append(record)
+        if 'split' in stages:
+            _, record = measure('split', len(loaded[0]), handler.split_pointcloud_by_main_direction, loaded[0],
+                                block_length=block_length)
+            case["stages"].append(record)
+        del loaded
+    if 'read' in stages:
+        # 同一文件读为紧凑PointStore（局部原点float32、Morton排序），与read_point_cloud对比耗时和峰值内存
+        store, record = measure('read_store', n, handler.read_point_store, str(las_path))
+        case["stages"].append(record)
+        del store
+    # 电力塔检测的输入为真值非地面点，排除地面分离误差的影响
+    non_ground = np.flatnonzero(truth != CLASS_GROUND)
+    non_ground_points = points[non_ground].astype(np.float32)
+    for method in ('dbscan', 'grid'):
+        stage = f'towers_{method}'
+        if stage not in stages:
+            continue
+        fit_towers = getattr(handler, f'fit_towers_{method}')
+        clusters, record = measure(stage, len(non_ground), fit_towers, non_ground_points, return_indices=True)
+        case["stages"].append(record)
+        case["accuracy"][stage] = cluster_accuracy(truth[non_ground], clusters)
+    if 'extract' in stages:
+        import laspy
+        out_path = work_dir / f"{las_path.stem}_classified.las"
+        _, record = measure('extract', n, handler.extract_powerlines_csf_pca_blockwise, str(las_path), str(out_path),
+                            use_csf=False, block_length=block_length, workers=workers)
+        case["stages"].append(record)
+        if out_path.exists():
+            predicted = np.asarray(laspy.read(str(out_path)).classification)
+            case["accuracy"]["extract"] = label_accuracy(truth, predicted)
+        else:
+            logger.warning("提取流程未生成结果文件，跳过精度统计")
+    if 'orient' in stages:
+        import open3d as o3d
+        from normal_orientation import NORMAL_ORIENTATIONS, orient_normals
+        sample = np.arange(n)
+        if n > orient_points:
+            sample = np.sort(np.random.default_rng(seed).choice(n, orient_points, replace=False))
+        local = points[sample] - points[sample].mean(axis=0)
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(local)
+        pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=2.0, max_nn=30))
+        # 打乱法向符号，各方法从相同的无定向输入开始
+        raw = np.asarray(pcd.normals) * np.random.default_rng(seed).choice([-1.0, 1.0], len(sample))[:, None]
+        sensor = [0.0, 0.0, local[:, 2].max() + 1000.0]  # 机载：传感器在测区正上方
+        for method in NORMAL_ORIENTATIONS:
+            pcd.normals = o3d.utility.Vector3dVector(raw)
+            _, record = measure(f'orient_{method}', len(sample), orient_normals, pcd, method, sensor=sensor)
+            case["stages"].append(record)
+            case["accuracy"][f'orient_{method}'] = orientation_accuracy(np.asarray(pcd.normals), truth[sample])
+    if 'reconstruct' in stages:
+        import open3d as o3d
+        objects = np.flatnonzero((truth == CLASS_TOWER) | (truth == CLASS_CONDUCTOR))
+        if len(objects) > recon_points:
+            objects = np.random.default_rng(seed).choice(objects, recon_points, replace=False)
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(points[objects] - points[objects].min(axis=0))
+        ply_path = work_dir / f"{las_path.stem}_objects.ply"
+        o3d.io.write_point_cloud(str(ply_path), pcd)
+        _, record = measure('reconstruct', len(objects), handler.reconstruct_mesh, str(ply_path),
+                            str(work_dir / f"{las_path.stem}_mesh.ply"), depth=recon_depth)
+        case["stages"].append(record)
+    return case
+
+def _parse_importtime(stderr, module, top=10):
+    # -X importtime 输出 "import time: self [us] | cumulative | 包名"，包名缩进表示嵌套层级，
+    # 子模块先于父模块输出；取被测模块的直接依赖
+    imports, children = [], []
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                imports = children
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), int(fields[1]) / 1e6))
+    return [(name, round(seconds, 3)) for name, seconds in sorted(imports, key=lambda item: -item[1])[:top]]
+
+def measure_startup(module='api', repeat=3):
+    """
+    在全新的Python进程中计时导入module（默认api，即服务启动路径），并检查重型库是否被提前加载。
+    子进程在临时目录中运行，不会在当前目录创建temp/results等目录。
+    参数：
+        module (str): 被测模块
+        repeat (int): 重复次数，取最短耗时（排除磁盘缓存冷启动的影响）
+    返回：
+        dict: {"module", "seconds", "runs", "heavy_modules", "slowest_imports"}
+            heavy_modules为导入后已加载的STARTUP_HEAVY_MODULES，slowest_imports为耗时最多的直接依赖
+    用法：
+        report = measure_startup('api')
+    """
+    code = ("import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            f"import {module}\n"
+            "seconds = time.perf_counter() - start\n"
+            f"heavy = [name for name in {STARTUP_HEAVY_MODULES!r} if name in sys.modules]\n"
+            "print(json.dumps({'seconds': seconds, 'heavy': heavy}))")
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [source_dir, os.environ.get("PYTHONPATH")])))
+    runs, heavy, slowest = [], [], []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(max(1, repeat)):
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=work_dir, env=env,
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"导入{module}失败:\n{proc.stderr[-2000:]}")
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(round(result["seconds"], 3))
+            heavy = result["heavy"]
+            slowest = _parse_importtime(proc.stderr, module)
+    report = {"module": module, "seconds": min(runs), "runs": runs, "heavy_modules": heavy, "slowest_imports": slowest}
+    logger.info(f"导入{module}: {report['seconds']}s，已加载的重型库: {heavy or '无'}")
+    return report
+
+def format_startup_report(report):
+    """
+    把measure_startup的结果格式化为文本。
+    """
+    lines = [f"导入{report['module']}: {report['seconds']:.3f}s（{len(report['runs'])}次: {report['runs']}）",
+             f"已加载的重型库: {', '.join(report['heavy_modules']) or '无'}",
+             "耗时最多的直接依赖:"]
+    lines += [f"  {name:<32} {seconds:>7.3f}s" for name, seconds in report["slowest_imports"]]
+    return "\n".join(lines)
+
+def format_report(cases):
+    """
+    把测试结果格式化为文本表格。
+    参数：
+        cases (list): run_case的返回值列表
+    返回：
+        str: 表格文本
+    """
+    lines = [f"{'长度(m)':>8} {'点数':>10} {'阶段':<22} {'耗时(s)':>9} {'点/秒':>12} {'峰值内存(MB)':>12}"]
+    for case in cases:
+        for record in case["stages"]:
+            lines.append(f"{case['length']:>8g} {record['points']:>10} {record['stage']:<22} {record['seconds']:>9.3f} "
+                         f"{record['points_per_s'] or 0:>12} {record['peak_rss_mb']:>12.1f}")
+        for stage, accuracy in case["accuracy"].items():
+            lines.append(f"{'':>8} {'':>10} {stage:<22} 精度: {json.dumps(accuracy, ensure_ascii=False)}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="电力走廊点云处理性能测试（合成数据，含真值精度检查）")
+    parser.add_argument("--lengths", type=float, nargs="+", default=[500, 1000, 2000], help="走廊长度（米），每个长度一组测试")
+    parser.add_argument("--density", type=float, default=1.0, help="点密度倍数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="测试的阶段")
+    parser.add_argument("--workers", type=int, default=1, help="分块提取的进程数")
+    parser.add_argument("--block-length", type=float, default=200, help="分块长度")
+    parser.add_argument("--recon-points", type=int, default=20000, help="重建测试的点数上限")
+    parser.add_argument("--orient-points", type=int, default=100000, help="法向量定向测试的点数上限")
+    parser.add_argument("--work-dir", default="temp/benchmark", help="临时文件目录")
+    parser.add_argument("--output", help="结果JSON保存路径")
+    parser.add_argument("--verbose", action="store_true", help="输出处理流程日志")
+    parser.add_argument("--startup", action="store_true", help="只测试服务启动（导入api）耗时")
+    parser.add_argument("--startup-budget", type=float,
+                        help="启动耗时上限（秒）；超出或加载了重型库时以非零状态退出，用于发现导入回归")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if args.startup or args.startup_budget is not None:
+        report = measure_startup()
+        print(format_startup_report(report))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"startup": report}, f, ensure_ascii=False, indent=2)
+        if args.startup_budget is not None and (report["seconds"] > args.startup_budget or report["heavy_modules"]):
+            sys.exit(1)
+        return report
+    from pointcloud_predictor import PointCloudHandler
+    handler = PointCloudHandler()
+    cases = [run_case(handler, length, density_scale=args.density, seed=args.seed, work_dir=args.work_dir,
+                      stages=tuple(args.stages), workers=args.workers, block_length=args.block_length,
+                      recon_points=args.recon_points, orient_points=args.orient_points)
+             for length in args.lengths]
+    print(format_report(cases))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "density_scale": args.density, "cases": cases}, f, ensure_ascii=False,
+                      indent=2)
+    return cases
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_CACHE_MAX_BYTES = 10 * 1024 ** 3  # 分块缓存目录总大小上限（字节），超出按LRU淘汰整块
+
+def params_key(params):
+    """
+    把阶段参数压缩为短哈希，用作中间结果文件名的一部分。
+    参数：
+        params (dict|None): 阶段参数（需可JSON序列化）
+    返回：
+        str: 12位十六进制摘要
+    用法：
+        name = f"towers_{params_key({'eps': 3})}"
+    """
+    payload = json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+def array_digest(array):
+    """
+    计算数组内容（含形状和类型）的摘要。
+    参数：
+        array (np.ndarray): 输入数组
+    返回：
+        str: 32位十六进制摘要
+    """
+    array = np.ascontiguousarray(array)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.shape}{array.dtype}".encode("utf-8"))
+    digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+class BlockCache:
+    """
+    单个分块的中间结果缓存。目录按块点云内容寻址（cache_dir/<块内容摘要>/），
+    每个中间结果保存为一个 .npy 文件，读取时以内存映射方式打开。
+    分块方式不变时重新运行会得到相同的块，可直接复用地面分离、特征和电力塔簇等中间结果。
+    以块目录的修改时间作为最近访问时间，写入后缓存目录总大小超过max_bytes时按LRU淘汰最久未访问的块。
+    参数：
+        cache_dir (str|Path): 缓存根目录
+        block (np.ndarray): 块点云，用于计算目录名
+        max_bytes (int|None): 缓存目录总大小上限（字节），None表示不限
+    用法：
+        cache = BlockCache('temp/block_cache', block)
+        features = cache.load('features_k20')
+        if features is None:
+            features = compute(...)
+            cache.save('features_k20', features)
+    """
+    def __init__(self, cache_dir, block, max_bytes=DEFAULT_BLOCK_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.block_dir = self.cache_dir / array_digest(block)
+        self.max_bytes = max_bytes
+
+    def load(self, name):
+        """
+        读取中间结果，命中时刷新块的访问时间。
+        参数：
+            name (str): 结果名称
+        返回：
+            np.ndarray|None: 内存映射的只读数组，不存在时为None
+        """
+        path = self.block_dir / f"{name}.npy"
+        if not path.exists():
+            return None
+        array = np.load(path, mmap_mode="r")
+        self._touch()
+        return array
+
+    def save(self, name, array):
+        """
+        保存中间结果（先写临时文件再原子替换，并发写入同一块时不会读到半个文件），并按总大小淘汰旧块。
+        参数：
+            name (str): 结果名称
+            array (np.ndarray): 结果数组
+        """
+        self.block_dir.mkdir(parents=True, exist_ok=True)
+        path = self.block_dir / f"{name}.npy"
+        tmp_path = self.block_dir / f"{name}.{uuid.uuid4().hex}.tmp.npy"
+        np.save(tmp_path, np.asarray(array))
+        os.replace(tmp_path, path)
+        self._touch()
+        if self.max_bytes is not None:
+            self._evict()
+
+    def load_list(self, name):
+        """
+        读取save_list保存的数组列表。
+        参数：
+            name (str): 结果名称
+        返回：
+            list|None: 数组列表，不存在时为None
+        """
+        sizes = self.load(f"{name}_sizes")
+        data = self.load(name)
+        if sizes is None or data is None:
+            return None
+        return np.split(np.asarray(data), np.cumsum(sizes)[:-1]) if len(sizes) > 0 else []
+
+    def save_list(self, name, arrays, width=3, dtype=np.float32):
+        """
+        把行数不等的数组列表拼接后保存，另存每段长度。
+        参数：
+            name (str): 结果名称
+            arrays (list): (n_i, width) 数组列表
+            width (int): 列数，列表为空时使用
+            dtype (np.dtype): 列表为空时的类型
+        """
+        data = np.vstack(arrays) if arrays else np.empty((0, width), dtype=dtype)
+        self.save(name, data)
+        self.save(f"{name}_sizes", np.array([len(a) for a in arrays], dtype=np.int64))
+
+    def _touch(self):
+        try:
+            os.utime(self.block_dir)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if not entry.is_dir():
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+                size = sum(f.stat().st_size for f in entry.iterdir())
+            except FileNotFoundError:
+                # 其他进程正在淘汰该块
+                continue
+            entries.append((mtime, size, entry))
+        total = sum(size for _, size, _ in entries)
+        # 最久未访问的块先淘汰，当前块保留
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry == self.block_dir:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            logger.info(f"分块缓存淘汰: {entry.name}")
@@ -0,0 +1,145 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from metrics import capture_spans, replay_spans
+
+logger = logging.getLogger(__name__)
+
+def _run_shared_block(block_fn, fields, offset, count, idx, args):
+    """
+    子进程入口：从共享内存中取出一个块并调用处理函数。
+    参数：
+        block_fn (callable): 块处理函数，签名为 block_fn(idx, *block_fields, *args)
+        fields (list): 每个字段的 (共享内存名称, dtype, 行外形状)
+        offset (int): 块在共享数组中的起始行
+        count (int): 块的点数
+        idx (int): 块序号
+        args (tuple): 传给处理函数的其他参数
+    返回：
+        (result, spans): 处理函数的返回值和子进程内记录的阶段指标
+    """
+    block_fields = []
+    for shm_name, dtype, row_shape in fields:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            shared = np.ndarray((offset + count,) + tuple(row_shape), dtype=dtype, buffer=shm.buf)
+            # 复制到进程私有内存，避免结果中残留对共享内存的引用
+            block_fields.append(np.array(shared[offset:offset + count]))
+            del shared
+        finally:
+            shm.close()
+    with capture_spans() as spans:
+        result = block_fn(idx, *block_fields, *args)
+    return result, spans
+
+def _run_task(task_fn, idx, item, args):
+    """
+    子进程入口：调用任务函数并回传子进程内记录的阶段指标。
+    返回：
+        (result, spans)
+    """
+    with capture_spans() as spans:
+        result = task_fn(idx, item, *args)
+    return result, spans
+
+def _collect_results(futures, progress=None):
+    """
+    等待所有future完成，按完成数回调进度，并按提交顺序返回结果。
+    子进程回传的阶段指标计入当前进程（及当前线程上的任务剖析）。
+    参数：
+        futures (list): 按块顺序提交的future列表，每个结果为 (result, spans)
+        progress (callable|None): 进度回调 progress(已完成数, 总数)
+    返回：
+        results (list): 与futures一一对应的结果
+    """
+    for done, _ in enumerate(as_completed(futures), start=1):
+        if progress is not None:
+            progress(done, len(futures))
+    results = []
+    for future in futures:
+        result, spans = future.result()
+        replay_spans(spans)
+        results.append(result)
+    return results
+
+def _run_serial(fn, items, args, progress=None):
+    results = []
+    for idx, item in enumerate(items):
+        results.append(fn(idx, *item, *args))
+        if progress is not None:
+            progress(idx + 1, len(items))
+    return results
+
+def run_blocks(block_fn, blocks, workers=1, args=(), progress=None):
+    """
+    并行执行分块任务，结果顺序与输入块顺序一致。
+    workers>1 时所有块一次性写入共享内存，子进程按偏移读取，
+    不再对块数组做pickle序列化；workers<=1 时在当前进程中顺序执行。
+    参数：
+        block_fn (callable): 块处理函数，签名为 block_fn(idx, block, *args)，需可被pickle
+        blocks (list): 分块列表，每块为 (n, c) 数组，或行数相同的数组元组
+            （如 (points, core_mask)，此时按 block_fn(idx, points, core_mask, *args) 调用）
+        workers (int): 并行进程数
+        args (tuple): 传给处理函数的其他参数
+        progress (callable|None): 进度回调 progress(已完成块数, 总块数)
+    返回：
+        results (list): 每个块的处理结果，与blocks一一对应
+    用法：
+        results = run_blocks(handler._extract_block, blocks, workers=4, args=(True,))
+    """
+    block_fields = [block if isinstance(block, tuple) else (block,) for block in blocks]
+    if workers is None or workers <= 1 or len(blocks) <= 1:
+        return _run_serial(block_fn, block_fields, args, progress)
+
+    counts = [len(fields[0]) for fields in block_fields]
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(int)
+    total = int(sum(counts))
+    segments = []
+    try:
+        fields = []
+        for f in range(len(block_fields[0])):
+            dtype = np.result_type(*[item[f].dtype for item in block_fields])
+            row_shape = block_fields[0][f].shape[1:]
+            row_size = int(np.prod(row_shape, dtype=np.int64)) * dtype.itemsize
+            shm = shared_memory.SharedMemory(create=True, size=max(total * row_size, 1))
+            segments.append(shm)
+            shared = np.ndarray((total,) + row_shape, dtype=dtype, buffer=shm.buf)
+            for item, offset, count in zip(block_fields, offsets, counts):
+                shared[offset:offset + count] = item[f]
+            del shared
+            fields.append((shm.name, dtype.str, row_shape))
+        num_workers = min(workers, len(blocks))
+        logger.info(f"并行处理分块: 块数{len(blocks)}，进程数{num_workers}")
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(_run_shared_block, block_fn, fields, int(offset), int(count), idx, args)
+                for idx, (offset, count) in enumerate(zip(offsets, counts))
+            ]
+            return _collect_results(futures, progress)
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+def run_tasks(task_fn, items, workers=1, args=(), progress=None):
+    """
+    并行执行轻量参数的分块任务（如分块文件路径），结果顺序与输入顺序一致。
+    参数：
+        task_fn (callable): 任务函数，签名为 task_fn(idx, item, *args)，需可被pickle
+        items (list): 任务参数列表
+        workers (int): 并行进程数
+        args (tuple): 传给任务函数的其他参数
+        progress (callable|None): 进度回调 progress(已完成数, 总数)
+    返回：
+        results (list): 每个任务的结果，与items一一对应
+    用法：
+        results = run_tasks(handler._extract_block_file, block_paths, workers=4, args=(True,))
+    """
+    if workers is None or workers <= 1 or len(items) <= 1:
+        return _run_serial(task_fn, [(item,) for item in items], args, progress)
+    num_workers = min(workers, len(items))
+    logger.info(f"并行处理分块: 块数{len(items)}，进程数{num_workers}")
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_run_task, task_fn, idx, item, args) for idx, item in enumerate(items)]
+        return _collect_results(futures, progress)
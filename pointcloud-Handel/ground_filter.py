@@ -0,0 +1,124 @@
+import numpy as np
+from scipy import ndimage
+
+DEFAULT_GROUND_PARAMS = {'cell_size': 1.0, 'window': 9, 'height_threshold': 0.5}  # 栅格地面滤波参数
+
+class GroundFilter:
+    """
+    栅格地面滤波：按平面格网统计每格最低点高程，经空洞填充、形态学开运算（去除窄于window格的
+    植被、塔基等凸起）和平滑得到数字地面模型（DTM），点到DTM的高度不超过height_threshold为地面点。
+    全部计算为NumPy向量化操作；格网可用partial_fit逐块累积，适合流式读取的整幅点云。
+    参数：
+        cell_size (float): 格网边长（米）
+        window (int): 开运算窗口（格数），应大于需要去除的地物宽度
+        height_threshold (float): 地面点的最大离地高度（米）
+    用法：
+        ground_mask = GroundFilter().fit(points).ground_mask(points)
+
+        gf = GroundFilter(cell_size=2.0)
+        for points, _, _ in handler.iter_point_chunks(path):
+            gf.partial_fit(points)
+        for points, _, _ in handler.iter_point_chunks(path):
+            mask = gf.ground_mask(points)
+    """
+    def __init__(self, cell_size=1.0, window=9, height_threshold=0.5):
+        self.cell_size = float(cell_size)
+        self.window = int(window)
+        self.height_threshold = float(height_threshold)
+        self._origin = None  # 格网左下角的格号 (ix, iy)
+        self._zmin = None  # 每格最低高程，空格为inf
+        self._dtm = None
+
+    def _cells(self, points):
+        return np.floor(np.asarray(points[:, :2], dtype=np.float64) / self.cell_size).astype(np.int64)
+
+    def _grow(self, lo, hi):
+        # 扩展格网使其覆盖格号范围 [lo, hi]
+        if self._zmin is None:
+            self._origin = lo
+            self._zmin = np.full(tuple(hi - lo + 1), np.inf, dtype=np.float32)
+            return
+        new_lo = np.minimum(self._origin, lo)
+        new_hi = np.maximum(self._origin + np.array(self._zmin.shape) - 1, hi)
+        if (new_lo == self._origin).all() and (new_hi - new_lo + 1 == self._zmin.shape).all():
+            return
+        grown = np.full(tuple(new_hi - new_lo + 1), np.inf, dtype=np.float32)
+        offset = self._origin - new_lo
+        grown[offset[0]:offset[0] + self._zmin.shape[0], offset[1]:offset[1] + self._zmin.shape[1]] = self._zmin
+        self._origin, self._zmin = new_lo, grown
+
+    def partial_fit(self, points):
+        """
+        把一块点累积到最低高程格网中。
+        参数：
+            points (np.ndarray): 点云 (n, 3)
+        返回：
+            self
+        """
+        if len(points) == 0:
+            return self
+        cells = self._cells(points)
+        self._grow(cells.min(axis=0), cells.max(axis=0))
+        local = cells - self._origin
+        flat = local[:, 0] * self._zmin.shape[1] + local[:, 1]
+        np.minimum.at(self._zmin.reshape(-1), flat, np.asarray(points[:, 2], dtype=np.float32))
+        self._dtm = None
+        return self
+
+    def fit(self, points):
+        """
+        用一块点云建立DTM（清空已累积的格网）。
+        参数：
+            points (np.ndarray): 点云 (n, 3)
+        返回：
+            self
+        """
+        self._origin = self._zmin = self._dtm = None
+        return self.partial_fit(points)
+
+    @property
+    def dtm(self):
+        """
+        数字地面模型 (nx, ny)，按需由最低高程格网计算并缓存。
+        """
+        if self._dtm is None:
+            if self._zmin is None:
+                raise ValueError("地面滤波格网为空，请先调用fit或partial_fit")
+            empty = ~np.isfinite(self._zmin)
+            zmin = self._zmin
+            if empty.any():
+                # 空格取最近的非空格高程
+                _, nearest = ndimage.distance_transform_edt(empty, return_indices=True)
+                zmin = zmin[tuple(nearest)]
+            opened = ndimage.grey_opening(zmin, size=(self.window, self.window), mode='nearest')
+            self._dtm = ndimage.uniform_filter(opened.astype(np.float64), size=3, mode='nearest')
+        return self._dtm
+
+    def height_above_ground(self, points):
+        """
+        计算点到DTM的高度，DTM按格中心双线性插值（斜坡上比直接取所在格更准确）。
+        参数：
+            points (np.ndarray): 点云 (n, 3)，应位于已拟合的范围内（范围外按边缘格外推）
+        返回：
+            height (np.ndarray): 离地高度 (n,)
+        """
+        dtm = np.pad(self.dtm, 1, mode='edge')
+        # 以格中心为插值节点，填充的一圈边缘格使索引偏移1
+        f = np.asarray(points[:, :2], dtype=np.float64) / self.cell_size - self._origin - 0.5 + 1
+        i0 = np.clip(np.floor(f).astype(np.int64), 0, np.array(dtm.shape) - 2)
+        t = np.clip(f - i0, 0.0, 1.0)
+        ix, iy = i0[:, 0], i0[:, 1]
+        tx, ty = t[:, 0], t[:, 1]
+        ground = ((dtm[ix, iy] * (1 - tx) + dtm[ix + 1, iy] * tx) * (1 - ty) +
+                  (dtm[ix, iy + 1] * (1 - tx) + dtm[ix + 1, iy + 1] * tx) * ty)
+        return np.asarray(points[:, 2], dtype=np.float64) - ground
+
+    def ground_mask(self, points):
+        """
+        地面点掩码。
+        参数：
+            points (np.ndarray): 点云 (n, 3)
+        返回：
+            mask (np.ndarray): 离地高度不超过height_threshold的点 (n,)
+        """
+        return self.height_above_ground(points) <= self.height_threshold
@@ -0,0 +1,149 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """任务队列已满。"""
+
+class Job:
+    """
+    单个后台任务的状态记录。
+    属性：
+        job_id (str): 任务ID
+        kind (str): 任务类型，如 predict / reconstruct
+        status (str): queued / running / succeeded / failed
+        progress (dict): 当前进度 {"current": 已完成块数, "total": 总块数}
+        result (dict|None): 任务结果（含结果文件位置）
+        error (str|None): 失败原因
+    """
+    def __init__(self, kind):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress = {"current": 0, "total": 0}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def update_progress(self, current, total):
+        """
+        更新任务进度，作为进度回调传给处理流程。
+        参数：
+            current (int): 已完成块数
+            total (int): 总块数
+        """
+        self.progress = {"current": int(current), "total": int(total)}
+
+    def to_dict(self):
+        """
+        转为可JSON序列化的字典。
+        返回：
+            dict: 任务状态
+        """
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobManager:
+    """
+    有界后台任务队列：最多max_workers个任务并发执行，另有max_queued个任务排队，
+    超出时拒绝提交，保证负载下吞吐可预期。
+    用法：
+        manager = JobManager(max_workers=2, max_queued=8)
+        job = manager.submit("predict", run_predict, path, progress=...)
+        manager.get(job.job_id).to_dict()
+    """
+    def __init__(self, max_workers=2, max_queued=8, max_history=200):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """
+        提交任务。fn 会额外收到关键字参数 progress=job.update_progress。
+        参数：
+            kind (str): 任务类型
+            fn (callable): 任务函数，返回值作为任务结果
+        返回：
+            Job: 任务对象，job.future 可用于等待结果
+        异常：
+            QueueFullError: 执行中和排队中的任务总数已达上限
+        """
+        with self._lock:
+            if self._active >= self.max_workers + self.max_queued:
+                raise QueueFullError(f"任务队列已满（并发{self.max_workers}，排队{self.max_queued}）")
+            self._active += 1
+            job = Job(kind)
+            self._jobs[job.job_id] = job
+            self._trim_history()
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"任务已提交: {job.job_id}（{kind}）")
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = datetime.now().isoformat(timespec="seconds")
+        try:
+            job.result = fn(*args, progress=job.update_progress, **kwargs)
+            job.status = "succeeded"
+            return job.result
+        except Exception as e:
+            job.error = getattr(e, "detail", None) or str(e)
+            job.status = "failed"
+            logger.error(f"任务失败: {job.job_id}（{job.kind}）: {job.error}")
+            raise
+        finally:
+            job.finished_at = datetime.now().isoformat(timespec="seconds")
+            with self._lock:
+                self._active -= 1
+
+    def _trim_history(self):
+        # 只保留最近max_history个已结束任务
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("succeeded", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        查询任务。
+        参数：
+            job_id (str): 任务ID
+        返回：
+            Job|None: 任务对象，不存在时为None
+        """
+        return self._jobs.get(job_id)
+
+    def list(self):
+        """
+        列出所有保留的任务，按提交时间排序。
+        返回：
+            list: 任务状态字典列表
+        """
+        return [job.to_dict() for job in list(self._jobs.values())]
+
+    def stats(self):
+        """
+        返回队列占用情况。
+        返回：
+            dict: 并发上限、排队上限和当前活动任务数
+        """
+        return {"max_workers": self.max_workers, "max_queued": self.max_queued, "active": self._active}
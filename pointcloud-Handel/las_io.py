@@ -0,0 +1,279 @@
+import os
+import struct
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1000000  # 每次读取的点数
+
+# ASPRS LAS 1.4 标准分类码
+CLASS_UNCLASSIFIED = 1  # 未分类
+CLASS_GROUND = 2  # 地面
+CLASS_LOW_NOISE = 7  # 低点噪声（离群点）
+CLASS_CONDUCTOR = 14  # 导线（电力线）
+CLASS_TOWER = 15  # 输电塔
+
+# 各点格式中RGB字段的字节偏移（无RGB的格式不在表中）
+_RGB_OFFSETS = {2: 20, 3: 28, 5: 28, 7: 30, 8: 30, 10: 30}
+
+class MappedLas:
+    """
+    未压缩LAS文件的内存映射读取器：按文件头中的点格式构造结构化dtype，把点记录区映射为NumPy数组，
+    不解析、不复制记录；坐标按块从映射页直接缩放计算。打开只读取文件头，与文件大小无关，
+    并发任务读取同一文件时共享操作系统的页缓存。
+    LAZ（压缩）文件和不支持的点格式无法映射，先用is_mappable判断，或由iter_las_chunks自动回退到laspy。
+    参数：
+        file_path (str): LAS文件路径
+    用法：
+        with MappedLas('xxx.las') as las:
+            xyz = las.xyz(0, 1000000)
+            local = las.xyz(0, 1000000, dtype=np.float32, origin=las_origin('xxx.las'))
+            for points, colors, intensity in las.iter_chunks(500000):
+                ...
+    """
+    def __init__(self, file_path):
+        self.file_path = str(file_path)
+        header = read_las_header(self.file_path)
+        if header is None:
+            raise ValueError(f"无法内存映射的LAS文件（压缩或点格式不支持）: {self.file_path}")
+        self.point_format = header['point_format']
+        self.scale = np.array(header['scale'], dtype=np.float64)
+        self.offset = np.array(header['offset'], dtype=np.float64)
+        fields = {'X': ('<i4', 0), 'Y': ('<i4', 4), 'Z': ('<i4', 8), 'intensity': ('<u2', 12)}
+        if self.point_format in _RGB_OFFSETS:
+            rgb = _RGB_OFFSETS[self.point_format]
+            fields.update({'red': ('<u2', rgb), 'green': ('<u2', rgb + 2), 'blue': ('<u2', rgb + 4)})
+        self.dtype = np.dtype({'names': list(fields), 'formats': [f for f, _ in fields.values()],
+                               'offsets': [o for _, o in fields.values()], 'itemsize': header['record_length']})
+        # 文件被截断时只映射完整的记录
+        available = (os.path.getsize(self.file_path) - header['data_offset']) // header['record_length']
+        count = int(min(header['point_count'], max(available, 0)))
+        self.records = np.memmap(self.file_path, dtype=self.dtype, mode='r', offset=header['data_offset'],
+                                 shape=(count,)) if count > 0 else np.empty(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        释放映射（已取出的坐标数组不受影响）。
+        """
+        mmap = getattr(self.records, '_mmap', None)
+        self.records = np.empty(0, dtype=self.dtype)
+        if mmap is not None:
+            try:
+                mmap.close()
+            except BufferError:
+                # 调用方仍持有records的视图，映射在最后一个视图释放时关闭
+                pass
+
+    @property
+    def has_colors(self):
+        return 'red' in self.dtype.names
+
+    def xyz(self, start=None, stop=None, dtype=np.float64, origin=None):
+        """
+        计算 [start, stop) 行的缩放坐标，只访问这些记录所在的页。
+        参数：
+            start (int|None): 起始行
+            stop (int|None): 结束行
+            dtype: 输出类型
+            origin (array-like|None): 局部原点 (3,)；指定时返回减去原点的局部坐标，
+                减法在float64下完成后才转换为dtype，大地坐标输出为float32时不损失精度
+        返回：
+            np.ndarray: 坐标 (n, 3)
+        """
+        shift = self.offset if origin is None else self.offset - np.asarray(origin, dtype=np.float64)
+        records = self.records[start:stop]
+        points = np.empty((len(records), 3), dtype=dtype)
+        for axis, name in enumerate(('X', 'Y', 'Z')):
+            points[:, axis] = records[name] * self.scale[axis] + shift[axis]
+        return points
+
+    def colors(self, start=None, stop=None):
+        """
+        [start, stop) 行的颜色 (n, 3)，float32，范围0~1；点格式无RGB时为None。
+        """
+        if not self.has_colors:
+            return None
+        records = self.records[start:stop]
+        colors = np.empty((len(records), 3), dtype=np.float32)
+        for axis, name in enumerate(('red', 'green', 'blue')):
+            colors[:, axis] = records[name] / 65535.0
+        return colors
+
+    def intensity(self, start=None, stop=None):
+        """
+        [start, stop) 行的强度 (n,)，float32。
+        """
+        return self.records['intensity'][start:stop].astype(np.float32)
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE, with_colors=True, with_intensity=True, origin=None):
+        """
+        按块产出 (points, colors, intensity)，格式同iter_las_chunks。
+        """
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            yield (self.xyz(start, stop, dtype=np.float32, origin=origin),
+                   self.colors(start, stop) if with_colors else None,
+                   self.intensity(start, stop) if with_intensity else None)
+
+def read_las_header(file_path):
+    """
+    直接解析LAS文件头中映射点记录所需的字段（不依赖laspy）。
+    参数：
+        file_path (str): LAS文件路径
+    返回：
+        dict|None: {"point_format", "record_length", "data_offset", "point_count", "scale", "offset", "mins"}；
+            不是LAS文件、为LAZ压缩文件或点格式不在0~10内时为None
+    """
+    with open(str(file_path), 'rb') as f:
+        raw = f.read(375)
+    if len(raw) < 227 or raw[:4] != b'LASF':
+        return None
+    header_size, data_offset = struct.unpack_from('<HI', raw, 94)
+    format_id, record_length, legacy_count = struct.unpack_from('<BHI', raw, 104)
+    # LAZ把点格式号的最高两位置1
+    if format_id & 0xC0 or format_id > 10:
+        return None
+    point_count = legacy_count
+    if header_size >= 375 and len(raw) >= 255 and legacy_count == 0:
+        # LAS 1.4：点数超出32位时只写在64位字段中
+        point_count = struct.unpack_from('<Q', raw, 247)[0]
+    return {
+        "point_format": format_id,
+        "record_length": record_length,
+        "data_offset": data_offset,
+        "point_count": int(point_count),
+        "scale": struct.unpack_from('<3d', raw, 131),
+        "offset": struct.unpack_from('<3d', raw, 155),
+        # 文件头按 max_x, min_x, max_y, min_y, max_z, min_z 排列
+        "mins": struct.unpack_from('<6d', raw, 179)[1::2],
+    }
+
+def is_mappable(file_path):
+    """
+    判断文件是否为可内存映射的未压缩LAS。
+    """
+    try:
+        return str(file_path).lower().endswith('.las') and read_las_header(file_path) is not None
+    except OSError:
+        return False
+
+def las_point_count(file_path):
+    """
+    读取LAS/LAZ文件头中的点数，不读取点记录。
+    参数：
+        file_path (str): LAS/LAZ文件路径
+    返回：
+        int: 点数
+    用法：
+        n = las_point_count('xxx.las')
+    """
+    if is_mappable(file_path):
+        return read_las_header(file_path)["point_count"]
+    import laspy
+    with laspy.open(str(file_path)) as reader:
+        return int(reader.header.point_count)
+
+def las_origin(file_path):
+    """
+    由文件头中的坐标最小值（向下取整到米）确定局部原点，不读取点记录。
+    参数：
+        file_path (str): LAS/LAZ文件路径
+    返回：
+        np.ndarray: 局部原点 (3,)，float64；文件头最小值无效时对应分量为0
+    用法：
+        origin = las_origin('xxx.las')
+        for points, colors, intensity in iter_las_chunks('xxx.las', origin=origin):
+            ...
+    """
+    if is_mappable(file_path):
+        mins = read_las_header(file_path)["mins"]
+    else:
+        import laspy
+        with laspy.open(str(file_path)) as reader:
+            mins = reader.header.mins
+    mins = np.asarray(mins, dtype=np.float64)
+    return np.where(np.isfinite(mins), np.floor(mins), 0.0)
+
+def iter_las_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, with_colors=True, with_intensity=True, origin=None):
+    """
+    流式分块读取LAS/LAZ文件，每次只解码chunk_size个点。未压缩的LAS通过MappedLas从内存映射中
+    按块计算坐标，LAZ及其他情况使用laspy解码。
+    参数：
+        file_path (str): LAS/LAZ文件路径
+        chunk_size (int): 每块点数
+        with_colors (bool): 是否读取颜色（文件无RGB时返回None）
+        with_intensity (bool): 是否读取强度
+        origin (array-like|None): 局部原点 (3,)，如las_origin的结果；指定时产出减去原点的局部坐标，
+            减法在float64下完成，避免float32大地坐标只有分米级精度
+    返回：
+        generator: 依次产出 (points, colors, intensity)
+            points (np.ndarray): float32坐标 (n, 3)，指定origin时为局部坐标
+            colors (np.ndarray|None): float32颜色 (n, 3)，范围0~1
+            intensity (np.ndarray|None): float32强度 (n,)
+    用法：
+        for points, colors, intensity in iter_las_chunks('xxx.las', 500000):
+            ...
+    """
+    if is_mappable(file_path):
+        with MappedLas(file_path) as las:
+            yield from las.iter_chunks(chunk_size, with_colors=with_colors, with_intensity=with_intensity,
+                                       origin=origin)
+        return
+    import laspy
+    shift = np.zeros(3) if origin is None else np.asarray(origin, dtype=np.float64)
+    with laspy.open(str(file_path)) as reader:
+        dimensions = set(reader.header.point_format.dimension_names)
+        has_colors = with_colors and {'red', 'green', 'blue'} <= dimensions
+        has_intensity = with_intensity and 'intensity' in dimensions
+        for chunk in reader.chunk_iterator(chunk_size):
+            count = len(chunk)
+            if count == 0:
+                continue
+            points = np.empty((count, 3), dtype=np.float32)
+            points[:, 0] = np.asarray(chunk.x) - shift[0]
+            points[:, 1] = np.asarray(chunk.y) - shift[1]
+            points[:, 2] = np.asarray(chunk.z) - shift[2]
+            colors = None
+            if has_colors:
+                colors = np.empty((count, 3), dtype=np.float32)
+                colors[:, 0] = chunk.red / 65535.0
+                colors[:, 1] = chunk.green / 65535.0
+                colors[:, 2] = chunk.blue / 65535.0
+            intensity = np.asarray(chunk.intensity, dtype=np.float32) if has_intensity else None
+            yield points, colors, intensity
+
+def write_classified_las(src_path, dst_path, classification, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    以src_path为模板写出带分类的LAS/LAZ：逐块复制原始点记录（坐标、强度、颜色、GPS时间等全部保留），
+    只替换classification字段，输出与输入一一对应、点序不变。dst_path以 .laz 结尾时写出压缩文件
+    （需要laspy的LAZ后端，如lazrs）。
+    参数：
+        src_path (str): 输入LAS/LAZ文件路径
+        dst_path (str): 输出LAS/LAZ文件路径
+        classification (np.ndarray): 每个点的分类码 (N,)，N须等于输入点数
+        chunk_size (int): 每次复制的点数
+    用法：
+        write_classified_las('in.las', 'out.laz', classification)
+    """
+    import laspy
+    classification = np.asarray(classification, dtype=np.uint8)
+    with laspy.open(str(src_path)) as reader:
+        if int(reader.header.point_count) != len(classification):
+            raise ValueError(f"分类数组长度{len(classification)}与点数{reader.header.point_count}不一致")
+        compress = str(dst_path).lower().endswith('.laz')
+        with laspy.open(str(dst_path), mode='w', header=reader.header, do_compress=compress) as writer:
+            offset = 0
+            for chunk in reader.chunk_iterator(chunk_size):
+                count = len(chunk)
+                if count == 0:
+                    continue
+                chunk.classification = classification[offset:offset + count]
+                writer.write_points(chunk)
+                offset += count
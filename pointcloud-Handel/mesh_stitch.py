@@ -0,0 +1,98 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+def compact_mesh(vertices, triangles):
+    """
+    删除未被任何三角形引用的顶点并重新编号。
+    参数：
+        vertices (np.ndarray): 顶点 (n, 3)
+        triangles (np.ndarray): 三角形顶点序号 (m, 3)
+    返回：
+        vertices (np.ndarray): 保留的顶点
+        triangles (np.ndarray): 重新编号后的三角形 (m, 3)，int32
+    """
+    used = np.unique(triangles)
+    remap = np.full(len(vertices), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return vertices[used], remap[triangles].astype(np.int32)
+
+def clip_mesh_to_core(vertices, triangles, points, core_mask):
+    """
+    裁掉落在重叠区的三角形：三角形重心的最近输入点为本块核心点时保留。
+    相邻块的核心区互不重叠，裁剪后各块网格在接缝处首尾相接、基本不重叠。
+    参数：
+        vertices (np.ndarray): 顶点 (n, 3)
+        triangles (np.ndarray): 三角形 (m, 3)
+        points (np.ndarray): 重建该块时使用的输入点 (k, 3)
+        core_mask (np.ndarray): points的核心区掩码 (k,)
+    返回：
+        vertices, triangles: 裁剪后的网格（已删除悬空顶点）
+    用法：
+        vertices, triangles = clip_mesh_to_core(vertices, triangles, points, core_mask)
+    """
+    if len(triangles) == 0:
+        return vertices, triangles
+    centroids = vertices[triangles].mean(axis=1)
+    _, nearest = cKDTree(points).query(centroids)
+    return compact_mesh(vertices, triangles[core_mask[nearest]])
+
+def boundary_vertex_mask(triangles, n_vertices):
+    """
+    标出网格开放边界上的顶点（所在边只属于一个三角形）。
+    参数：
+        triangles (np.ndarray): 三角形 (m, 3)
+        n_vertices (int): 顶点数
+    返回：
+        np.ndarray: 布尔掩码 (n_vertices,)
+    """
+    mask = np.zeros(n_vertices, dtype=bool)
+    if len(triangles) == 0:
+        return mask
+    edges = np.sort(triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges, counts = np.unique(edges, axis=0, return_counts=True)
+    mask[edges[counts == 1].ravel()] = True
+    return mask
+
+def merge_meshes(parts, weld_tolerance):
+    """
+    把多个分块网格合并为一个网格，并焊接接缝：不同块的边界顶点相距不超过weld_tolerance时合并为一个顶点
+    （取平均位置），焊接后退化或重复的三角形被删除。块内部顶点不移动。
+    参数：
+        parts (list): [(vertices, triangles), ...]
+        weld_tolerance (float): 焊接距离阈值，0表示只拼接不焊接
+    返回：
+        vertices (np.ndarray): float64顶点 (n, 3)
+        triangles (np.ndarray): int32三角形 (m, 3)
+        welded (int): 被焊接合并掉的顶点数
+    用法：
+        vertices, triangles, welded = merge_meshes(parts, 0.2)
+    """
+    parts = [(np.asarray(v, dtype=np.float64), np.asarray(t, dtype=np.int64)) for v, t in parts if len(t) > 0]
+    if not parts:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int32), 0
+    offsets = np.cumsum([0] + [len(v) for v, _ in parts])
+    vertices = np.vstack([v for v, _ in parts])
+    triangles = np.vstack([t + offset for (_, t), offset in zip(parts, offsets)])
+    part_ids = np.repeat(np.arange(len(parts)), np.diff(offsets))
+    boundary = np.flatnonzero(np.concatenate([boundary_vertex_mask(t, len(v)) for v, t in parts]))
+    n = len(vertices)
+    pairs = np.empty((0, 2), dtype=np.int64)
+    if weld_tolerance > 0 and len(boundary) > 1:
+        pairs = boundary[cKDTree(vertices[boundary]).query_pairs(weld_tolerance, output_type='ndarray')]
+        pairs = pairs[part_ids[pairs[:, 0]] != part_ids[pairs[:, 1]]]
+    if len(pairs) == 0:
+        return vertices, triangles.astype(np.int32), 0
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    n_groups, labels = connected_components(graph, directed=False)
+    counts = np.bincount(labels, minlength=n_groups)
+    welded_vertices = np.column_stack([np.bincount(labels, weights=vertices[:, axis], minlength=n_groups)
+                                       for axis in range(3)]) / counts[:, None]
+    triangles = labels[triangles]
+    triangles = triangles[(triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2])
+                          & (triangles[:, 0] != triangles[:, 2])]
+    # 两侧重叠的三角形焊接后可能完全重合，只保留一个（保持原有顶点顺序即法向方向）
+    _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    triangles = triangles[np.sort(first)]
+    return welded_vertices, triangles.astype(np.int32), n - n_groups
@@ -0,0 +1,206 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50  # 列表接口默认每页条数
+MAX_PAGE_SIZE = 500  # 列表接口每页条数上限
+
+# 独立成列、可用于筛选排序的字段；其余字段（如triangle_count）保存在extra的JSON中
+COLUMNS = ("filename", "original_filename", "timestamp", "point_count", "file_size", "file_path")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reconstructions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL UNIQUE,
+    original_filename TEXT,
+    timestamp TEXT NOT NULL,
+    point_count INTEGER,
+    file_size INTEGER,
+    file_path TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_reconstructions_timestamp ON reconstructions (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_reconstructions_original ON reconstructions (original_filename, timestamp, id);
+"""
+
+def encode_cursor(timestamp, row_id):
+    """
+    把分页位置编码为不透明的游标字符串。
+    参数：
+        timestamp (str): 上一页最后一条的时间戳
+        row_id (int): 上一页最后一条的行号
+    返回：
+        str: URL安全的游标
+    """
+    payload = json.dumps([timestamp, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    解析encode_cursor生成的游标。
+    参数：
+        cursor (str): 游标
+    返回：
+        tuple: (timestamp, row_id)
+    异常：
+        ValueError: 游标无效
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(payload)
+        return str(timestamp), int(row_id)
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+class ReconstructionStore:
+    """
+    基于SQLite的重建结果目录：每条记录一行，写入在事务中完成，多个任务并发写入不会丢失记录；
+    时间戳和原始文件名上建有索引，列表按 (timestamp, id) 倒序游标分页，开销与历史记录数无关。
+    用法：
+        store = ReconstructionStore('results/reconstructions.db')
+        store.import_json('results/reconstruction_metadata.json')
+        store.add({"filename": "a.ply", "original_filename": "a.las", "timestamp": "20240101_120000"})
+        items, next_cursor = store.list(limit=20)
+    """
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            # WAL模式下读写互不阻塞，其他进程也可同时写入（由SQLite文件锁保证事务）
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_values(metadata):
+        values = [metadata.get(name) for name in COLUMNS]
+        extra = {key: value for key, value in metadata.items() if key not in COLUMNS}
+        return values + [json.dumps(extra, ensure_ascii=False)]
+
+    @staticmethod
+    def _to_dict(row):
+        item = {name: row[name] for name in COLUMNS}
+        item.update(json.loads(row["extra"] or "{}"))
+        return item
+
+    def add(self, metadata):
+        """
+        新增（或按filename覆盖）一条重建结果记录。
+        参数：
+            metadata (dict): 元数据，须包含filename和timestamp
+        返回：
+            dict: 写入的元数据
+        """
+        self.add_many([metadata])
+        return metadata
+
+    def add_many(self, items):
+        """
+        在一个事务中写入多条记录（filename相同的记录被覆盖）。
+        参数：
+            items (list): 元数据字典列表
+        返回：
+            int: 写入条数
+        """
+        rows = [self._row_values(item) for item in items]
+        placeholders = ", ".join("?" * (len(COLUMNS) + 1))
+        updates = ", ".join(f"{name} = excluded.{name}" for name in COLUMNS[1:] + ("extra",))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO reconstructions ({', '.join(COLUMNS)}, extra) VALUES ({placeholders}) "
+                f"ON CONFLICT(filename) DO UPDATE SET {updates}", rows)
+        return len(rows)
+
+    def get(self, filename):
+        """
+        按结果文件名查询记录。
+        参数：
+            filename (str): 结果文件名
+        返回：
+            dict|None: 元数据，不存在时为None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM reconstructions WHERE filename = ?", (filename,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def delete(self, filename):
+        """
+        删除记录（不删除结果文件）。
+        参数：
+            filename (str): 结果文件名
+        返回：
+            bool: 是否删除了记录
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM reconstructions WHERE filename = ?", (filename,))
+        return cursor.rowcount > 0
+
+    def list(self, limit=DEFAULT_PAGE_SIZE, cursor=None, original_filename=None, since=None, until=None):
+        """
+        按时间倒序分页列出记录。
+        参数：
+            limit (int): 每页条数（1~MAX_PAGE_SIZE）
+            cursor (str|None): 上一页返回的next_cursor，None为第一页
+            original_filename (str|None): 只列出该原始文件的结果
+            since (str|None): 时间戳下限（含），格式同记录的timestamp（%Y%m%d_%H%M%S）
+            until (str|None): 时间戳上限（含）
+        返回：
+            items (list): 本页元数据
+            next_cursor (str|None): 下一页游标，没有更多记录时为None
+        异常：
+            ValueError: 游标无效
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        conditions, params = [], []
+        if original_filename is not None:
+            conditions.append("original_filename = ?")
+            params.append(original_filename)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp <= ?")
+            params.append(until)
+        if cursor is not None:
+            timestamp, row_id = decode_cursor(cursor)
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend([timestamp, row_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # 多取一条判断是否还有下一页
+        sql = f"SELECT * FROM reconstructions {where} ORDER BY timestamp DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1]["timestamp"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return [self._to_dict(row) for row in rows[:limit]], next_cursor
+
+    def import_json(self, json_path):
+        """
+        一次性导入旧版 reconstruction_metadata.json：导入成功后文件改名为 *.imported，
+        之后再调用不会重复导入。
+        参数：
+            json_path (str|Path): 旧元数据文件路径
+        返回：
+            int: 导入条数（文件不存在时为0）
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        with open(json_path, "r", encoding="utf-8") as f:
+            items = json.load(f).get("reconstructions", [])
+        items = [item for item in items if item.get("filename") and item.get("timestamp")]
+        count = self.add_many(items)
+        os.replace(json_path, json_path.with_name(json_path.name + ".imported"))
+        logger.info(f"已从 {json_path.name} 导入{count}条重建结果记录")
+        return count
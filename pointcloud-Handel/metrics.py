@@ -0,0 +1,360 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块
+    resource = None
+
+DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)  # 秒
+MEMORY_BUCKETS = tuple(2 ** n * 1024 ** 2 for n in range(5, 16))  # 32MB ~ 32GB
+RSS_SAMPLE_INTERVAL = 0.02  # 阶段峰值内存的采样间隔（秒）
+
+def rss_bytes(pid=None):
+    """
+    读取进程当前常驻内存。Linux下读取 /proc/<pid>/statm，其他平台返回本进程的 ru_maxrss（历史峰值），
+    Windows等没有resource模块的平台返回0。
+    参数：
+        pid (int|None): 进程号，None为当前进程
+    返回：
+        int: 字节数，无法读取时为0
+    """
+    try:
+        with open(f"/proc/{pid or os.getpid()}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        if resource is None or (pid is not None and pid != os.getpid()):
+            return 0
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss在Linux为KB、macOS为字节
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = ((key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in labels)
+    items = ",".join(f'{key}="{value}"' for key, value in escaped)
+    return "{" + items + "}"
+
+class MetricsRegistry:
+    """
+    进程内的Prometheus风格指标表（计数器、直方图），render() 输出文本暴露格式（0.0.4），
+    不依赖prometheus_client。线程安全。
+    用法：
+        registry = MetricsRegistry()
+        registry.describe("jobs_total", "counter", "已提交任务数")
+        registry.inc("jobs_total", kind="predict")
+        registry.describe("job_seconds", "histogram", "任务耗时", buckets=DURATION_BUCKETS)
+        registry.observe("job_seconds", 1.5, kind="predict")
+        text = registry.render()
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, buckets)
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket_counts, sum, count]
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """
+        登记指标的类型和说明。
+        参数：
+            name (str): 指标名
+            kind (str): 'counter' 或 'histogram'
+            help_text (str): 说明
+            buckets (tuple|None): 直方图桶上界（升序）
+        """
+        self._meta[name] = (kind, help_text, tuple(buckets or ()))
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        """
+        输出Prometheus文本格式。
+        返回：
+            str: 指标文本
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in sorted(self._meta.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for (metric, labels), value in sorted(self._counters.items()):
+                        if metric == name:
+                            lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                for (metric, labels), (counts, total, count) in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("pointcloud_stage_duration_seconds", "histogram", "处理阶段耗时（秒）", DURATION_BUCKETS)
+REGISTRY.describe("pointcloud_stage_peak_rss_bytes", "histogram", "处理阶段执行期间的进程峰值常驻内存（字节）",
+                  MEMORY_BUCKETS)
+REGISTRY.describe("pointcloud_stage_runs_total", "counter", "处理阶段执行次数")
+REGISTRY.describe("pointcloud_stage_points_total", "counter", "处理阶段输入/输出点数")
+
+class StageSpan:
+    """
+    一次阶段执行的记录：阶段名、耗时、输入/输出点数和执行期间的峰值常驻内存。
+    """
+    __slots__ = ("name", "points_in", "points_out", "seconds", "peak_rss_bytes", "status", "started_at", "pid",
+                 "_start")
+
+    def __init__(self, name, points_in=None):
+        self.name = name
+        self.points_in = points_in
+        self.points_out = None
+        self.seconds = 0.0
+        self.peak_rss_bytes = 0
+        self.status = "ok"
+        self.started_at = time.time()
+        self.pid = os.getpid()
+        self._start = time.perf_counter()
+
+    def set_output(self, points_out):
+        """
+        记录阶段输出点数。
+        参数：
+            points_out (int): 输出点数
+        """
+        self.points_out = int(points_out)
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "seconds": round(self.seconds, 6),
+            "points_in": self.points_in,
+            "points_out": self.points_out,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "status": self.status,
+            "started_at": self.started_at,
+            "pid": self.pid,
+        }
+
+class _RSSSampler:
+    # 每个进程一个后台采样线程，只在有阶段执行时采样，并更新所有执行中阶段的峰值
+    _start_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = set()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # fork出的子进程没有父进程的采样线程，需要重新启动
+            self._lock = threading.Lock()
+            self._open = set()
+            self._wake = threading.Event()
+            threading.Thread(target=self._run, name="rss-sampler", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(RSS_SAMPLE_INTERVAL)
+            with self._lock:
+                spans = list(self._open)
+                if not spans:
+                    self._wake.clear()
+                    continue
+            current = rss_bytes()
+            for span in spans:
+                if current > span.peak_rss_bytes:
+                    span.peak_rss_bytes = current
+
+    def start(self, span):
+        self._ensure_thread()
+        span.peak_rss_bytes = rss_bytes()
+        with self._lock:
+            self._open.add(span)
+            self._wake.set()
+
+    def stop(self, span):
+        with self._lock:
+            self._open.discard(span)
+        span.peak_rss_bytes = max(span.peak_rss_bytes, rss_bytes())
+
+_sampler = _RSSSampler()
+_local = threading.local()
+
+def _collectors():
+    if not hasattr(_local, "collectors"):
+        _local.collectors = []
+    return _local.collectors
+
+def record_span(record):
+    """
+    把一条阶段记录计入全局指标和当前线程上所有活动的采集器（任务剖析或子进程采集）。
+    参数：
+        record (dict): StageSpan.to_dict() 的结果
+    """
+    name = record["stage"]
+    REGISTRY.observe("pointcloud_stage_duration_seconds", record["seconds"], stage=name)
+    REGISTRY.observe("pointcloud_stage_peak_rss_bytes", record["peak_rss_bytes"], stage=name)
+    REGISTRY.inc("pointcloud_stage_runs_total", stage=name, status=record["status"])
+    if record["points_in"] is not None:
+        REGISTRY.inc("pointcloud_stage_points_total", record["points_in"], stage=name, direction="in")
+    if record["points_out"] is not None:
+        REGISTRY.inc("pointcloud_stage_points_total", record["points_out"], stage=name, direction="out")
+    for collector in _collectors():
+        collector.append(record)
+
+@contextmanager
+def stage(name, points_in=None):
+    """
+    记录一个处理阶段的耗时、点数和峰值内存，结果计入 /metrics 和当前任务的剖析报告。
+    参数：
+        name (str): 阶段名，如 'read'、'ground'、'poisson'
+        points_in (int|None): 输入点数
+    返回：
+        StageSpan: 可调用 span.set_output(n) 记录输出点数
+    用法：
+        with stage('outliers', len(points)) as span:
+            points, ind = remove_outliers(points)
+            span.set_output(len(points))
+    """
+    span = StageSpan(name, None if points_in is None else int(points_in))
+    _sampler.start(span)
+    try:
+        yield span
+    except BaseException:
+        span.status = "error"
+        raise
+    finally:
+        _sampler.stop(span)
+        span.seconds = time.perf_counter() - span._start
+        record_span(span.to_dict())
+
+@contextmanager
+def capture_spans():
+    """
+    收集当前线程内结束的阶段记录（如子进程中执行的分块任务），用于回传给父进程。
+    返回：
+        list: 阶段记录列表（StageSpan.to_dict()）
+    用法：
+        with capture_spans() as spans:
+            result = fn()
+        return result, spans
+    """
+    spans = []
+    _collectors().append(spans)
+    try:
+        yield spans
+    finally:
+        _collectors().remove(spans)
+
+def replay_spans(spans):
+    """
+    把子进程回传的阶段记录计入父进程的指标和当前任务的剖析报告。
+    参数：
+        spans (list): capture_spans 收集的记录
+    """
+    for record in spans:
+        record_span(record)
+
+class JobProfile:
+    """
+    单个任务的剖析报告：任务执行期间（当前线程及其分块子进程）所有阶段的记录及按阶段汇总。
+    用法：
+        with profile_job() as prof:
+            handler.extract_powerlines_csf_pca_blockwise(...)
+        prof.save('results/xxx.profile.json')
+    """
+    def __init__(self):
+        self.spans = []
+        self.started_at = time.time()
+        self.seconds = 0.0
+
+    def summary(self):
+        """
+        按阶段汇总。
+        返回：
+            dict: {阶段名: {"count", "total_seconds", "max_seconds", "points_in", "points_out", "peak_rss_bytes"}}
+        """
+        stages = {}
+        for record in self.spans:
+            item = stages.setdefault(record["stage"], {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                                                      "points_in": 0, "points_out": 0, "peak_rss_bytes": 0})
+            item["count"] += 1
+            item["total_seconds"] = round(item["total_seconds"] + record["seconds"], 6)
+            item["max_seconds"] = max(item["max_seconds"], record["seconds"])
+            item["points_in"] += record["points_in"] or 0
+            item["points_out"] += record["points_out"] or 0
+            item["peak_rss_bytes"] = max(item["peak_rss_bytes"], record["peak_rss_bytes"])
+        return dict(sorted(stages.items(), key=lambda kv: -kv[1]["total_seconds"]))
+
+    def report(self):
+        """
+        返回：
+            dict: {"started_at", "seconds", "stages": 汇总, "spans": 逐条记录}
+        """
+        return {"started_at": self.started_at, "seconds": round(self.seconds, 6), "stages": self.summary(),
+                "spans": list(self.spans)}
+
+    def save(self, path):
+        """
+        把剖析报告保存为JSON。
+        参数：
+            path (str|Path): 保存路径
+        返回：
+            Path: 保存路径
+        """
+        path = Path(path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
+
+@contextmanager
+def profile_job(enabled=True):
+    """
+    在当前线程上开启任务剖析；enabled=False时不收集，返回None。
+    参数：
+        enabled (bool): 是否开启
+    返回：
+        JobProfile|None
+    """
+    if not enabled:
+        yield None
+        return
+    prof = JobProfile()
+    start = time.perf_counter()
+    with capture_spans() as spans:
+        prof.spans = spans
+        try:
+            yield prof
+        finally:
+            prof.seconds = time.perf_counter() - start
@@ -0,0 +1,170 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import breadth_first_order, connected_components, minimum_spanning_tree
+from scipy.spatial import cKDTree
+
+# 法向量定向方法：
+#   tangent_plane  Open3D的切平面一致化（黎曼图+最小生成树），最慢，适合无视点信息的闭合物体
+#   up             朝向给定的上方向，适合机载扫描的地表
+#   sensor         朝向传感器位置或航迹（取最近的航迹点）
+#   voxel          体素内按主方向统一符号，再沿体素邻接的最小生成树传播（不跨越接近垂直的体素），
+#                  各连通分量朝上，节点数只有体素数
+NORMAL_ORIENTATIONS = ('tangent_plane', 'up', 'sensor', 'voxel')
+DEFAULT_UP = (0.0, 0.0, 1.0)
+DEFAULT_ORIENT_VOXEL_SIZE = 1.0  # voxel定向的体素尺寸（米）
+DEFAULT_ORIENT_MIN_COS = 0.5  # voxel定向时只沿主方向夹角余弦绝对值不低于此值的体素边传播符号
+
+def _align(normals, directions):
+    # 逐点翻转法向量，使其与对应的参考方向夹角不超过90°
+    flip = np.einsum('ij,ij->i', normals, directions) < 0
+    return np.where(flip[:, None], -normals, normals)
+
+def orient_normals_to_direction(normals, direction=DEFAULT_UP):
+    """
+    翻转与direction夹角大于90°的法向量。
+    参数：
+        normals (np.ndarray): 法向量 (N, 3)
+        direction (array-like): 目标方向 (3,)
+    返回：
+        np.ndarray: 定向后的法向量 (N, 3)
+    """
+    normals = np.asarray(normals, dtype=np.float64)
+    return _align(normals, np.broadcast_to(np.asarray(direction, dtype=np.float64), normals.shape))
+
+def orient_normals_to_sensor(points, normals, sensor):
+    """
+    使法向量指向传感器：sensor为单个位置时朝向该位置，为航迹 (M, 3) 时朝向每个点最近的航迹点。
+    参数：
+        points (np.ndarray): 点云 (N, 3)
+        normals (np.ndarray): 法向量 (N, 3)
+        sensor (array-like): 传感器位置 (3,) 或航迹 (M, 3)
+    返回：
+        np.ndarray: 定向后的法向量 (N, 3)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    normals = np.asarray(normals, dtype=np.float64)
+    sensor = np.asarray(sensor, dtype=np.float64)
+    if sensor.ndim == 1:
+        view = sensor - points
+    else:
+        _, nearest = cKDTree(sensor).query(points)
+        view = sensor[nearest] - points
+    return _align(normals, view)
+
+def _voxel_neighbor_pairs(keys):
+    # keys为排好序的体素整数坐标（去重），返回26邻域内的体素对（每对一次）
+    offsets = np.array([(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                        if (dx, dy, dz) > (0, 0, 0)])
+    base = keys.min(axis=0) - 1
+    dims = keys.max(axis=0) - base + 2
+    codes = ((keys - base) * np.array([dims[1] * dims[2], dims[2], 1])).sum(axis=1)
+    order = np.argsort(codes)
+    sorted_codes = codes[order]
+    sources, targets = [], []
+    for offset in offsets:
+        neighbor = ((keys + offset - base) * np.array([dims[1] * dims[2], dims[2], 1])).sum(axis=1)
+        pos = np.minimum(np.searchsorted(sorted_codes, neighbor), len(sorted_codes) - 1)
+        found = sorted_codes[pos] == neighbor
+        sources.append(np.flatnonzero(found))
+        targets.append(order[pos[found]])
+    return np.concatenate(sources), np.concatenate(targets)
+
+def orient_normals_voxel(points, normals, voxel_size=DEFAULT_ORIENT_VOXEL_SIZE, up=DEFAULT_UP,
+                         min_cos=DEFAULT_ORIENT_MIN_COS):
+    """
+    体素局部定向：每个体素取法向量结构张量的主方向，体素内法向量与之同向；
+    体素主方向的符号沿26邻域图的最小生成树（边权 1-|cos夹角|）传播。
+    主方向接近垂直的两个体素（如地面与塔身、树冠）之间无法判断符号是否一致，
+    |cos夹角|低于min_cos的边不参与传播，图因此分成若干连通分量，
+    每个分量整体翻转到主方向（按点数加权）与up同向。
+    参数：
+        points (np.ndarray): 点云 (N, 3)
+        normals (np.ndarray): 法向量 (N, 3)
+        voxel_size (float): 体素尺寸
+        up (array-like): 各连通分量的参考方向
+        min_cos (float): 传播符号的边上主方向夹角余弦绝对值的下限
+    返回：
+        np.ndarray: 定向后的法向量 (N, 3)
+    用法：
+        normals = orient_normals_voxel(points, normals, voxel_size=1.0)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    normals = np.asarray(normals, dtype=np.float64)
+    up = np.asarray(up, dtype=np.float64)
+    if len(points) == 0:
+        return normals
+    keys, voxel = np.unique(np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64), axis=0,
+                            return_inverse=True)
+    voxel = voxel.ravel()
+    n_voxels = len(keys)
+    # 体素主方向：结构张量 sum(n n^T) 的最大特征向量（与法向量符号无关）
+    tensors = np.zeros((n_voxels, 9))
+    np.add.at(tensors, voxel, (normals[:, :, None] * normals[:, None, :]).reshape(-1, 9))
+    axes = np.linalg.eigh(tensors.reshape(-1, 3, 3))[1][:, :, -1]
+    # 体素间传播符号，接近垂直的边不传播
+    sources, targets = _voxel_neighbor_pairs(keys)
+    cos = np.abs(np.einsum('ij,ij->i', axes[sources], axes[targets]))
+    keep = cos >= min_cos
+    sources, targets = sources[keep], targets[keep]
+    weights = 1.0 - cos[keep] + 1e-6
+    tree = minimum_spanning_tree(coo_matrix((weights, (sources, targets)), shape=(n_voxels, n_voxels))).tocoo()
+    n_components, component = connected_components(tree, directed=False)
+    # 每个连通分量任取一个体素为种子，连到虚拟根节点（序号n_voxels，方向为up），分量内先统一符号
+    order = np.argsort(component, kind='stable')
+    seeds = order[np.r_[0, np.flatnonzero(np.diff(component[order])) + 1]]
+    root = n_voxels
+    rows = np.concatenate([tree.row, np.full(n_components, root)])
+    cols = np.concatenate([tree.col, seeds])
+    graph = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_voxels + 1, n_voxels + 1))
+    _, parent = breadth_first_order(graph, root, directed=False, return_predecessors=True)
+    parent[root] = root
+    node_axes = np.vstack([axes, up])
+    flip = (np.einsum('ij,ij->i', node_axes, node_axes[parent]) < 0).astype(np.int8)
+    flip[root] = 0
+    # 指针跳跃求每个节点到根路径上翻转次数的奇偶性
+    ancestor = parent.copy()
+    while np.any(ancestor != root):
+        flip ^= flip[ancestor]
+        ancestor = ancestor[ancestor]
+    axes = np.where(flip[:n_voxels, None] == 1, -axes, axes)
+    # 再把每个分量整体翻转到与up同向
+    counts = np.bincount(voxel, minlength=n_voxels)
+    score = np.bincount(component, weights=counts * (axes @ up), minlength=n_components)
+    axes = np.where(score[component, None] < 0, -axes, axes)
+    return _align(normals, axes[voxel])
+
+def orient_normals(pcd, method='tangent_plane', k=100, sensor=None, up=DEFAULT_UP,
+                   voxel_size=DEFAULT_ORIENT_VOXEL_SIZE):
+    """
+    按指定方法统一Open3D点云的法向量方向（点云须已估计法向量），原地修改。
+    参数：
+        pcd (PointCloud): 已有法向量的点云
+        method (str): NORMAL_ORIENTATIONS之一
+        k (int): tangent_plane方法的邻域数
+        sensor (array-like|None): sensor方法的传感器位置 (3,) 或航迹 (M, 3)
+        up (array-like): up方法的方向，也是voxel方法各连通分量的参考方向
+        voxel_size (float): voxel方法的体素尺寸
+    返回：
+        pcd (PointCloud): 原点云
+    异常：
+        ValueError: 方法不支持，或sensor方法未给出传感器位置
+    用法：
+        orient_normals(pcd, 'sensor', sensor=[x, y, z + 1000])
+    """
+    import open3d as o3d
+    if method not in NORMAL_ORIENTATIONS:
+        raise ValueError(f"不支持的法向量定向方法: {method}，可选: {list(NORMAL_ORIENTATIONS)}")
+    if method == 'tangent_plane':
+        pcd.orient_normals_consistent_tangent_plane(k)
+        return pcd
+    normals = np.asarray(pcd.normals)
+    if method == 'up':
+        normals = orient_normals_to_direction(normals, up)
+    elif method == 'sensor':
+        if sensor is None:
+            raise ValueError("sensor定向方法需要传感器位置或航迹")
+        normals = orient_normals_to_sensor(np.asarray(pcd.points), normals, sensor)
+    else:
+        normals = orient_normals_voxel(np.asarray(pcd.points), normals, voxel_size=voxel_size, up=up)
+    pcd.normals = o3d.utility.Vector3dVector(normals)
+    return pcd
@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NODE_BUDGET = 65536  # 每个八叉树节点最多保存的点数
+DEFAULT_CHUNK_POINTS = 5000000  # 分组构建时每组（子树）的最大点数，决定峰值内存
+COUNT_LEVEL = 6  # 计数格网层级（每轴 2**COUNT_LEVEL 格）
+MAX_LEVEL = 16  # 八叉树最大深度，达到后叶节点不再细分
+SAMPLE_GRID = 128  # 节点抽稀格网的初始分辨率（每轴格数）
+METADATA_NAME = "metadata.json"
+
+_RECORD_DTYPE = np.dtype([('xyz', '<f8', 3), ('rgb', 'u1', 3)])
+
+def _child_index(points, center):
+    # 八分体编号：x位为4，y位为2，z位为1
+    return ((points[:, 0] >= center[0]).astype(np.int64) << 2 |
+            (points[:, 1] >= center[1]).astype(np.int64) << 1 |
+            (points[:, 2] >= center[2]).astype(np.int64))
+
+def _node_bounds(name, root_min, root_size):
+    # 由节点名（r + 各层八分体编号）计算节点立方体的最小角和边长
+    node_min = np.array(root_min, dtype=np.float64)
+    size = float(root_size)
+    for digit in name[1:]:
+        size /= 2
+        child = int(digit)
+        node_min += size * np.array([(child >> 2) & 1, (child >> 1) & 1, child & 1])
+    return node_min, size
+
+def grid_sample(points, node_min, size, budget):
+    """
+    节点抽稀：在节点立方体上建格网，每个非空格取第一个点；格网从SAMPLE_GRID开始逐次减半，
+    直到选出的点数不超过budget。结果确定（不做随机抽样）。
+    参数：
+        points (np.ndarray): 节点内的点 (n, 3)
+        node_min (np.ndarray): 节点最小角 (3,)
+        size (float): 节点边长
+        budget (int): 最多选出的点数
+    返回：
+        selected (np.ndarray): 选中点的索引（升序）
+    """
+    grid = SAMPLE_GRID
+    while True:
+        cells = np.clip(((points - node_min) / size * grid).astype(np.int64), 0, grid - 1)
+        keys = (cells[:, 0] * grid + cells[:, 1]) * grid + cells[:, 2]
+        _, first = np.unique(keys, return_index=True)
+        if len(first) <= budget or grid == 1:
+            return np.sort(first)
+        grid //= 2
+
+class OctreeTileWriter:
+    """
+    多分辨率八叉树瓦片输出。每个节点保存一份抽稀点集，子节点只保存父节点未选中的点
+    （叠加式LOD，不重复），节点点数不超过node_budget。每个节点写为一个二进制文件：
+    先是 float32 坐标（相对 metadata 中的 offset）n*12 字节，再是 uint8 RGB n*3 字节；
+    metadata.json 记录包围盒、属性布局和完整的节点层级，浏览器可只加载可见且细节合适的节点。
+    构建为流式：第一遍按计数格网统计点数并划分子树，第二遍把点追加写入各子树的临时文件，
+    之后逐个子树在内存中构建（峰值内存由chunk_points决定），最后自下而上构建子树之上的层级。
+    参数：
+        output_dir (str): 输出目录
+        node_budget (int): 每个节点的点数上限
+        chunk_points (int): 每个子树的最大点数
+    用法：
+        writer = OctreeTileWriter('results/tiles/xxx')
+        origin = handler.point_cloud_origin('result.ply')
+        metadata = writer.build(lambda: handler.iter_point_chunks('result.ply', origin=origin), origin=origin)
+    """
+    def __init__(self, output_dir, node_budget=DEFAULT_NODE_BUDGET, chunk_points=DEFAULT_CHUNK_POINTS):
+        self.output_dir = Path(output_dir)
+        self.node_budget = int(node_budget)
+        self.chunk_points = int(chunk_points)
+        self.nodes = {}
+
+    def build(self, chunk_source, origin=None):
+        """
+        构建八叉树瓦片。
+        参数：
+            chunk_source (callable): 无参函数，每次调用返回一个新的分块迭代器，
+                产出 (points, colors, ...)；points为 (n, 3)，colors为 (n, 3) 的0~1浮点颜色或None
+            origin (array-like|None): points为相对origin的局部坐标时传入；metadata中的offset
+                和包围盒会加回origin。大地坐标应以float64或局部坐标传入，float32大地坐标已损失精度
+        返回：
+            metadata (dict): 写入 metadata.json 的内容
+        """
+        if self.output_dir.exists():
+            shutil.rmtree(self.output_dir)
+        self.output_dir.mkdir(parents=True)
+        self.nodes = {}
+        self.origin = np.zeros(3) if origin is None else np.asarray(origin, dtype=np.float64)
+        bounds_min, bounds_max, total = self._scan_bounds(chunk_source)
+        if total == 0:
+            raise ValueError("点云为空，无法生成八叉树瓦片")
+        self.root_min = bounds_min
+        # 立方体根节点，边长略大于最大跨度，保证最大值落在根节点内
+        self.root_size = float(max((bounds_max - bounds_min).max(), 1e-6)) * (1 + 1e-9)
+        counts = self._count(chunk_source)
+        chunks = self._plan_chunks(counts)
+        logger.info(f"八叉树构建: 点数{total}，子树数{len(chunks)}")
+        spill_dir = self.output_dir / "_chunks"
+        spill_dir.mkdir()
+        try:
+            self._distribute(chunk_source, chunks, spill_dir)
+            pending = {}
+            for chunk_id, name in enumerate(chunks):
+                records = np.fromfile(spill_dir / f"{chunk_id}.bin", dtype=_RECORD_DTYPE)
+                pending[name] = self._build_subtree(name, records)
+            self._build_upper_levels(pending)
+        finally:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+        metadata = {
+            "version": 1,
+            "point_count": int(total),
+            "node_budget": self.node_budget,
+            "offset": (self.root_min + self.origin).tolist(),
+            "bounding_box": {"min": (bounds_min + self.origin).tolist(), "max": (bounds_max + self.origin).tolist()},
+            "cube": {"min": (self.root_min + self.origin).tolist(), "size": self.root_size},
+            "attributes": [
+                {"name": "position", "type": "float32", "size": 3, "relative_to": "offset"},
+                {"name": "rgb", "type": "uint8", "size": 3},
+            ],
+            "layout": "planar",
+            "root": "r",
+            "nodes": self._hierarchy(),
+        }
+        with open(self.output_dir / METADATA_NAME, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        logger.info(f"八叉树瓦片已保存: {self.output_dir}，节点数{len(self.nodes)}")
+        return metadata
+
+    def _scan_bounds(self, chunk_source):
+        bounds_min = np.full(3, np.inf)
+        bounds_max = np.full(3, -np.inf)
+        total = 0
+        for points, *_ in chunk_source():
+            if len(points) == 0:
+                continue
+            bounds_min = np.minimum(bounds_min, points.min(axis=0))
+            bounds_max = np.maximum(bounds_max, points.max(axis=0))
+            total += len(points)
+        return bounds_min, bounds_max, total
+
+    def _count_cells(self, points):
+        side = 2 ** COUNT_LEVEL
+        cells = np.clip(((np.asarray(points, dtype=np.float64) - self.root_min) / self.root_size * side).astype(np.int64),
+                        0, side - 1)
+        return (cells[:, 0] * side + cells[:, 1]) * side + cells[:, 2]
+
+    def _count(self, chunk_source):
+        side = 2 ** COUNT_LEVEL
+        counts = np.zeros(side ** 3, dtype=np.int64)
+        for points, *_ in chunk_source():
+            if len(points) > 0:
+                counts += np.bincount(self._count_cells(points), minlength=side ** 3)
+        return counts.reshape(side, side, side)
+
+    def _plan_chunks(self, counts):
+        # 自上而下：点数不超过chunk_points（或到达计数层级）的节点作为一个子树
+        side = 2 ** COUNT_LEVEL
+        chunks = []
+        stack = ["r"]
+        while stack:
+            name = stack.pop()
+            level = len(name) - 1
+            ix, iy, iz = self._node_cell(name)
+            span = side >> level
+            count = counts[ix:ix + span, iy:iy + span, iz:iz + span].sum()
+            if count == 0:
+                continue
+            if count <= self.chunk_points or level == COUNT_LEVEL:
+                chunks.append(name)
+            else:
+                stack.extend(name + str(child) for child in range(7, -1, -1))
+        return sorted(chunks)
+
+    def _node_cell(self, name):
+        # 节点最小角在计数格网中的格号
+        ix = iy = iz = 0
+        for depth, digit in enumerate(name[1:], start=1):
+            child = int(digit)
+            step = (2 ** COUNT_LEVEL) >> depth
+            ix += step * ((child >> 2) & 1)
+            iy += step * ((child >> 1) & 1)
+            iz += step * (child & 1)
+        return ix, iy, iz
+
+    def _distribute(self, chunk_source, chunks, spill_dir):
+        side = 2 ** COUNT_LEVEL
+        cell_chunk = np.full((side, side, side), -1, dtype=np.int32)
+        for chunk_id, name in enumerate(chunks):
+            ix, iy, iz = self._node_cell(name)
+            span = side >> (len(name) - 1)
+            cell_chunk[ix:ix + span, iy:iy + span, iz:iz + span] = chunk_id
+        cell_chunk = cell_chunk.reshape(-1)
+        for points, colors, *_ in chunk_source():
+            if len(points) == 0:
+                continue
+            records = np.empty(len(points), dtype=_RECORD_DTYPE)
+            records['xyz'] = points
+            records['rgb'] = 255 if colors is None else np.clip(np.rint(np.asarray(colors) * 255), 0, 255)
+            chunk_ids = cell_chunk[self._count_cells(points)]
+            order = np.argsort(chunk_ids, kind='stable')
+            ids, starts = np.unique(chunk_ids[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            for chunk_id, start, end in zip(ids, starts, ends):
+                with open(spill_dir / f"{chunk_id}.bin", 'ab') as f:
+                    records[order[start:end]].tofile(f)
+
+    def _build_subtree(self, name, records):
+        # 在内存中构建一个子树，返回子树根节点的点（留待上层抽稀后再写出）
+        stack = [(name, records)]
+        root_records = None
+        while stack:
+            node_name, node_records = stack.pop()
+            node_min, size = _node_bounds(node_name, self.root_min, self.root_size)
+            level = len(node_name) - 1
+            if len(node_records) <= self.node_budget or level >= MAX_LEVEL:
+                selected = node_records
+                rest = node_records[:0]
+            else:
+                keep = np.zeros(len(node_records), dtype=bool)
+                keep[grid_sample(node_records['xyz'], node_min, size, self.node_budget)] = True
+                selected, rest = node_records[keep], node_records[~keep]
+            if node_name == name:
+                root_records = selected
+            else:
+                self._write_node(node_name, selected)
+            if len(rest) > 0:
+                child = _child_index(rest['xyz'], node_min + size / 2)
+                for c in range(8):
+                    child_records = rest[child == c]
+                    if len(child_records) > 0:
+                        stack.append((node_name + str(c), child_records))
+        return root_records
+
+    def _build_upper_levels(self, pending):
+        # 自下而上：父节点从子节点待写出的点中抽稀，选中的点上移，其余留在子节点
+        while True:
+            deepest = max(len(name) for name in pending)
+            if deepest == 1:
+                break
+            level_names = [name for name in pending if len(name) == deepest]
+            parents = sorted({name[:-1] for name in level_names})
+            for parent in parents:
+                children = [name for name in level_names if name[:-1] == parent]
+                merged = np.concatenate([pending[name] for name in children])
+                owner = np.repeat(np.arange(len(children)), [len(pending[name]) for name in children])
+                node_min, size = _node_bounds(parent, self.root_min, self.root_size)
+                keep = np.zeros(len(merged), dtype=bool)
+                keep[grid_sample(merged['xyz'], node_min, size, self.node_budget)] = True
+                for i, name in enumerate(children):
+                    self._write_node(name, merged[(owner == i) & ~keep])
+                    del pending[name]
+                pending[parent] = np.concatenate([pending.get(parent, merged[:0]), merged[keep]])
+        self._write_node("r", pending["r"])
+
+    def _write_node(self, name, records):
+        self.nodes[name] = int(len(records))
+        if len(records) == 0:
+            return
+        with open(self.output_dir / f"{name}.bin", 'wb') as f:
+            (records['xyz'] - self.root_min).astype('<f4').tofile(f)
+            records['rgb'].tofile(f)
+
+    def _hierarchy(self):
+        hierarchy = {}
+        for name in sorted(self.nodes, key=lambda n: (len(n), n)):
+            node_min, size = _node_bounds(name, self.root_min + self.origin, self.root_size)
+            hierarchy[name] = {
+                "level": len(name) - 1,
+                "point_count": self.nodes[name],
+                "bounding_box": {"min": node_min.tolist(), "max": (node_min + size).tolist()},
+                "children": [name + str(c) for c in range(8) if name + str(c) in self.nodes],
+                "file": f"{name}.bin" if self.nodes[name] > 0 else None,
+            }
+        return hierarchy
+
+def load_node(tiles_dir, name, metadata):
+    """
+    读取一个节点文件（用于校验或服务端处理）。
+    参数：
+        tiles_dir (str): 瓦片目录
+        name (str): 节点名
+        metadata (dict): metadata.json 的内容
+    返回：
+        points (np.ndarray): 绝对坐标 (n, 3)，float64
+        rgb (np.ndarray): 颜色 (n, 3)，uint8
+    """
+    count = metadata["nodes"][name]["point_count"]
+    if count == 0:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.uint8)
+    data = np.fromfile(os.path.join(tiles_dir, f"{name}.bin"), dtype=np.uint8)
+    points = data[:count * 12].view('<f4').reshape(-1, 3).astype(np.float64) + np.array(metadata["offset"])
+    rgb = data[count * 12:].reshape(-1, 3)
+    return points, rgb
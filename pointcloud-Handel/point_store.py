@@ -0,0 +1,142 @@
+import numpy as np
+from spatial_tiles import morton_encode
+
+STORE_LEVELS = 16  # 排序用Morton格网每轴 2**STORE_LEVELS 格
+
+class PointStore:
+    """
+    紧凑点云存储：坐标减去局部原点后以float32保存（大地坐标下float32只有分米级精度，
+    局部坐标在数十公里范围内仍为毫米级），颜色、强度、原始序号等属性各自一列（列式存储），
+    所有列按同一顺序排列。读取时按Morton（Z序）曲线排序，使空间上相邻的点在内存中也相邻；
+    分块时再按块号稳定重排（块内保持Morton顺序），每块是xyz和各属性列上的连续行区间，
+    直接切片即可得到不复制的块视图。各流程使用局部坐标，只在写文件时加上origin转换为世界坐标。
+    参数：
+        xyz (np.ndarray): 局部坐标 (N, 3)，float32
+        origin (np.ndarray): 局部原点 (3,)，float64
+        columns (dict|None): 属性列 {名称: (N, ...) 数组}
+    用法：
+        store = PointStore.from_chunks(iter_las_chunks(path, origin=origin), las_point_count(path), origin)
+        bounds = store.partition(block_ids, num_blocks)
+        blocks = [store.xyz[start:stop] for start, stop in bounds]
+    """
+    def __init__(self, xyz, origin, columns=None):
+        self.xyz = np.ascontiguousarray(xyz, dtype=np.float32)
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self._columns = {}
+        for name, values in (columns or {}).items():
+            self.add_column(name, values)
+
+    @classmethod
+    def from_chunks(cls, chunks, total, origin):
+        """
+        由分块读取的 (points, colors, intensity) 建立存储，直接写入预分配的局部坐标数组，
+        不产生整幅点云的float64副本。非有限坐标的点被丢弃，'index'列记录保留点在输入中的序号。
+        参数：
+            chunks (iterable): 依次产出 (points, colors|None, intensity|None)，points为已减去origin的局部坐标
+                （如iter_las_chunks(path, origin=origin)的输出），大地坐标须在float64下减去原点后再转换为float32
+            total (int): 点数上限（如文件头点数），用于预分配
+            origin (array-like): 局部原点 (3,)
+        返回：
+            PointStore: 未排序的存储，保持输入顺序
+        用法：
+            origin = las_origin(path)
+            store = PointStore.from_chunks(iter_las_chunks(path, origin=origin), las_point_count(path), origin)
+        """
+        xyz = np.empty((total, 3), dtype=np.float32)
+        index = np.empty(total, dtype=np.int64)
+        colors = intensity = None
+        filled = read = 0
+        for points, chunk_colors, chunk_intensity in chunks:
+            points = points[:total - read]
+            valid = np.isfinite(points).all(axis=1)
+            count = int(valid.sum())
+            end = filled + count
+            if count:
+                xyz[filled:end] = points[valid]
+                index[filled:end] = read + np.flatnonzero(valid)
+            if chunk_colors is not None:
+                if colors is None:
+                    colors = np.empty((total, 3), dtype=np.float32)
+                colors[filled:end] = chunk_colors[:len(points)][valid]
+            if chunk_intensity is not None:
+                if intensity is None:
+                    intensity = np.empty(total, dtype=np.float32)
+                intensity[filled:end] = chunk_intensity[:len(points)][valid]
+            filled, read = end, read + len(points)
+            if read >= total:
+                break
+        columns = {'index': index[:filled]}
+        if colors is not None:
+            columns['colors'] = colors[:filled]
+        if intensity is not None:
+            columns['intensity'] = intensity[:filled]
+        return cls(xyz[:filled], origin, columns)
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def column(self, name):
+        """
+        返回属性列（不复制）。
+        参数：
+            name (str): 列名
+        返回：
+            np.ndarray: 属性列 (N, ...)
+        """
+        return self._columns[name]
+
+    def add_column(self, name, values):
+        """
+        注册属性列，行数须与点数一致。
+        参数：
+            name (str): 列名
+            values (np.ndarray): 属性值 (N, ...)
+        返回：
+            self
+        """
+        values = np.asarray(values)
+        if len(values) != len(self.xyz):
+            raise ValueError(f"属性列{name}行数({len(values)})与点数({len(self.xyz)})不一致")
+        self._columns[name] = values
+        return self
+
+    def reorder(self, order):
+        """
+        按给定顺序重排坐标和所有属性列（order可以只含部分行，用于同时剔除点）。
+        之前取得的切片仍指向重排前的数组。
+        参数：
+            order (np.ndarray): 新顺序的行索引
+        返回：
+            self
+        """
+        self.xyz = self.xyz[order]
+        self._columns = {name: values[order] for name, values in self._columns.items()}
+        return self
+
+    def morton_codes(self, levels=STORE_LEVELS):
+        """
+        各点在包围盒Morton格网中的编码。
+        """
+        if len(self.xyz) == 0:
+            return np.empty(0, dtype=np.uint64)
+        lo = self.xyz.min(axis=0)
+        extent = max(float((self.xyz.max(axis=0) - lo).max()), 1e-9)
+        cells = np.floor((self.xyz - lo) / (extent * (1 + 1e-6)) * 2 ** levels)
+        return morton_encode(np.clip(cells, 0, 2 ** levels - 1).astype(np.int64))
+
+    def partition(self, block_ids, num_blocks):
+        """
+        按块号稳定重排所有列（块内保持原有顺序），使每块成为连续的行区间。
+        会改变本存储的行顺序，调用前取得的切片和行号不再对应。
+        参数：
+            block_ids (np.ndarray): 每个点的块号 (N,)，取值 [0, num_blocks)
+            num_blocks (int): 块数
+        返回：
+            bounds (list): 非空块的行区间 [(start, stop), ...]，按块号排列
+        """
+        block_ids = np.asarray(block_ids)
+        order = np.argsort(block_ids, kind='stable')
+        counts = np.bincount(block_ids, minlength=num_blocks)
+        self.reorder(order)
+        stops = np.cumsum(counts)
+        return [(int(stop - count), int(stop)) for count, stop in zip(counts, stops) if count > 0]
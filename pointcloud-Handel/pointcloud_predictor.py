@@ -1,10 +1,18 @@
 import os
 import numpy as np
-import open3d as o3d
-import laspy
 import logging
-from sklearn.cluster import DBSCAN
-from sklearn.decomposition import PCA
+from scipy import ndimage
+from block_executor import run_blocks, run_tasks
+from las_io import (CLASS_CONDUCTOR, CLASS_GROUND, CLASS_LOW_NOISE, CLASS_TOWER, CLASS_UNCLASSIFIED,
+                    DEFAULT_CHUNK_SIZE, iter_las_chunks, las_origin, las_point_count, write_classified_las)
+from block_cache import BlockCache, array_digest, params_key
+from spatial_index import SpatialIndex, remove_outliers_with_index
+from ground_filter import DEFAULT_GROUND_PARAMS, GroundFilter
+from mesh_stitch import clip_mesh_to_core, merge_meshes
+from normal_orientation import NORMAL_ORIENTATIONS, orient_normals
+from resolution_planner import apply_plan, plan_resolution
+from point_store import PointStore
+from metrics import stage
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,85 +20,316 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def remove_outliers(points, nb_neighbors=20, std_ratio=2.0):
+def remove_outliers(points, nb_neighbors=20, std_ratio=2.0, index=None):
     """
-    去除点云中的离群点。
+    去除点云中的离群点（统计滤波，判定规则同Open3D remove_statistical_outlier）。
     参数：
         points (np.ndarray): 输入点云 (N, 3)
         nb_neighbors (int): 邻域点数
         std_ratio (float): 标准差倍数
+        index (SpatialIndex|None): points上已构建的空间索引，为None时新建
     返回：
         filtered_points (np.ndarray): 过滤后的点云
         ind (np.ndarray): 保留点的索引
     用法：
         filtered_points, ind = remove_outliers(points)
     """
-    # 转为Open3D点云对象
-    pcd = o3d.geometry.PointCloud()
-    pcd.points = o3d.utility.Vector3dVector(points)
-    # 统计滤波
-    cl, ind = pcd.remove_statistical_outlier(nb_neighbors=nb_neighbors, std_ratio=std_ratio)
-    filtered_points = np.asarray(pcd.points)[ind]
+    with stage('outliers', len(points)) as span:
+        if index is None:
+            index = SpatialIndex(points)
+        ind = remove_outliers_with_index(index, nb_neighbors=nb_neighbors, std_ratio=std_ratio)
+        filtered_points = np.asarray(points, dtype=np.float64)[ind]
+        span.set_output(len(filtered_points))
     return filtered_points, ind
 
+EIGEN_FEATURE_CHUNK_SIZE = 65536  # 每批计算特征的邻域数（约 65536*20*3*8B ≈ 30MB）
+
+def compute_eigen_features(points, indices, chunk_size=EIGEN_FEATURE_CHUNK_SIZE):
+    """
+    批量计算邻域协方差矩阵的特征值特征（线性度、平面度、散射度）。
+    将所有邻域堆叠为 (m, k, 3) 数组分批处理，内存占用只与 chunk_size 有关。
+    结果与逐点调用 np.cov + np.linalg.eigh 一致。
+    参数：
+        points (np.ndarray): 点云 (N, 3)
+        indices (np.ndarray): 每个点的k近邻索引 (M, k)
+        chunk_size (int): 每批处理的邻域数
+    返回：
+        features (np.ndarray): 特征 (M, 3)，依次为 linearity, planarity, scattering
+    用法：
+        features = compute_eigen_features(points, indices)
+    """
+    indices = np.asarray(indices)
+    num, k = indices.shape
+    features = np.empty((num, 3), dtype=np.float64)
+    for start in range(0, num, chunk_size):
+        end = min(start + chunk_size, num)
+        # 与np.cov一致：float64计算，无偏估计(除以k-1)
+        neighbors = points[indices[start:end]].astype(np.float64)
+        neighbors -= neighbors.mean(axis=1, keepdims=True)
+        cov = np.einsum('nki,nkj->nij', neighbors, neighbors) / (k - 1)
+        # eigvalsh返回升序特征值，翻转为降序 λ1 >= λ2 >= λ3
+        eigvals = np.linalg.eigvalsh(cov)[:, ::-1]
+        denom = eigvals[:, 0] + 1e-8
+        features[start:end, 0] = (eigvals[:, 0] - eigvals[:, 1]) / denom
+        features[start:end, 1] = (eigvals[:, 1] - eigvals[:, 2]) / denom
+        features[start:end, 2] = eigvals[:, 2] / denom
+    return features
+
+DEFAULT_LINE_THRESHOLDS = {'linearity': 0.8, 'planarity': 0.15, 'scattering': 0.05}  # 电力线特征阈值
+
+def line_mask_from_features(features, line_thresholds=None):
+    """
+    按特征阈值筛选电力线候选点：linearity大于阈值，planarity和scattering小于阈值。
+    参数：
+        features (np.ndarray): compute_eigen_features的结果 (M, 3)
+        line_thresholds (dict|None): {'linearity', 'planarity', 'scattering'}，缺省项使用DEFAULT_LINE_THRESHOLDS
+    返回：
+        mask (np.ndarray): 电力线候选点掩码 (M,)
+    用法：
+        mask = line_mask_from_features(features, {'linearity': 0.85})
+    """
+    thresholds = dict(DEFAULT_LINE_THRESHOLDS, **(line_thresholds or {}))
+    return ((features[:, 0] > thresholds['linearity']) &
+            (features[:, 1] < thresholds['planarity']) &
+            (features[:, 2] < thresholds['scattering']))
+
+def partition_by_block_ids(block_ids, num_blocks):
+    """
+    按块编号对点做一次稳定排序分区，替代逐块构造布尔掩码。
+    参数：
+        block_ids (np.ndarray): 每个点所属块编号 (N,)，不在 [0, num_blocks) 内的点被丢弃
+        num_blocks (int): 块数
+    返回：
+        order (np.ndarray): 按块排序后的点索引，块内保持原始顺序
+        counts (np.ndarray): 每块点数 (num_blocks,)
+    用法：
+        order, counts = partition_by_block_ids(ids, 10)
+    """
+    block_ids = np.where((block_ids >= 0) & (block_ids < num_blocks), block_ids, num_blocks)
+    order = np.argsort(block_ids, kind='stable')
+    counts = np.bincount(block_ids, minlength=num_blocks + 1)[:num_blocks]
+    return order[:counts.sum()], counts
+
+def halo_partitions(proj, block_ids, bins, halo):
+    """
+    计算重叠区分区：点除属于自身块外，还作为重叠点属于投影距其边界halo以内的相邻块。
+    参数：
+        proj (np.ndarray): 各点投影 (N,)
+        block_ids (np.ndarray): 各点所属核心块编号 (N,)
+        bins (np.ndarray): 分块边界
+        halo (float): 重叠区宽度
+    返回：
+        generator: 对每个块偏移量产出 (order, counts)，含义同partition_by_block_ids
+    用法：
+        for order, counts in halo_partitions(proj, ids, bins, 10):
+            ...
+    """
+    num_blocks = len(bins) - 1
+    if halo <= 0 or num_blocks <= 1:
+        return
+    block_length = bins[1] - bins[0]
+    reach = int(np.ceil(halo / block_length))
+    for offset in range(-reach, reach + 1):
+        if offset == 0:
+            continue
+        target = block_ids + offset
+        valid = (target >= 0) & (target < num_blocks)
+        safe_target = np.where(valid, target, 0)
+        valid &= (proj >= bins[safe_target] - halo) & (proj < bins[safe_target + 1] + halo)
+        yield partition_by_block_ids(np.where(valid, target, -1), num_blocks)
+
+TOWER_METHODS = {'dbscan': 'fit_towers_dbscan', 'grid': 'fit_towers_grid'}  # 电力塔检测方法 -> 方法名
+BLOCK_VOXEL_SIZE = 0.2  # 分块重建前的体素下采样尺寸（米），也是合并网格时的默认焊接距离
+MERGE_HALO = 10  # 合并分块网格时默认的重叠区宽度（米），保证相邻块网格在接缝处相接
+MERGED_MESH_NAME = 'merged_mesh.ply'  # 合并后网格的文件名
+
 class PointCloudHandler:
-    def read_point_cloud(self, file_path):
+    def point_cloud_origin(self, file_path):
+        """
+        确定点云文件的局部原点（坐标最小值向下取整到米）。LAS/LAZ只读文件头，.ply需要读入整个文件。
+        参数：
+            file_path (str): 点云文件路径（.ply/.las/.laz）
+        返回：
+            np.ndarray: 局部原点 (3,)，float64
+        用法：
+            origin = handler.point_cloud_origin(path)
+            for points, _, _ in handler.iter_point_chunks(path, origin=origin):
+                ...
+        """
+        file_path = str(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower()
+        if file_ext in ['.las', '.laz']:
+            return las_origin(file_path)
+        if file_ext != '.ply':
+            raise ValueError(f"不支持的文件格式: {file_ext}")
+        import open3d as o3d
+        points = np.asarray(o3d.io.read_point_cloud(file_path).points)
+        points = points[np.isfinite(points).all(axis=1)]
+        return np.floor(points.min(axis=0)) if len(points) else np.zeros(3)
+
+    def iter_point_chunks(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE, origin=None):
+        """
+        分块读取点云文件并去除无效点。.las/.laz为流式读取，.ply整体作为一块返回。
+        参数：
+            file_path (str): 点云文件路径
+            chunk_size (int): 每块点数
+            origin (array-like|None): 局部原点 (3,)；指定时产出减去原点的局部坐标，
+                减法在float64下完成后才转换为float32，大地坐标不损失精度
+        返回：
+            generator: 依次产出 (points, colors, intensity)，points为float32 (n, 3)
+        用法：
+            for points, colors, intensity in handler.iter_point_chunks(path):
+                ...
+        """
+        file_path = str(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower()
+        if file_ext == '.ply':
+            import open3d as o3d
+            pcd = o3d.io.read_point_cloud(file_path)
+            colors = np.asarray(pcd.colors, dtype=np.float32) if pcd.has_colors() else None
+            points = np.asarray(pcd.points)
+            if origin is not None:
+                points = points - np.asarray(origin, dtype=np.float64)
+            chunks = [(points.astype(np.float32), colors, None)]
+        elif file_ext in ['.las', '.laz']:
+            chunks = iter_las_chunks(file_path, chunk_size, origin=origin)
+        else:
+            raise ValueError(f"不支持的文件格式: {file_ext}")
+        for points, colors, intensity in chunks:
+            valid_mask = np.isfinite(points).all(axis=1)
+            if not valid_mask.all():
+                points = points[valid_mask]
+                if colors is not None:
+                    colors = colors[valid_mask]
+                if intensity is not None:
+                    intensity = intensity[valid_mask]
+            if len(points) > 0:
+                yield points, colors, intensity
+
+    def read_point_store(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE, sort=True):
+        """
+        读取点云文件为紧凑的PointStore（局部原点float32坐标，颜色/强度/原始序号各为一列），
+        去除无效点和离群点，并按Morton顺序排列。LAS/LAZ的原点取自文件头，各块坐标在float64下
+        减去原点后才转换为float32；离群点剔除和排序合并为一次重排，整个过程不产生float64的整幅坐标副本。
+        参数：
+            file_path (str): 点云文件路径（.ply/.las/.laz）
+            chunk_size (int): LAS/LAZ每次解码的点数
+            sort (bool): 是否按Morton顺序排列（否则保持文件顺序）
+        返回：
+            store (PointStore): 'index'列为各点在原文件中的序号
+        用法：
+            store = handler.read_point_store(path)
+            blocks = handler.split_point_store(store)
+        """
+        file_path = str(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower()
+        with stage('read') as span:
+            if file_ext == '.ply':
+                import open3d as o3d
+                pcd = o3d.io.read_point_cloud(file_path)
+                points = np.asarray(pcd.points)
+                colors = np.asarray(pcd.colors, dtype=np.float32) if pcd.has_colors() else None
+                finite = points[np.isfinite(points).all(axis=1)]
+                origin = np.floor(finite.min(axis=0)) if len(finite) else np.zeros(3)
+                chunks, total = [(points - origin, colors, None)], len(points)
+            elif file_ext in ['.las', '.laz']:
+                origin = las_origin(file_path)
+                chunks = iter_las_chunks(file_path, chunk_size, origin=origin)
+                total = las_point_count(file_path)
+            else:
+                raise ValueError(f"不支持的文件格式: {file_ext}")
+            store = PointStore.from_chunks(chunks, total, origin)
+            span.set_output(len(store))
+        if len(store) == 0:
+            raise ValueError("点云数据为空")
+        logger.info(f"点云读取完成: {file_path}，有效点数: {len(store)}")
+        with stage('outliers', len(store)) as span:
+            ind = remove_outliers_with_index(SpatialIndex(store.xyz))
+            span.set_output(len(ind))
+        if sort:
+            with stage('sort', len(ind)):
+                ind = ind[np.argsort(store.morton_codes()[ind], kind='stable')]
+        return store.reorder(ind)
+
+    def read_point_cloud(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE, return_index=False):
         """
         读取点云文件（支持.ply/.las/.laz），并去除无效点和离群点。
+        LAS/LAZ按块流式解码，直接写入预分配的float32数组，不产生整文件的float64副本。
         参数：
             file_path (str): 点云文件路径
+            chunk_size (int): LAS/LAZ每次解码的点数
+            return_index (bool): 是否额外返回保留点在原文件中的序号
         返回：
             points (np.ndarray): 点坐标 (N, 3)
             colors (np.ndarray|None): 颜色 (N, 3)
             intensity (np.ndarray|None): 强度 (N,)
+            point_index (np.ndarray): 保留点在原文件中的序号 (N,)，仅return_index=True时返回
         用法：
             points, colors, intensity = handler.read_point_cloud(path)
         """
         try:
             file_path = str(file_path)
             file_ext = os.path.splitext(file_path)[1].lower()
-            if file_ext == '.ply':
-                pcd = o3d.io.read_point_cloud(file_path)
-                points = np.asarray(pcd.points)
-                colors = np.asarray(pcd.colors) if pcd.has_colors() else None
-                intensity = None
-            elif file_ext in ['.las', '.laz']:
-                las = laspy.read(file_path)
-                points = np.vstack((las.x, las.y, las.z)).transpose()
-                if hasattr(las, 'red') and hasattr(las, 'green') and hasattr(las, 'blue'):
-                    colors = np.vstack((
-                        las.red / 65535.0,
-                        las.green / 65535.0,
-                        las.blue / 65535.0
-                    )).transpose()
-                else:
+            with stage('read') as span:
+                if file_ext == '.ply':
+                    import open3d as o3d
+                    pcd = o3d.io.read_point_cloud(file_path)
+                    points = np.asarray(pcd.points)
+                    colors = np.asarray(pcd.colors) if pcd.has_colors() else None
+                    intensity = None
+                elif file_ext in ['.las', '.laz']:
+                    total = las_point_count(file_path)
+                    if total == 0:
+                        raise ValueError("LAS文件不包含任何点")
+                    points = np.empty((total, 3), dtype=np.float32)
                     colors = None
-                if hasattr(las, 'intensity'):
-                    intensity = las.intensity
-                else:
                     intensity = None
-                if len(points) == 0:
-                    raise ValueError("LAS文件不包含任何点")
-                logger.info(f"成功读取LAS文件: {file_path}")
-                logger.info(f"点云大小: {len(points)} 点")
-            else:
-                raise ValueError(f"不支持的文件格式: {file_ext}")
+                    filled = 0
+                    for chunk_points, chunk_colors, chunk_intensity in iter_las_chunks(file_path, chunk_size):
+                        end = min(filled + len(chunk_points), total)
+                        count = end - filled
+                        points[filled:end] = chunk_points[:count]
+                        if chunk_colors is not None:
+                            if colors is None:
+                                colors = np.empty((total, 3), dtype=np.float32)
+                            colors[filled:end] = chunk_colors[:count]
+                        if chunk_intensity is not None:
+                            if intensity is None:
+                                intensity = np.empty(total, dtype=np.float32)
+                            intensity[filled:end] = chunk_intensity[:count]
+                        filled = end
+                        if filled == total:
+                            break
+                    points = points[:filled]
+                    if colors is not None:
+                        colors = colors[:filled]
+                    if intensity is not None:
+                        intensity = intensity[:filled]
+                    if len(points) == 0:
+                        raise ValueError("LAS文件不包含任何点")
+                    logger.info(f"成功读取LAS文件: {file_path}")
+                    logger.info(f"点云大小: {len(points)} 点")
+                else:
+                    raise ValueError(f"不支持的文件格式: {file_ext}")
+                span.set_output(len(points))
             if len(points) == 0:
                 raise ValueError("点云数据为空")
+            point_index = np.arange(len(points))
             if np.isnan(points).any() or np.isinf(points).any():
                 valid_mask = ~(np.isnan(points).any(axis=1) | np.isinf(points).any(axis=1))
                 points = points[valid_mask]
+                point_index = point_index[valid_mask]
                 if colors is not None:
                     colors = colors[valid_mask]
                 if intensity is not None:
                     intensity = intensity[valid_mask]
                 if len(points) == 0:
                     raise ValueError("移除无效点后点云为空")
-            points = points.astype(np.float32)
+            points = points.astype(np.float32, copy=False)
             if colors is not None:
-                colors = colors.astype(np.float32)
+                colors = colors.astype(np.float32, copy=False)
             if intensity is not None:
-                intensity = intensity.astype(np.float32)
+                intensity = intensity.astype(np.float32, copy=False)
             # 去除离群点
             filtered_points, ind = remove_outliers(points)
             if colors is not None:
@@ -98,12 +337,15 @@ class PointCloudHandler:
             if intensity is not None:
                 intensity = intensity[ind]
             points = filtered_points
+            if return_index:
+                return points, colors, intensity, point_index[ind]
             return points, colors, intensity
         except Exception as e:
             logger.error(f"读取点云文件失败: {str(e)}")
             raise
 
-    def fit_towers_dbscan(self, points, eps=3, min_samples=10, z_percentile=85):
+    def fit_towers_dbscan(self, points, eps=3, min_samples=10, z_percentile=85, core_mask=None, index=None,
+                          return_indices=False):
         """
         使用DBSCAN聚类算法检测高空点中的电力塔。
         参数：
@@ -111,29 +353,43 @@ class PointCloudHandler:
             eps (float): DBSCAN半径参数
             min_samples (int): DBSCAN最小样本数
             z_percentile (float): 选取高空点的z分位数
+            core_mask (np.ndarray|None): 核心区掩码 (N,)；指定时在完整点集（含重叠区）上聚类和筛选，
+                但每个簇只返回核心区内的点
+            index (SpatialIndex|None): points上已构建的空间索引（如特征计算时的索引）；
+                指定时邻域图直接在该索引上查询高空点，不再单独建树
+            return_indices (bool): 为True时返回每个塔的点在points中的索引，而不是点坐标
         返回：
-            tower_clusters (list): 每个电力塔的点云子集
+            tower_clusters (list): 每个电力塔的点云子集（或索引数组）
         用法：
             towers = handler.fit_towers_dbscan(points)
+            towers = handler.fit_towers_dbscan(points, index=SpatialIndex(points))
         """
+        from sklearn.cluster import DBSCAN
         try:
             z_threshold = np.percentile(points[:, 2], z_percentile)
-            high_points = points[points[:, 2] > z_threshold]
-            if len(high_points) == 0:
+            high_mask = points[:, 2] > z_threshold
+            high_idx = np.flatnonzero(high_mask)
+            if len(high_idx) == 0:
                 logger.warning("高空点太少，无法聚类电力塔")
                 return []
 
-            if len(high_points) > 50000:
-                idx = np.random.choice(len(high_points), 10000, replace=False)
-                high_points = high_points[idx]
+            if len(high_idx) > 50000:
+                high_idx = high_idx[np.random.choice(len(high_idx), 10000, replace=False)]
+            high_points = points[high_idx]
+            high_core = core_mask[high_idx] if core_mask is not None else None
 
-            from sklearn.neighbors import NearestNeighbors
-            nbrs = NearestNeighbors(n_neighbors=5).fit(high_points)
-            dists, _ = nbrs.kneighbors(high_points)
+            if index is None:
+                index = SpatialIndex(high_points)
+                subset = None
+            else:
+                subset = high_idx
+            # 复用索引中已缓存的kNN距离（共享索引时为全部点中的近邻）
+            dists, _ = index.knn(5, subset=subset)
             mean_dist = np.mean(dists[:, 1:])
             logger.info(f"DBSCAN参数: eps={eps:.2f}, min_samples={min_samples}, mean_dist={mean_dist:.2f}")
 
-            clustering = DBSCAN(eps=eps, min_samples=min_samples).fit(high_points)
+            graph = index.radius_graph(eps, subset=subset)
+            clustering = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit(graph)
             labels = clustering.labels_
             tower_clusters = []
             for label in set(labels):
@@ -145,121 +401,648 @@ class PointCloudHandler:
                 logger.info(f"label={label}, 点数={len(cluster_points)}, z_span={z_span:.2f}, xy_span={xy_span}")
                 # 放宽条件
                 if len(cluster_points) > 20 and z_span > 6:
-                    tower_clusters.append(cluster_points)
+                    cluster_idx = high_idx[labels == label]
+                    if high_core is not None:
+                        cluster_idx = cluster_idx[high_core[labels == label]]
+                        if len(cluster_idx) == 0:
+                            continue
+                    tower_clusters.append(cluster_idx if return_indices else points[cluster_idx])
             logger.info(f"DBSCAN聚类电力塔完成，找到塔数量: {len(tower_clusters)}")
             return tower_clusters
         except Exception as e:
             logger.error(f"DBSCAN聚类电力塔失败: {str(e)}")
             return []
 
-    def split_pointcloud_by_main_direction(self, points, block_length=200):
+    def fit_towers_grid(self, points, cell_size=1.0, min_cell_points=10, min_cell_span=6.0, min_points=20,
+                        min_z_span=20.0, min_height=10.0, floor_window=20.0, margin=1.0, core_mask=None,
+                        return_indices=False):
         """
-        按主方向将点云分块。
+        基于平面柱状格网检测电力塔：只用高出局部地面min_height的高空点判断候选格，
+        高空点数和高差足够的格按8邻域连通后外扩margin，范围内的全部点为一个簇，
+        簇高差达到min_z_span才输出为塔（植被高度不足，不会被当作电力塔）。
+        计算量与点数成线性关系，结果确定，返回值与fit_towers_dbscan相同。
         参数：
             points (np.ndarray): 点云 (N, 3)
-            block_length (float): 每块长度
+            cell_size (float): 格网边长（米）
+            min_cell_points (int): 候选格的最少高空点数
+            min_cell_span (float): 候选格中高空点的最小高差（米），应大于上下层导线的间距
+            min_points (int): 电力塔的最少点数（同fit_towers_dbscan的簇点数条件）
+            min_z_span (float): 电力塔的最小高差（米），应明显大于植被高度
+            min_height (float): 高空点距局部地面的最小高度（米）
+            floor_window (float): 估计局部地面的窗口边长（米），应大于塔基宽度
+            margin (float): 连通区域向外扩展的宽度（米）
+            core_mask (np.ndarray|None): 核心区掩码 (N,)；指定时在完整点集上检测和筛选，每个塔只返回核心区内的点
+            return_indices (bool): 为True时返回每个塔的点在points中的索引，而不是点坐标
         返回：
-            blocks (list): 分块后的点云列表
+            tower_clusters (list): 每个电力塔的点云子集（或索引数组）
         用法：
-            blocks = handler.split_pointcloud_by_main_direction(points)
+            towers = handler.fit_towers_grid(points, cell_size=2.0)
+            towers = handler.fit_towers_grid(points, min_height=15.0, min_z_span=30.0)
+        """
+        try:
+            if len(points) == 0:
+                return []
+            cells = np.floor(np.asarray(points[:, :2], dtype=np.float64) / cell_size).astype(np.int64)
+            cells -= cells.min(axis=0)
+            shape = cells.max(axis=0) + 1
+            flat = cells[:, 0] * shape[1] + cells[:, 1]
+            num_cells = int(shape[0] * shape[1])
+            z = np.asarray(points[:, 2], dtype=np.float64)
+            floor = np.full(num_cells, np.inf)
+            np.minimum.at(floor, flat, z)
+            window = 2 * int(np.ceil(floor_window / cell_size / 2)) + 1
+            floor = ndimage.minimum_filter(floor.reshape(tuple(shape)), size=window, mode='nearest').reshape(-1)
+            high = np.flatnonzero(z - floor[flat] >= min_height)
+            count = np.bincount(flat[high], minlength=num_cells)
+            z_min = np.full(num_cells, np.inf)
+            z_max = np.full(num_cells, -np.inf)
+            np.minimum.at(z_min, flat[high], z[high])
+            np.maximum.at(z_max, flat[high], z[high])
+            candidate = (count >= min_cell_points) & (z_max - z_min >= min_cell_span)
+            labels, num = ndimage.label(candidate.reshape(tuple(shape)), structure=np.ones((3, 3), dtype=int))
+            logger.info(f"格网参数: cell_size={cell_size:.2f}, 候选格数={int(candidate.sum())}, 连通区域数={num}")
+            if num == 0:
+                logger.info("格网检测电力塔完成，找到塔数量: 0")
+                return []
+            if margin > 0:
+                grow = 2 * int(np.ceil(margin / cell_size)) + 1
+                labels = ndimage.grey_dilation(labels, size=(grow, grow))
+            point_labels = labels.reshape(-1)[flat] - 1
+            # 只对落在候选区域内的点排序分组
+            member = np.flatnonzero(point_labels >= 0)
+            order, counts = partition_by_block_ids(point_labels[member], num)
+            order = member[order]
+            tower_clusters = []
+            start = 0
+            for label, n in enumerate(counts):
+                sel = order[start:start + n]
+                start += n
+                cluster_points = points[sel]
+                z_span = cluster_points[:, 2].max() - cluster_points[:, 2].min()
+                xy_span = np.ptp(cluster_points[:, :2], axis=0)
+                logger.info(f"label={label}, 点数={n}, z_span={z_span:.2f}, xy_span={xy_span}")
+                if n > min_points and z_span > min_z_span:
+                    if core_mask is not None:
+                        sel = sel[core_mask[sel]]
+                        if len(sel) == 0:
+                            continue
+                    tower_clusters.append(sel if return_indices else points[sel])
+            logger.info(f"格网检测电力塔完成，找到塔数量: {len(tower_clusters)}")
+            return tower_clusters
+        except Exception as e:
+            logger.error(f"格网检测电力塔失败: {str(e)}")
+            return []
+
+    def _main_direction_bins(self, points, block_length):
         """
+        拟合点云平面主方向，返回各点投影和分块边界。
+        参数：
+            points (np.ndarray): 点云 (N, 3)
+            block_length (float): 每块长度
+        返回：
+            proj (np.ndarray): 各点在主方向上的投影 (N,)
+            bins (np.ndarray): 分块边界
+        """
+        from sklearn.decomposition import PCA
         pca = PCA(n_components=1)
         main_axis = pca.fit(points[:, :2]).components_[0]
         proj = points[:, 0] * main_axis[0] + points[:, 1] * main_axis[1]
         min_proj, max_proj = np.min(proj), np.max(proj)
         bins = np.arange(min_proj, max_proj + block_length, block_length)
+        return proj, bins
+
+    def split_pointcloud_by_main_direction(self, points, block_length=200, point_index=None):
+        """
+        按主方向将点云分块。
+        参数：
+            points (np.ndarray): 点云 (N, 3)
+            block_length (float): 每块长度
+            point_index (np.ndarray|None): 每个点的序号 (N,)；指定时随点一起分块
+        返回：
+            blocks (list): 分块后的点云列表；指定point_index时为 [(block_points, block_index), ...]
+        用法：
+            blocks = handler.split_pointcloud_by_main_direction(points)
+        """
+        with stage('split', len(points)):
+            proj, bins = self._main_direction_bins(points, block_length)
+            block_ids = np.searchsorted(bins, proj, side='right') - 1
+            order, counts = partition_by_block_ids(block_ids, len(bins) - 1)
+            sorted_points = points[order]
+        sorted_index = point_index[order] if point_index is not None else None
+        blocks = []
+        start = 0
+        for count in counts:
+            if count > 0:
+                block = sorted_points[start:start + count]
+                blocks.append(block if sorted_index is None else (block, sorted_index[start:start + count]))
+            start += count
+        return blocks
+
+    def split_point_store(self, store, block_length=200, with_index=False):
+        """
+        按主方向分块PointStore：按块号稳定重排存储（块内保持Morton顺序），
+        每块是store.xyz上的连续切片，不复制坐标。分块规则同split_pointcloud_by_main_direction。
+        参数：
+            store (PointStore): 点云存储，会被原地重排
+            block_length (float): 每块长度
+            with_index (bool): 为True时每块附带'index'列（原文件序号）的切片
+        返回：
+            blocks (list): 块坐标视图列表；with_index=True时为 [(block_points, block_index), ...]
+        用法：
+            blocks = handler.split_point_store(store, block_length=100)
+        """
+        with stage('split', len(store)):
+            proj, bins = self._main_direction_bins(store.xyz, block_length)
+            block_ids = np.clip(np.searchsorted(bins, proj, side='right') - 1, 0, len(bins) - 2)
+            bounds = store.partition(block_ids, len(bins) - 1)
+        if not with_index:
+            return [store.xyz[start:stop] for start, stop in bounds]
+        index = store.column('index')
+        return [(store.xyz[start:stop], index[start:stop]) for start, stop in bounds]
+
+    def split_pointcloud_with_halo(self, points, block_length=200, halo=10, point_index=None):
+        """
+        按主方向分块，并为每块附加相邻块中距分块边界halo以内的重叠点。
+        重叠点只用于邻域查询和聚类，核心区掩码标出本块负责输出的点，
+        各块核心区互不重叠，合并后每个点只输出一次。
+        参数：
+            points (np.ndarray): 点云 (N, 3)
+            block_length (float): 每块长度
+            halo (float): 重叠区宽度
+            point_index (np.ndarray|None): 每个点的序号 (N,)；指定时随点一起分块
+        返回：
+            blocks (list): [(block_points, core_mask), ...]，核心点在前、重叠点在后；
+                指定point_index时为 [(block_points, core_mask, block_index), ...]
+        用法：
+            for block, core_mask in handler.split_pointcloud_with_halo(points, 100, halo=10):
+                ...
+        """
+        with stage('split', len(points)):
+            proj, bins = self._main_direction_bins(points, block_length)
+            num_blocks = len(bins) - 1
+            block_ids = np.searchsorted(bins, proj, side='right') - 1
+            order, counts = partition_by_block_ids(block_ids, num_blocks)
+            core_parts = np.split(order, np.cumsum(counts)[:-1])
+            halo_parts = [[] for _ in range(num_blocks)]
+            for halo_order, halo_counts in halo_partitions(proj, block_ids, bins, halo):
+                for i, part in enumerate(np.split(halo_order, np.cumsum(halo_counts)[:-1])):
+                    if len(part) > 0:
+                        halo_parts[i].append(part)
         blocks = []
-        for i in range(len(bins) - 1):
-            mask = (proj >= bins[i]) & (proj < bins[i + 1])
-            if np.sum(mask) == 0:
+        for core, halos in zip(core_parts, halo_parts):
+            if len(core) == 0:
                 continue
-            blocks.append(points[mask])
+            members = np.concatenate([core] + halos)
+            core_mask = np.zeros(len(members), dtype=bool)
+            core_mask[:len(core)] = True
+            if point_index is None:
+                blocks.append((points[members], core_mask))
+            else:
+                blocks.append((points[members], core_mask, point_index[members]))
         return blocks
 
-    def extract_powerlines_csf_pca_blockwise(self, file_path, output_file, use_csf=True, block_length=200):
+    def split_pointcloud_to_disk(self, file_path, spill_dir, block_length=200, sample_size=1000000,
+                                 chunk_size=DEFAULT_CHUNK_SIZE, halo=0, with_index=False):
         """
-        分块提取电力线点（CSF+PCA+特征），并保存彩色点云。
+        外存两遍分块：不把整个点云读入内存，按主方向分块写入磁盘。
+        分块文件保存相对局部原点的float32坐标（各块在float64下减去原点后才转换），与read_point_store一致。
+        第一遍流式读取并等间隔抽样，用样本拟合主方向并确定分块范围；
+        第二遍逐块投影，用一次稳定排序把每个读取块分区后追加写入各分块文件。
+        超出样本投影范围的点归入首/末块。halo>0时重叠点另写入 *_halo.bin 文件；
+        with_index=True时核心点在原文件中的序号另写入 *_idx.bin 文件（int64）。
         参数：
             file_path (str): 输入点云文件路径
-            output_file (str): 输出点云文件路径
+            spill_dir (str): 分块文件输出目录
+            block_length (float): 每块长度
+            sample_size (int): 拟合主方向的最大样本点数
+            chunk_size (int): 每次读取的点数
+            halo (float): 重叠区宽度，0表示不写重叠点
+            with_index (bool): 是否写出核心点的序号文件，用load_block_index读取
+        返回：
+            block_paths (list): 非空分块文件路径列表（按投影顺序），用load_block/load_block_with_halo读取
+            origin (np.ndarray): 分块文件坐标的局部原点 (3,)，结果加上它即为世界坐标
+        用法：
+            block_paths, origin = handler.split_pointcloud_to_disk(path, 'temp/blocks')
+            block = handler.load_block(block_paths[0]) + origin
+        """
+        from sklearn.decomposition import PCA
+        os.makedirs(spill_dir, exist_ok=True)
+        origin = self.point_cloud_origin(file_path)
+        # 第一遍：等间隔抽样，样本超过上限时步长加倍
+        step = 1
+        seen = 0
+        samples = []
+        sample_count = 0
+        for points, _, _ in self.iter_point_chunks(file_path, chunk_size, origin=origin):
+            first = (-seen) % step
+            sample = points[first::step, :2]
+            seen += len(points)
+            samples.append(sample)
+            sample_count += len(sample)
+            if sample_count > 2 * sample_size:
+                samples = [np.vstack(samples)[::2]]
+                sample_count = len(samples[0])
+                step *= 2
+        if sample_count == 0:
+            raise ValueError("点云数据为空")
+        # 样本是局部坐标，转为float64后拟合主方向和计算投影
+        sample = np.vstack(samples).astype(np.float64)
+        main_axis = PCA(n_components=1).fit(sample).components_[0]
+        sample_proj = sample[:, 0] * main_axis[0] + sample[:, 1] * main_axis[1]
+        min_proj, max_proj = np.min(sample_proj), np.max(sample_proj)
+        bins = np.arange(min_proj, max_proj + block_length, block_length)
+        num_blocks = len(bins) - 1
+        logger.info(f"外存分块第一遍完成: 总点数{seen}，样本点数{len(sample)}，分块数{num_blocks}")
+        # 第二遍：按投影分区并追加写入分块文件
+        block_paths = [os.path.join(spill_dir, f"spill_{i:05d}.bin") for i in range(num_blocks)]
+        halo_paths = [self._halo_path(block_path) for block_path in block_paths]
+        index_paths = [self._index_path(block_path) for block_path in block_paths]
+        for path in block_paths + halo_paths + index_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        block_counts = np.zeros(num_blocks, dtype=np.int64)
+        offset = 0
+        for points, _, _ in self.iter_point_chunks(file_path, chunk_size, origin=origin):
+            proj = points[:, :2].astype(np.float64) @ main_axis
+            block_ids = np.clip(np.searchsorted(bins, proj, side='right') - 1, 0, num_blocks - 1)
+            order, counts = partition_by_block_ids(block_ids, num_blocks)
+            self._append_partitions(points, order, counts, block_paths)
+            if with_index:
+                self._append_partitions(np.arange(offset, offset + len(points)), order, counts, index_paths,
+                                        dtype=np.int64)
+            offset += len(points)
+            block_counts += counts
+            for halo_order, halo_counts in halo_partitions(proj, block_ids, bins, halo):
+                self._append_partitions(points, halo_order, halo_counts, halo_paths)
+        logger.info(f"外存分块第二遍完成，分块文件目录: {spill_dir}")
+        return [path for path, count in zip(block_paths, block_counts) if count > 0], origin
+
+    def load_block(self, block_path):
+        """
+        读取split_pointcloud_to_disk写出的分块文件。
+        参数：
+            block_path (str): 分块文件路径
+        返回：
+            block (np.ndarray): float32块点云 (n, 3)，相对split_pointcloud_to_disk返回的局部原点
+        用法：
+            block = handler.load_block(block_paths[0])
+        """
+        return np.fromfile(block_path, dtype=np.float32).reshape(-1, 3)
+
+    def load_block_with_halo(self, block_path):
+        """
+        读取分块文件及其重叠点文件（若存在）。
+        参数：
+            block_path (str): 分块文件路径
+        返回：
+            block (np.ndarray): float32块点云 (n, 3)，核心点在前
+            core_mask (np.ndarray): 核心区掩码 (n,)
+        用法：
+            block, core_mask = handler.load_block_with_halo(block_paths[0])
+        """
+        core = self.load_block(block_path)
+        halo_path = self._halo_path(block_path)
+        block = np.vstack((core, self.load_block(halo_path))) if os.path.exists(halo_path) else core
+        core_mask = np.zeros(len(block), dtype=bool)
+        core_mask[:len(core)] = True
+        return block, core_mask
+
+    def load_block_index(self, block_path):
+        """
+        读取split_pointcloud_to_disk(with_index=True)写出的核心点序号。
+        参数：
+            block_path (str): 分块文件路径
+        返回：
+            point_index (np.ndarray): 核心点在原文件中的序号 (n,)
+        """
+        return np.fromfile(self._index_path(block_path), dtype=np.int64)
+
+    def _halo_path(self, block_path):
+        return os.path.splitext(block_path)[0] + '_halo.bin'
+
+    def _index_path(self, block_path):
+        return os.path.splitext(block_path)[0] + '_idx.bin'
+
+    def _append_partitions(self, points, order, counts, paths, dtype=np.float32):
+        """
+        把按块分区后的点依次追加写入对应的分块文件。
+        参数：
+            points (np.ndarray): 点云 (N, 3)，或其他逐点数组（如点序号）
+            order (np.ndarray): partition_by_block_ids返回的排序索引
+            counts (np.ndarray): 每块点数
+            paths (list): 每块的文件路径
+            dtype (np.dtype): 写出的数据类型
+        """
+        sorted_points = np.ascontiguousarray(points[order], dtype=dtype)
+        start = 0
+        for i in np.flatnonzero(counts):
+            end = start + counts[i]
+            with open(paths[i], 'ab') as f:
+                sorted_points[start:end].tofile(f)
+            start = end
+
+    def _separate_ground(self, idx, block, use_csf, ground_params=None):
+        """
+        分块地面分离：CSF不可用或未启用时使用栅格地面滤波（最低点格网 -> DTM -> 离地高度阈值）。
+        参数：
+            idx (int): 块序号（从0开始）
+            block (np.ndarray): 块点云 (n, 3)
+            use_csf (bool): 是否使用CSF地面分离
+            ground_params (dict|None): GroundFilter的参数（cell_size、window、height_threshold），
+                缺省项使用DEFAULT_GROUND_PARAMS
+        返回：
+            ground_mask (np.ndarray): 地面点掩码 (n,)
+        """
+        if use_csf:
+            try:
+                from CSF import CSF
+                csf = CSF()
+                csf.setPointCloud(block)
+                csf.params.bSloopSmooth = True
+                csf.params.cloth_resolution = 1.0
+                csf.params.rigidness = 3
+                csf.params.time_step = 0.65
+                csf.params.class_threshold = 0.5
+                csf.do_filtering()
+                ground_mask = np.zeros(len(block), dtype=bool)
+                ground_mask[np.asarray(csf.groundIndexes(), dtype=int)] = True
+                logger.info(f"第{idx+1}块CSF分离: 地面点{ground_mask.sum()}，非地面点{len(block) - ground_mask.sum()}")
+                return ground_mask
+            except Exception as e:
+                logger.warning(f"第{idx+1}块CSF不可用，切换为栅格地面滤波: {e}")
+        ground_filter = GroundFilter(**dict(DEFAULT_GROUND_PARAMS, **(ground_params or {})))
+        ground_mask = ground_filter.fit(block).ground_mask(block)
+        logger.info(f"第{idx+1}块栅格地面滤波: 地面点{ground_mask.sum()}，非地面点{len(block) - ground_mask.sum()}")
+        return ground_mask
+
+    def _extract_block(self, idx, block, total, use_csf, line_thresholds=None, tower_params=None, ground_params=None,
+                       cache_dir=None, tower_method='dbscan', core_mask=None, return_labels=False):
+        """
+        处理单个分块：地面分离、邻域特征计算、电力线筛选和电力塔聚类。
+        参数：
+            idx (int): 块序号（从0开始）
+            block (np.ndarray): 块点云 (n, 3)
+            total (int): 总块数
+            use_csf (bool): 是否使用CSF地面分离
+            line_thresholds (dict|None): 电力线特征阈值，见line_mask_from_features
+            tower_params (dict|None): 电力塔检测方法的参数
+            ground_params (dict|None): 栅格地面滤波参数，见_separate_ground
+            cache_dir (str|None): 分块中间结果缓存目录；指定时地面分离、特征和电力塔簇
+                保存为 .npy 并在下次运行时按块内容复用，只重算输入变化的阶段
+            tower_method (str): 电力塔检测方法，'dbscan'（fit_towers_dbscan）或 'grid'（fit_towers_grid）
+            core_mask (np.ndarray|None): 核心区掩码 (n,)；指定时邻域特征和聚类使用整个块（含重叠区），
+                只输出核心区的点
+            return_labels (bool): 为True时返回块内每个点的LAS分类码，而不是分类后的点坐标
+        返回：
+            result (tuple|None): (ground_points, line_points, tower_clusters)，块被跳过时为None
+            labels (np.ndarray): return_labels=True时返回 (n,) uint8 分类码（地面2、电力线14、电力塔15、其余1），
+                块被跳过时其中的点为未分类；指定core_mask时重叠区的点也有分类码，由调用方按核心区截取
+        用法：
+            result = handler._extract_block(0, block, len(blocks), True)
+            labels = handler._extract_block(0, block, len(blocks), True, return_labels=True)
+        """
+        logger.info(f"处理第{idx+1}/{total}块，点数: {len(block)}")
+        labels = np.full(len(block), CLASS_UNCLASSIFIED, dtype=np.uint8) if return_labels else None
+        if len(block) < 50:
+            logger.info(f"第{idx+1}块点数过少，跳过")
+            return labels
+        cache = BlockCache(cache_dir, block) if cache_dir is not None else None
+        # 地面分离结果及其下游的特征都取决于地面分离方式和参数
+        ground_key = f"csf{int(bool(use_csf))}_{params_key(ground_params)}"
+        ground_name = f"ground_{ground_key}"
+        ground_mask = cache.load(ground_name) if cache is not None else None
+        if ground_mask is None:
+            with stage('ground', len(block)) as span:
+                ground_mask = self._separate_ground(idx, block, use_csf, ground_params)
+                span.set_output(int(ground_mask.sum()))
+            if cache is not None:
+                cache.save(ground_name, ground_mask)
+        else:
+            logger.info(f"第{idx+1}块复用缓存的地面分离结果")
+        ground_mask = np.asarray(ground_mask)
+        if labels is not None:
+            labels[ground_mask] = CLASS_GROUND
+        ground_points = block[ground_mask]
+        non_ground_points = block[~ground_mask]
+        non_ground_core = None
+        if core_mask is not None:
+            ground_points = ground_points[core_mask[ground_mask]]
+            non_ground_core = core_mask[~ground_mask]
+        k = 20
+        if len(non_ground_points) < k:
+            logger.info(f"第{idx+1}块非地面点过少，跳过")
+            return labels
+        # 非地面点的共享索引：特征邻域和电力塔聚类共用同一棵树和同一份邻居列表
+        index = SpatialIndex(non_ground_points)
+        feature_name = f"features_{ground_key}_k{k}"
+        features = cache.load(feature_name) if cache is not None else None
+        if features is None:
+            with stage('knn', len(non_ground_points)):
+                _, indices = index.knn(k)
+            with stage('eigen_features', len(indices)):
+                features = compute_eigen_features(non_ground_points, indices)
+            if cache is not None:
+                cache.save(feature_name, features)
+        else:
+            logger.info(f"第{idx+1}块复用缓存的邻域特征")
+        mask = line_mask_from_features(features, line_thresholds)
+        if non_ground_core is not None:
+            mask &= non_ground_core
+        line_points = non_ground_points[mask]
+        logger.info(f"第{idx+1}块电力线候选点: {len(line_points)}")
+        tower_name = None
+        tower_indices = None
+        if cache is not None:
+            # 缓存每个塔在非地面点中的索引，点坐标和分类码都由索引得到
+            tower_name = "towers_idx_" + params_key({
+                "ground": ground_key,
+                "tower_method": tower_method,
+                "tower_params": tower_params,
+                "core": array_digest(core_mask) if core_mask is not None else None,
+            })
+            tower_indices = cache.load_list(tower_name)
+        if tower_indices is None:
+            fit_towers = getattr(self, TOWER_METHODS[tower_method])
+            # 只有DBSCAN做邻域查询，复用特征计算的共享索引
+            shared = {'index': index} if tower_method == 'dbscan' else {}
+            with stage(f'towers_{tower_method}', len(non_ground_points)) as span:
+                tower_indices = fit_towers(non_ground_points, core_mask=non_ground_core, return_indices=True,
+                                           **shared, **(tower_params or {}))
+                span.set_output(sum(len(ind) for ind in tower_indices))
+            if cache is not None:
+                cache.save_list(tower_name, [ind.reshape(-1, 1) for ind in tower_indices], width=1, dtype=np.int64)
+        else:
+            tower_indices = [np.asarray(ind).reshape(-1) for ind in tower_indices]
+            logger.info(f"第{idx+1}块复用缓存的电力塔聚类结果")
+        logger.info(f"第{idx+1}块电力塔簇数: {len(tower_indices)}")
+        if labels is not None:
+            non_ground_labels = np.full(len(non_ground_points), CLASS_UNCLASSIFIED, dtype=np.uint8)
+            non_ground_labels[mask] = CLASS_CONDUCTOR
+            # 电力塔优先于电力线：塔身上的线状构件归为塔
+            for ind in tower_indices:
+                non_ground_labels[ind] = CLASS_TOWER
+            labels[~ground_mask] = non_ground_labels
+            return labels
+        tower_points = [non_ground_points[ind] for ind in tower_indices]
+        return ground_points, line_points, tower_points
+
+    def _extract_halo_block(self, idx, block, core_mask, total, use_csf, line_thresholds=None, tower_params=None,
+                            ground_params=None, cache_dir=None, tower_method='dbscan'):
+        """
+        处理带重叠区的分块，供run_blocks按 (block, core_mask) 调用。
+        参数同_extract_block。
+        """
+        return self._extract_block(idx, block, total, use_csf, line_thresholds, tower_params, ground_params, cache_dir,
+                                   tower_method, core_mask=core_mask)
+
+    def _classify_block(self, idx, block, point_index, total, use_csf, line_thresholds=None, tower_params=None,
+                        ground_params=None, cache_dir=None, tower_method='dbscan'):
+        """
+        计算单个分块的LAS分类码，供run_blocks按 (block, point_index) 调用。
+        参数：
+            point_index (np.ndarray): 块内各点在原文件中的序号 (n,)
+            其余参数同_extract_block
+        返回：
+            (point_index, labels): 点序号 (n,) 及其分类码 (n,)
+        """
+        labels = self._extract_block(idx, block, total, use_csf, line_thresholds, tower_params, ground_params, cache_dir,
+                                     tower_method, return_labels=True)
+        return point_index, labels
+
+    def _classify_halo_block(self, idx, block, core_mask, point_index, total, use_csf, line_thresholds=None,
+                             tower_params=None, ground_params=None, cache_dir=None, tower_method='dbscan'):
+        """
+        计算带重叠区分块中核心点的LAS分类码，供run_blocks按 (block, core_mask, point_index) 调用。
+        参数：
+            point_index (np.ndarray): 块内各点（含重叠点）在原文件中的序号 (n,)
+            其余参数同_extract_block
+        返回：
+            (point_index, labels): 核心点的序号及其分类码
+        """
+        labels = self._extract_block(idx, block, total, use_csf, line_thresholds, tower_params, ground_params, cache_dir,
+                                     tower_method, core_mask=core_mask, return_labels=True)
+        return point_index[core_mask], labels[core_mask]
+
+    def _extract_block_file(self, idx, block_path, total, use_csf, line_thresholds=None, tower_params=None,
+                            ground_params=None, cache_dir=None, tower_method='dbscan', return_labels=False):
+        """
+        读取外存分块文件（含重叠点文件），去除离群点后按_extract_block处理。
+        参数：
+            idx (int): 块序号（从0开始）
+            block_path (str): 分块文件路径
+            total (int): 总块数
             use_csf (bool): 是否使用CSF地面分离
+            line_thresholds (dict|None): 电力线特征阈值
+            tower_params (dict|None): 电力塔检测方法的参数
+            ground_params (dict|None): 栅格地面滤波参数
+            cache_dir (str|None): 分块中间结果缓存目录
+            tower_method (str): 电力塔检测方法
+            return_labels (bool): 为True时返回核心点的 (point_index, labels)，分块须由
+                split_pointcloud_to_disk(with_index=True) 写出；离群点不在结果中
+        返回：
+            result (tuple|None): 同_extract_block；return_labels=True时为 (point_index, labels)
+        """
+        block, core_mask = self.load_block_with_halo(block_path)
+        block, ind = remove_outliers(block)
+        core_mask = core_mask[ind]
+        result = self._extract_block(idx, block, total, use_csf, line_thresholds, tower_params, ground_params,
+                                     cache_dir, tower_method, core_mask=None if core_mask.all() else core_mask,
+                                     return_labels=return_labels)
+        if not return_labels:
+            return result
+        # 核心点在块文件中排在前面，保留下来的核心点在块内的位置即ind[core_mask]
+        point_index = self.load_block_index(block_path)[ind[core_mask]]
+        return point_index, result[core_mask]
+
+    def extract_powerlines_csf_pca_blockwise(self, file_path, output_file, use_csf=True, block_length=200, workers=1,
+                                             chunk_size=DEFAULT_CHUNK_SIZE, spill_dir=None, halo=0,
+                                             progress_callback=None, line_thresholds=None, tower_params=None,
+                                             ground_params=None, cache_dir=None, tower_method='dbscan'):
+        """
+        分块提取电力线点（CSF+PCA+特征），并保存彩色点云。
+        output_file以 .las/.laz 结尾时（输入须为LAS/LAZ）改为写出分类点云：每个输入点恰好输出一次，
+        保留原有属性，classification字段为 地面2、电力线14、电力塔15、离群点/无效点7、其余1。
+        参数：
+            file_path (str): 输入点云文件路径
+            output_file (str): 输出点云文件路径（.ply等为彩色点云，.las/.laz为分类点云）
+            use_csf (bool): 是否使用CSF地面分离；为False（或CSF不可用）时使用栅格地面滤波
             block_length (float): 分块长度
+            workers (int): 并行处理分块的进程数，1为单进程顺序处理
+            chunk_size (int): 读取LAS/LAZ时每次解码的点数
+            spill_dir (str|None): 外存分块目录；指定时不整体读入点云，而是先分块写入磁盘，
+                每次只加载一个块（离群点按块去除）
+            halo (float): 分块重叠区宽度；大于0时每块额外加载相邻halo范围内的点用于邻域特征和电力塔聚类，
+                只输出本块核心区的结果，可在缩小block_length时保持分块边界处的精度
+            progress_callback (callable|None): 进度回调 progress_callback(已完成块数, 总块数)
+            line_thresholds (dict|None): 电力线特征阈值，默认 DEFAULT_LINE_THRESHOLDS
+            tower_params (dict|None): 电力塔检测方法的参数（dbscan: eps、min_samples、z_percentile；
+                grid: cell_size、min_cell_points、min_cell_span等，见fit_towers_grid）
+            ground_params (dict|None): 栅格地面滤波参数（cell_size、window、height_threshold），
+                默认 DEFAULT_GROUND_PARAMS
+            cache_dir (str|None): 分块中间结果缓存目录；调整阈值或聚类参数后重新运行时，
+                地面分离和特征从内存映射的 .npy 复用（特征命中时不再构建kNN邻域），只重算最终分类和输入变化的阶段；
+                目录总大小超过 DEFAULT_BLOCK_CACHE_MAX_BYTES 时按LRU淘汰最久未访问的块
+            tower_method (str): 电力塔检测方法，'dbscan' 或 'grid'（线性时间、结果确定的柱状格网检测）
+        异常：
+            Exception: 读取、分块处理或写出失败时记录日志后原样抛出；未检测到有效点时不抛出，也不生成彩色点云文件
         用法：
-            handler.extract_powerlines_csf_pca_blockwise(infile, outfile)
+            handler.extract_powerlines_csf_pca_blockwise(infile, outfile, workers=4)
+            handler.extract_powerlines_csf_pca_blockwise(infile, outfile, spill_dir='temp/blocks')
+            handler.extract_powerlines_csf_pca_blockwise(infile, outfile, block_length=100, halo=10)
+            handler.extract_powerlines_csf_pca_blockwise(infile, outfile, cache_dir='temp/block_cache',
+                                                         line_thresholds={'linearity': 0.85})
+            handler.extract_powerlines_csf_pca_blockwise(infile, outfile, tower_method='grid')
+            handler.extract_powerlines_csf_pca_blockwise('xxx.las', 'classified.laz')
         """
-        import open3d as o3d
-        from sklearn.decomposition import PCA
-        from sklearn.cluster import DBSCAN
-        from sklearn.neighbors import NearestNeighbors
+        if tower_method not in TOWER_METHODS:
+            raise ValueError(f"不支持的电力塔检测方法: {tower_method}")
+        classify = output_file.lower().endswith(('.las', '.laz'))
+        if classify and not file_path.lower().endswith(('.las', '.laz')):
+            raise ValueError("输出LAS/LAZ分类点云时输入文件须为LAS/LAZ")
+        if classify:
+            self._classify_powerlines_blockwise(file_path, output_file, use_csf, block_length, workers, chunk_size,
+                                                spill_dir, halo, progress_callback, line_thresholds, tower_params,
+                                                ground_params, cache_dir, tower_method)
+            return
         try:
             logger.info(f"读取点云文件: {file_path}")
-            points, colors, intensity = self.read_point_cloud(file_path)
-            logger.info(f"点云总点数: {len(points)}")
-            blocks = self.split_pointcloud_by_main_direction(points, block_length=block_length)
-            logger.info(f"分块数量: {len(blocks)}，每块长度: {block_length}")
+            if spill_dir is not None:
+                # 分块文件为局部坐标，结果点在写文件前平移回世界坐标
+                block_paths, origin = self.split_pointcloud_to_disk(file_path, spill_dir, block_length=block_length,
+                                                                    chunk_size=chunk_size, halo=halo)
+                logger.info(f"分块数量: {len(block_paths)}，每块长度: {block_length}，重叠区: {halo}")
+                results = run_tasks(self._extract_block_file, block_paths, workers=workers,
+                                    args=(len(block_paths), use_csf, line_thresholds, tower_params, ground_params,
+                                          cache_dir, tower_method),
+                                    progress=progress_callback)
+            else:
+                # 各块在局部坐标下处理，结果点在写文件前平移回世界坐标
+                store = self.read_point_store(file_path, chunk_size=chunk_size)
+                origin = store.origin
+                logger.info(f"点云总点数: {len(store)}")
+                if halo > 0:
+                    blocks = self.split_pointcloud_with_halo(store.xyz, block_length=block_length, halo=halo)
+                    block_fn = self._extract_halo_block
+                else:
+                    blocks = self.split_point_store(store, block_length=block_length)
+                    block_fn = self._extract_block
+                del store
+                logger.info(f"分块数量: {len(blocks)}，每块长度: {block_length}，重叠区: {halo}")
+                results = run_blocks(block_fn, blocks, workers=workers,
+                                     args=(len(blocks), use_csf, line_thresholds, tower_params, ground_params,
+                                           cache_dir, tower_method),
+                                     progress=progress_callback)
             all_ground_points = []
             all_line_points = []
             all_tower_points = []
-            for idx, block in enumerate(blocks):
-                logger.info(f"处理第{idx+1}/{len(blocks)}块，点数: {len(block)}")
-                if len(block) < 50:
-                    logger.info(f"第{idx+1}块点数过少，跳过")
-                    continue
-                if use_csf:
-                    try:
-                        from CSF import CSF
-                        csf = CSF()
-                        csf.setPointCloud(block)
-                        csf.params.bSloopSmooth = True
-                        csf.params.cloth_resolution = 1.0
-                        csf.params.rigidness = 3
-                        csf.params.time_step = 0.65
-                        csf.params.class_threshold = 0.5
-                        csf.do_filtering()
-                        ground_idx = csf.groundIndexes()
-                        non_ground_idx = csf.offGroundIndexes()
-                        ground_points = block[ground_idx]
-                        non_ground_points = block[non_ground_idx]
-                        logger.info(f"第{idx+1}块CSF分离: 地面点{len(ground_points)}，非地面点{len(non_ground_points)}")
-                    except Exception as e:
-                        logger.warning(f"第{idx+1}块CSF不可用，切换为z分位数过滤: {e}")
-                        z_thresh = np.percentile(block[:, 2], 30)
-                        ground_mask = block[:, 2] <= z_thresh
-                        ground_points = block[ground_mask]
-                        non_ground_points = block[~ground_mask]
-                        logger.info(f"第{idx+1}块z分位数分离: 地面点{len(ground_points)}，非地面点{len(non_ground_points)}")
-                else:
-                    z_thresh = np.percentile(block[:, 2], 30)
-                    ground_mask = block[:, 2] <= z_thresh
-                    ground_points = block[ground_mask]
-                    non_ground_points = block[~ground_mask]
-                    logger.info(f"第{idx+1}块z分位数分离: 地面点{len(ground_points)}，非地面点{len(non_ground_points)}")
-                k = 20
-                if len(non_ground_points) < k:
-                    logger.info(f"第{idx+1}块非地面点过少，跳过")
+            for result in results:
+                if result is None:
                     continue
-                nbrs = NearestNeighbors(n_neighbors=k).fit(non_ground_points)
-                _, indices = nbrs.kneighbors(non_ground_points)
-                features = []
-                for idx2, idxs in enumerate(indices):
-                    neighbors = non_ground_points[idxs]
-                    cov = np.cov(neighbors.T)
-                    eigvals, _ = np.linalg.eigh(cov)
-                    eigvals = np.sort(eigvals)[::-1]
-                    linearity = (eigvals[0] - eigvals[1]) / (eigvals[0] + 1e-8)
-                    planarity = (eigvals[1] - eigvals[2]) / (eigvals[0] + 1e-8)
-                    scattering = eigvals[2] / (eigvals[0] + 1e-8)
-                    features.append([linearity, planarity, scattering])
-                features = np.array(features)
-                mask = (features[:, 0] > 0.8) & (features[:, 1] < 0.15) & (features[:, 2] < 0.05)
-                line_points = non_ground_points[mask]
-                logger.info(f"第{idx+1}块电力线候选点: {len(line_points)}")
+                ground_points, line_points, tower_points = result
                 if len(line_points) > 0:
                     all_line_points.append(line_points)
                 if len(ground_points) > 0:
                     all_ground_points.append(ground_points)
-                tower_points = self.fit_towers_dbscan(non_ground_points)
-                logger.info(f"第{idx+1}块电力塔簇数: {len(tower_points)}")
                 if len(tower_points) > 0:
                     all_tower_points.extend(tower_points)
             all_points = []
@@ -280,22 +1063,132 @@ class PointCloudHandler:
                 all_colors.append(np.tile([0.0, 0.0, 1.0], (len(merged_tower), 1)))
                 logger.info(f"合并电力塔点总数: {len(merged_tower)}")
             if all_points:
-                merged_points = np.vstack(all_points)
+                merged_points = np.vstack(all_points) + origin
                 merged_colors = np.vstack(all_colors)
+                import open3d as o3d
                 pcd = o3d.geometry.PointCloud()
                 pcd.points = o3d.utility.Vector3dVector(merged_points)
                 pcd.colors = o3d.utility.Vector3dVector(merged_colors)
-                o3d.io.write_point_cloud(output_file, pcd)
+                with stage('write', len(merged_points)):
+                    o3d.io.write_point_cloud(output_file, pcd)
                 logger.info(f"分块电力线点提取完成，结果已保存到: {output_file}")
                 logger.info(f"最终总点数: {len(merged_points)}")
             else:
                 logger.warning("未检测到有效点，终止保存。")
         except Exception as e:
+            # 记录后继续抛出，由调用方（如后台任务）标记失败
             logger.error(f"分块电力线点提取流程出错: {e}")
-            import traceback
-            traceback.print_exc()
+            raise
+
+    def _classify_powerlines_blockwise(self, file_path, output_file, use_csf, block_length, workers, chunk_size,
+                                       spill_dir, halo, progress_callback, line_thresholds, tower_params,
+                                       ground_params, cache_dir, tower_method):
+        """
+        extract_powerlines_csf_pca_blockwise 的分类点云输出：各块返回点序号和分类码，
+        写入与输入等长的分类数组（初值为离群点7），再按原点序写出LAS/LAZ。参数同该方法。
+        """
+        try:
+            logger.info(f"读取点云文件: {file_path}")
+            args = (use_csf, line_thresholds, tower_params, ground_params, cache_dir, tower_method)
+            if spill_dir is not None:
+                block_paths, _ = self.split_pointcloud_to_disk(file_path, spill_dir, block_length=block_length,
+                                                               chunk_size=chunk_size, halo=halo, with_index=True)
+                logger.info(f"分块数量: {len(block_paths)}，每块长度: {block_length}，重叠区: {halo}")
+                results = run_tasks(self._extract_block_file, block_paths, workers=workers,
+                                    args=(len(block_paths),) + args + (True,), progress=progress_callback)
+            else:
+                store = self.read_point_store(file_path, chunk_size=chunk_size)
+                logger.info(f"点云总点数: {len(store)}")
+                if halo > 0:
+                    blocks = self.split_pointcloud_with_halo(store.xyz, block_length=block_length, halo=halo,
+                                                             point_index=store.column('index'))
+                    block_fn = self._classify_halo_block
+                else:
+                    blocks = self.split_point_store(store, block_length=block_length, with_index=True)
+                    block_fn = self._classify_block
+                del store
+                logger.info(f"分块数量: {len(blocks)}，每块长度: {block_length}，重叠区: {halo}")
+                results = run_blocks(block_fn, blocks, workers=workers, args=(len(blocks),) + args,
+                                     progress=progress_callback)
+            classification = np.full(las_point_count(file_path), CLASS_LOW_NOISE, dtype=np.uint8)
+            for point_index, labels in results:
+                classification[point_index] = labels
+            counts = np.bincount(classification, minlength=CLASS_TOWER + 1)
+            logger.info(f"分类点数: 地面{counts[CLASS_GROUND]}，电力线{counts[CLASS_CONDUCTOR]}，"
+                        f"电力塔{counts[CLASS_TOWER]}，未分类{counts[CLASS_UNCLASSIFIED]}，离群点{counts[CLASS_LOW_NOISE]}")
+            with stage('write', len(classification)):
+                write_classified_las(file_path, output_file, classification, chunk_size=chunk_size)
+            logger.info(f"分块电力线分类完成，结果已保存到: {output_file}")
+        except Exception as e:
+            # 记录后继续抛出，由调用方（如后台任务）标记失败
+            logger.error(f"分块电力线分类流程出错: {e}")
+            raise
 
-    def reconstruct_mesh(self, input_path, output_path=None, depth=9, scale=1.1):
+    def _poisson_mesh(self, pcd, depth, scale, orientation='tangent_plane', sensor=None, normal_radius=0.1):
+        """
+        估计并统一法向量后进行Poisson重建，去除密度最低1%的伪面片。
+        参数：
+            pcd (PointCloud): 输入点云（会写入法向量）
+            depth (int): Poisson重建深度
+            scale (float): Poisson重建缩放
+            orientation (str): 法向量定向方法，见normal_orientation.NORMAL_ORIENTATIONS
+            sensor (array-like|None): orientation='sensor'时的传感器位置 (3,) 或航迹 (M, 3)
+            normal_radius (float): 法向量估计的邻域半径
+        返回：
+            mesh (TriangleMesh): 重建后的网格
+        """
+        import open3d as o3d
+        # 法向量估计
+        logger.info("开始估计法向量...")
+        with stage('normals', len(pcd.points)):
+            pcd.estimate_normals(
+                search_param=o3d.geometry.KDTreeSearchParamHybrid(
+                    radius=normal_radius,
+                    max_nn=30
+                )
+            )
+        logger.info("法向量估计完成。开始法向量方向一致化...")
+        with stage('orient_normals', len(pcd.points)):
+            orient_normals(pcd, orientation, k=100, sensor=sensor)
+        logger.info("法向量方向一致化完成。开始Poisson重建...")
+        # Poisson重建
+        with stage('poisson', len(pcd.points)) as span:
+            mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
+                pcd, depth=depth, width=0, scale=scale, linear_fit=False
+            )
+            span.set_output(len(mesh.vertices))
+        logger.info(f"Poisson重建完成，网格顶点数: {len(mesh.vertices)}，面片数: {len(mesh.triangles)}")
+        # 可选：去除低密度伪面片
+        densities = np.asarray(densities)
+        vertices_to_remove = densities < np.quantile(densities, 0.01)
+        mesh.remove_vertices_by_mask(vertices_to_remove)
+        logger.info(f"去除低密度伪面片后，剩余顶点数: {len(mesh.vertices)}，面片数: {len(mesh.triangles)}")
+        return mesh
+
+    def _plan_resolution(self, pcd, depth, scale, budget):
+        """
+        budget不为None时按预算规划重建分辨率并下采样点云，否则原样返回。
+        参数：
+            pcd (PointCloud): 输入点云
+            depth (int): 固定的Poisson重建深度（budget为None时使用）
+            scale (float): Poisson重建缩放
+            budget (dict|None): {"memory_mb", "seconds", "max_points"}，键均可省略，见plan_resolution
+        返回：
+            pcd (PointCloud): 下采样后的点云
+            depth (int): Poisson重建深度
+            normal_radius (float): 法向量估计半径
+        """
+        if budget is None:
+            return pcd, depth, 0.1
+        with stage('plan_resolution', len(pcd.points)) as span:
+            plan = plan_resolution(np.asarray(pcd.points), scale=scale, **budget)
+            pcd = apply_plan(pcd, plan)
+            span.set_output(len(pcd.points))
+        logger.info(f"按预算下采样后点数: {len(pcd.points)}，Poisson深度: {plan['depth']}")
+        return pcd, plan["depth"], plan["normal_radius"]
+
+    def reconstruct_mesh(self, input_path, output_path=None, depth=9, scale=1.1, orientation='tangent_plane',
+                         sensor=None, budget=None):
         """
         使用Poisson重建将点云转为三角网格。
         参数：
@@ -303,44 +1196,34 @@ class PointCloudHandler:
             output_path (str|None): 输出网格文件路径
             depth (int): Poisson重建深度
             scale (float): Poisson重建缩放
+            orientation (str): 法向量定向方法：tangent_plane（默认，最慢）、up、sensor、voxel，
+                机载数据用up/sensor/voxel可比切平面一致化快一到两个数量级
+            sensor (array-like|None): orientation='sensor'时的传感器位置 (3,) 或航迹 (M, 3)
+            budget (dict|None): 自动分辨率的资源预算 {"memory_mb", "seconds", "max_points"}；
+                给出时忽略depth，由resolution_planner按点数、包围盒和点间距选择深度并下采样
         返回：
             mesh (TriangleMesh): 重建后的网格
             output_path (str|None): 输出路径
         用法：
             mesh, path = handler.reconstruct_mesh(infile, outfile)
+            mesh, path = handler.reconstruct_mesh(infile, outfile, orientation='voxel')
+            mesh, path = handler.reconstruct_mesh(infile, outfile, budget={'memory_mb': 2048})
         """
         import open3d as o3d
-        import numpy as np
+        if orientation not in NORMAL_ORIENTATIONS:
+            raise ValueError(f"不支持的法向量定向方法: {orientation}")
         try:
             logger.info(f"开始读取点云文件: {input_path}")
             pcd = o3d.io.read_point_cloud(str(input_path))
             if not pcd.has_points():
                 raise ValueError("点云数据为空")
             logger.info(f"点云读取完成，点数: {len(pcd.points)}")
-            # 法向量估计
-            logger.info("开始估计法向量...")
-            pcd.estimate_normals(
-                search_param=o3d.geometry.KDTreeSearchParamHybrid(
-                    radius=0.1,
-                    max_nn=30
-                )
-            )
-            logger.info("法向量估计完成。开始法向量方向一致化...")
-            pcd.orient_normals_consistent_tangent_plane(100)
-            logger.info("法向量方向一致化完成。开始Poisson重建...")
-            # Poisson重建
-            mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
-                pcd, depth=depth, width=0, scale=scale, linear_fit=False
-            )
-            logger.info(f"Poisson重建完成，网格顶点数: {len(mesh.vertices)}，面片数: {len(mesh.triangles)}")
-            # 可选：去除低密度伪面片
-            densities = np.asarray(densities)
-            vertices_to_remove = densities < np.quantile(densities, 0.01)
-            mesh.remove_vertices_by_mask(vertices_to_remove)
-            logger.info(f"去除低密度伪面片后，剩余顶点数: {len(mesh.vertices)}，面片数: {len(mesh.triangles)}")
+            pcd, depth, normal_radius = self._plan_resolution(pcd, depth, scale, budget)
+            mesh = self._poisson_mesh(pcd, depth, scale, orientation, sensor, normal_radius)
             # 保存
             if output_path:
-                o3d.io.write_triangle_mesh(str(output_path), mesh)
+                with stage('write', len(mesh.vertices)):
+                    o3d.io.write_triangle_mesh(str(output_path), mesh)
                 logger.info(f"网格已保存到: {output_path}")
             return mesh, output_path
         except Exception as e:
@@ -367,24 +1250,30 @@ class PointCloudHandler:
             if not pcd.has_points():
                 raise ValueError("点云数据为空")
             logger.info(f"点云读取完成，点数: {len(pcd.points)}")
-            mesh = o3d.geometry.TriangleMesh.create_from_point_cloud_alpha_shape(pcd, alpha)
+            with stage('alpha_shape', len(pcd.points)) as span:
+                mesh = o3d.geometry.TriangleMesh.create_from_point_cloud_alpha_shape(pcd, alpha)
+                span.set_output(len(mesh.vertices))
             mesh.compute_vertex_normals()
             logger.info(f"α-Shape重建完成，网格顶点数: {len(mesh.vertices)}，面片数: {len(mesh.triangles)}")
             if output_path:
-                o3d.io.write_triangle_mesh(str(output_path), mesh)
+                with stage('write', len(mesh.vertices)):
+                    o3d.io.write_triangle_mesh(str(output_path), mesh)
                 logger.info(f"网格已保存到: {output_path}")
             return mesh, output_path
         except Exception as e:
             logger.error(f"α-Shape重建失败: {e}")
             raise
 
-    def reconstruct_mesh_ball_pivoting(self, input_path, output_path=None, radii=[0.1, 0.2, 0.4]):
+    def reconstruct_mesh_ball_pivoting(self, input_path, output_path=None, radii=[0.1, 0.2, 0.4], orientation=None,
+                                       sensor=None):
         """
         基于Ball Pivoting的三维重建。
         参数：
             input_path (str): 输入点云文件路径
             output_path (str|None): 输出网格文件路径
             radii (list): 球半径列表
+            orientation (str|None): 法向量定向方法（同reconstruct_mesh），None表示不定向
+            sensor (array-like|None): orientation='sensor'时的传感器位置 (3,) 或航迹 (M, 3)
         返回：
             mesh (TriangleMesh): 重建后的网格
             output_path (str|None): 输出路径
@@ -392,73 +1281,221 @@ class PointCloudHandler:
             mesh, path = handler.reconstruct_mesh_ball_pivoting(infile, outfile, radii=[0.1,0.2,0.4])
         """
         import open3d as o3d
+        if orientation is not None and orientation not in NORMAL_ORIENTATIONS:
+            raise ValueError(f"不支持的法向量定向方法: {orientation}")
         try:
             logger.info(f"开始读取点云文件: {input_path}")
             pcd = o3d.io.read_point_cloud(str(input_path))
             if not pcd.has_points():
                 raise ValueError("点云数据为空")
             logger.info(f"点云读取完成，点数: {len(pcd.points)}")
-            pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30))
-            mesh = o3d.geometry.TriangleMesh.create_from_point_cloud_ball_pivoting(
-                pcd, o3d.utility.DoubleVector(radii))
+            with stage('normals', len(pcd.points)):
+                pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30))
+            if orientation is not None:
+                with stage('orient_normals', len(pcd.points)):
+                    orient_normals(pcd, orientation, k=100, sensor=sensor)
+            with stage('ball_pivoting', len(pcd.points)) as span:
+                mesh = o3d.geometry.TriangleMesh.create_from_point_cloud_ball_pivoting(
+                    pcd, o3d.utility.DoubleVector(radii))
+                span.set_output(len(mesh.vertices))
             mesh.compute_vertex_normals()
             logger.info(f"Ball Pivoting重建完成，网格顶点数: {len(mesh.vertices)}，面片数: {len(mesh.triangles)}")
             if output_path:
-                o3d.io.write_triangle_mesh(str(output_path), mesh)
+                with stage('write', len(mesh.vertices)):
+                    o3d.io.write_triangle_mesh(str(output_path), mesh)
                 logger.info(f"网格已保存到: {output_path}")
             return mesh, output_path
         except Exception as e:
             logger.error(f"Ball Pivoting重建失败: {e}")
             raise
 
-    def reconstruct_mesh_blockwise(self, input_path, output_dir, block_length=200, depth=9, scale=1.1):
+    def _reconstruct_block(self, idx, block, output_dir, depth, scale, core_mask=None, merge=False, budget=None,
+                           origin=None):
+        """
+        对单个分块下采样并在内存中进行Poisson重建（不写中间点云文件）。
+        指定core_mask时核心点和重叠点分别下采样，重建后裁掉落在重叠区的三角形。
+        参数：
+            idx (int): 块序号（从0开始）
+            block (np.ndarray): 块点云 (n, 3)
+            output_dir (str): 输出网格文件夹
+            depth (int): Poisson重建深度
+            scale (float): Poisson重建缩放
+            core_mask (np.ndarray|None): 核心区掩码 (n,)，None表示整块都是核心点
+            merge (bool): 为True时返回网格数组供合并，不写块网格文件
+            budget (dict|None): 单块的自动分辨率预算，见reconstruct_mesh；给出时按块规划下采样体素和深度
+            origin (np.ndarray|None): block为局部坐标时的局部原点 (3,)，网格顶点在输出前平移回世界坐标
+        返回：
+            mesh_path (str|None): 网格文件路径，块被跳过或重建失败时为None；
+                merge=True时为 (vertices, triangles) 数组或None
+        用法：
+            mesh_path = handler._reconstruct_block(0, block, outdir, 9, 1.1)
+        """
+        import open3d as o3d
+        if len(block) < 100:
+            logger.info(f"第{idx+1}块点数过少，跳过")
+            return None
+        logger.info(f"开始处理第{idx+1}块，点数: {len(block)}")
+        parts = [block] if core_mask is None else [block[core_mask], block[~core_mask]]
+        normal_radius = 0.1
+        if budget is not None:
+            with stage('plan_resolution', len(block)):
+                plan = plan_resolution(block, scale=scale, **budget)
+            depth, normal_radius = plan["depth"], plan["normal_radius"]
+        # 可选：下采样
+        with stage('voxel_downsample', len(block)) as span:
+            sampled = []
+            for part in parts:
+                pcd = o3d.geometry.PointCloud()
+                pcd.points = o3d.utility.Vector3dVector(part.astype(np.float64))
+                if budget is None:
+                    pcd = pcd.voxel_down_sample(voxel_size=BLOCK_VOXEL_SIZE)
+                else:
+                    # 核心点和重叠点按点数比例分摊目标点数
+                    pcd = apply_plan(pcd, dict(plan, target_points=max(1, plan["target_points"] * len(part) // len(block))))
+                sampled.append(np.asarray(pcd.points))
+            points = np.vstack(sampled)
+            span.set_output(len(points))
+        logger.info(f"下采样后点数: {len(points)}")
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(points)
+        try:
+            mesh = self._poisson_mesh(pcd, depth, scale, normal_radius=normal_radius)
+        except Exception as e:
+            logger.warning(f"第{idx+1}块重建失败: {e}")
+            return None
+        vertices, triangles = np.asarray(mesh.vertices), np.asarray(mesh.triangles)
+        if core_mask is not None:
+            sampled_core = np.zeros(len(points), dtype=bool)
+            sampled_core[:len(sampled[0])] = True
+            vertices, triangles = clip_mesh_to_core(vertices, triangles, points, sampled_core)
+            logger.info(f"裁掉重叠区后，第{idx+1}块网格面片数: {len(triangles)}")
+        if origin is not None:
+            vertices = vertices + origin
+        if merge:
+            return vertices, triangles
+        mesh_path = os.path.join(output_dir, f"block_{idx+1}_mesh.ply")
+        if core_mask is not None or origin is not None:
+            mesh = o3d.geometry.TriangleMesh(o3d.utility.Vector3dVector(vertices), o3d.utility.Vector3iVector(triangles))
+        with stage('write', len(vertices)):
+            o3d.io.write_triangle_mesh(mesh_path, mesh)
+        logger.info(f"第{idx+1}块重建完成，网格已保存到: {mesh_path}")
+        return mesh_path
+
+    def _reconstruct_halo_block(self, idx, block, core_mask, output_dir, depth, scale, merge=False, budget=None,
+                                origin=None):
+        """
+        run_blocks的带重叠区分块入口，参数同_reconstruct_block。
+        """
+        return self._reconstruct_block(idx, block, output_dir, depth, scale, core_mask=core_mask, merge=merge,
+                                       budget=budget, origin=origin)
+
+    def _reconstruct_block_file(self, idx, block_path, output_dir, depth, scale, merge=False, budget=None,
+                                origin=None):
+        """
+        读取外存分块文件（含重叠点文件），去除离群点后按_reconstruct_block重建。
+        参数：
+            idx (int): 块序号（从0开始）
+            block_path (str): 分块文件路径
+            output_dir (str): 输出网格文件夹
+            depth (int): Poisson重建深度
+            scale (float): Poisson重建缩放
+            merge (bool): 同_reconstruct_block
+            budget (dict|None): 同_reconstruct_block
+            origin (np.ndarray|None): 分块文件坐标的局部原点，同_reconstruct_block
+        返回：
+            mesh_path (str|None): 同_reconstruct_block
+        """
+        block, core_mask = self.load_block_with_halo(block_path)
+        block, ind = remove_outliers(block)
+        core_mask = core_mask[ind]
+        return self._reconstruct_block(idx, block, output_dir, depth, scale,
+                                       core_mask=None if core_mask.all() else core_mask, merge=merge, budget=budget,
+                                       origin=origin)
+
+    def reconstruct_mesh_blockwise(self, input_path, output_dir, block_length=200, depth=9, scale=1.1, workers=1,
+                                   chunk_size=DEFAULT_CHUNK_SIZE, spill_dir=None, progress_callback=None, merge=False,
+                                   halo=None, weld_tolerance=BLOCK_VOXEL_SIZE, budget=None):
         """
-        分块三维重建：将点云分块后分别进行Poisson重建。
+        分块三维重建：将点云分块后分别进行Poisson重建。分块点云在内存中传给工作进程，并行重建，
+        不写中间点云文件；merge=True时把各块网格合并为一个网格，并焊接相邻块接缝处的顶点。
         参数：
             input_path (str): 输入点云文件路径
             output_dir (str): 输出网格文件夹
             block_length (float): 分块长度
             depth (int): Poisson重建深度
             scale (float): Poisson重建缩放
+            workers (int): 并行重建分块的进程数，1为单进程顺序处理
+            chunk_size (int): 读取LAS/LAZ时每次解码的点数
+            spill_dir (str|None): 外存分块目录；指定时每次只加载一个块
+            progress_callback (callable|None): 进度回调 progress_callback(已完成块数, 总块数)
+            merge (bool): 是否合并为单个网格 output_dir/MERGED_MESH_NAME
+            halo (float|None): 分块重叠区宽度，重建后裁掉重叠区的面片；None时合并为MERGE_HALO、不合并为0
+            weld_tolerance (float): 合并时焊接接缝顶点的距离阈值
+            budget (dict|None): 每块的自动分辨率预算（见reconstruct_mesh），给出时忽略depth和BLOCK_VOXEL_SIZE，
+                点数少的块自动使用较浅的深度
         返回：
-            mesh_paths (list): 所有块的网格文件路径列表
+            mesh_paths (list): 所有块的网格文件路径列表；merge=True时只含合并后的网格路径
         用法：
-            mesh_paths = handler.reconstruct_mesh_blockwise(infile, outdir)
+            mesh_paths = handler.reconstruct_mesh_blockwise(infile, outdir, workers=4)
+            [merged_path] = handler.reconstruct_mesh_blockwise(infile, outdir, workers=4, merge=True)
         """
-        import os
-        import open3d as o3d
         try:
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
-            points, _, _ = self.read_point_cloud(input_path)
-            blocks = self.split_pointcloud_by_main_direction(points, block_length=block_length)
-            mesh_paths = []
-            for i, block in enumerate(blocks):
-                if len(block) < 100:
-                    logger.info(f"第{i+1}块点数过少，跳过")
-                    continue
-                logger.info(f"开始处理第{i+1}块，点数: {len(block)}")
-                pcd = o3d.geometry.PointCloud()
-                pcd.points = o3d.utility.Vector3dVector(block)
-                # 可选：下采样
-                pcd = pcd.voxel_down_sample(voxel_size=0.2)
-                logger.info(f"下采样后点数: {len(pcd.points)}")
-                # 保存临时点云
-                block_path = os.path.join(output_dir, f"block_{i+1}.ply")
-                o3d.io.write_point_cloud(block_path, pcd)
-                # 重建
-                mesh_path = os.path.join(output_dir, f"block_{i+1}_mesh.ply")
-                try:
-                    self.reconstruct_mesh(block_path, mesh_path, depth=depth, scale=scale)
-                    mesh_paths.append(mesh_path)
-                    logger.info(f"第{i+1}块重建完成，网格已保存到: {mesh_path}")
-                except Exception as e:
-                    logger.warning(f"第{i+1}块重建失败: {e}")
-            logger.info(f"分块重建完成，总块数: {len(mesh_paths)}")
-            return mesh_paths
+            if halo is None:
+                halo = MERGE_HALO if merge else 0
+            if spill_dir is not None:
+                block_paths, origin = self.split_pointcloud_to_disk(input_path, spill_dir, block_length=block_length,
+                                                                    chunk_size=chunk_size, halo=halo)
+                results = run_tasks(self._reconstruct_block_file, block_paths, workers=workers,
+                                    args=(output_dir, depth, scale, merge, budget, origin), progress=progress_callback)
+            else:
+                # 分块在局部坐标下重建，网格顶点输出前平移回世界坐标
+                store = self.read_point_store(input_path, chunk_size=chunk_size)
+                origin = store.origin
+                if halo > 0:
+                    blocks = self.split_pointcloud_with_halo(store.xyz, block_length=block_length, halo=halo)
+                    del store
+                    results = run_blocks(self._reconstruct_halo_block, blocks, workers=workers,
+                                         args=(output_dir, depth, scale, merge, budget, origin),
+                                         progress=progress_callback)
+                else:
+                    blocks = self.split_point_store(store, block_length=block_length)
+                    del store
+                    results = run_blocks(self._reconstruct_block, blocks, workers=workers,
+                                         args=(output_dir, depth, scale, None, merge, budget, origin),
+                                         progress=progress_callback)
+            results = [result for result in results if result is not None]
+            logger.info(f"分块重建完成，总块数: {len(results)}")
+            if not merge:
+                return results
+            return [self._write_merged_mesh(results, os.path.join(output_dir, MERGED_MESH_NAME), weld_tolerance)]
         except Exception as e:
             logger.error(f"分块重建流程出错: {e}")
             import traceback
             traceback.print_exc()
             return []
-        
\ No newline at end of file
+
+    def _write_merged_mesh(self, parts, output_path, weld_tolerance):
+        """
+        合并分块网格、焊接接缝并写出。
+        参数：
+            parts (list): [(vertices, triangles), ...]
+            output_path (str): 输出网格文件路径
+            weld_tolerance (float): 焊接距离阈值
+        返回：
+            output_path (str): 输出路径
+        """
+        import open3d as o3d
+        with stage('merge_mesh', sum(len(vertices) for vertices, _ in parts)) as span:
+            vertices, triangles, welded = merge_meshes(parts, weld_tolerance)
+            span.set_output(len(vertices))
+        if len(triangles) == 0:
+            raise ValueError("所有分块重建结果均为空")
+        mesh = o3d.geometry.TriangleMesh(o3d.utility.Vector3dVector(vertices), o3d.utility.Vector3iVector(triangles))
+        mesh.compute_vertex_normals()
+        with stage('write', len(vertices)):
+            o3d.io.write_triangle_mesh(str(output_path), mesh)
+        logger.info(f"合并{len(parts)}块网格，焊接顶点{welded}个，顶点数: {len(vertices)}，面片数: {len(triangles)}，"
+                    f"已保存到: {output_path}")
+        return output_path
@@ -0,0 +1,147 @@
+import os
+import re
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+from fastapi.responses import Response, StreamingResponse
+
+STREAM_CHUNK_SIZE = 1024 * 1024  # 每次读取/发送的字节数
+GZIP_LEVEL = 6  # 即时压缩级别
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+def file_etag(stat_result):
+    """
+    由文件大小和修改时间生成强ETag（文件被替换或修改后随之变化）。
+    参数：
+        stat_result (os.stat_result): 文件状态
+    返回：
+        str: 带引号的ETag
+    """
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+def parse_range(header, size):
+    """
+    解析单段Range请求头。
+    参数：
+        header (str): Range请求头，如 "bytes=0-1023"、"bytes=1024-"、"bytes=-500"
+        size (int): 文件大小
+    返回：
+        tuple|None: 闭区间 (start, end)；多段或格式无法识别时为None（按完整文件响应）
+    异常：
+        ValueError: 范围不可满足（应返回416）
+    """
+    match = _RANGE_PATTERN.fullmatch(header.strip().replace(" ", ""))
+    if match is None or (not match.group(1) and not match.group(2)):
+        return None
+    first, last = match.group(1), match.group(2)
+    if not first:
+        # 后缀范围：最后N个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("范围不可满足")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("范围不可满足")
+    return start, end
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range.strip() in (etag, last_modified)
+
+def _iter_file(path, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _iter_gzip(path, chunk_size=STREAM_CHUNK_SIZE, level=GZIP_LEVEL):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip封装
+    for chunk in _iter_file(path, 0, os.path.getsize(path), chunk_size):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _accepts_gzip(request):
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def file_response(request, path, filename=None, media_type="application/octet-stream", compress=False,
+                  background=None):
+    """
+    分块流式返回文件，支持断点续传和条件请求：
+    - Range（单段）返回206及Content-Range，范围不可满足时返回416，多段请求按完整文件返回；
+    - If-Range 与当前ETag/Last-Modified不一致时忽略Range；
+    - If-None-Match / If-Modified-Since 命中时返回304；
+    - compress=True且客户端接受gzip、且不是Range请求时即时gzip压缩（不预先生成压缩文件）。
+    参数：
+        request (Request): 当前请求
+        path (str|Path): 文件路径
+        filename (str|None): 下载文件名（Content-Disposition）
+        media_type (str): 响应类型
+        compress (bool): 是否允许即时压缩
+        background (BackgroundTask|None): 响应发送完成后执行的任务
+    返回：
+        Response: 200/206/304/416 响应
+    用法：
+        return file_response(request, RESULTS_DIR / filename, filename=filename, compress=True)
+    """
+    path = str(path)
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    headers = {"accept-ranges": "bytes", "etag": etag, "last-modified": last_modified}
+    if filename is not None:
+        headers["content-disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+    http_range = request.headers.get("range")
+    gzip = compress and http_range is None and _accepts_gzip(request)
+    if compress:
+        headers["vary"] = "Accept-Encoding"
+    if gzip:
+        # 压缩后的表示与原文件字节不同，使用不同的ETag
+        headers["etag"] = etag[:-1] + '-gzip"'
+    if _not_modified(request, headers["etag"], stat_result.st_mtime):
+        return Response(status_code=304, headers=headers, background=background)
+    if http_range is not None and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(http_range, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"},
+                            background=background)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            headers["content-length"] = str(end - start + 1)
+            return StreamingResponse(_iter_file(path, start, end - start + 1), status_code=206, headers=headers,
+                                     media_type=media_type, background=background)
+    if gzip:
+        # 压缩后长度未知，按分块传输编码发送
+        headers["content-encoding"] = "gzip"
+        return StreamingResponse(_iter_gzip(path), headers=headers, media_type=media_type, background=background)
+    headers["content-length"] = str(size)
+    return StreamingResponse(_iter_file(path, 0, size), headers=headers, media_type=media_type, background=background)
@@ -0,0 +1,125 @@
+import logging
+import numpy as np
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+MIN_DEPTH = 5  # Poisson八叉树深度下限
+MAX_DEPTH = 12  # Poisson八叉树深度上限
+DEFAULT_MEMORY_BUDGET_MB = 4096  # 默认内存预算（MB）
+SPACING_SAMPLE = 20000  # 估计点间距时抽样的点数
+NORMAL_RADIUS_FACTOR = 3.0  # 法向量估计半径 = 下采样后点间距 * 此系数
+# Poisson代价的粗略线性模型（Open3D实测量级，可用benchmark.py的reconstruct阶段校准）：
+# 八叉树节点数约为 NODES_PER_SURFACE_CELL * 表面覆盖的深度格数（表面数据按 4**depth 增长）
+BYTES_PER_POINT = 600
+BYTES_PER_NODE = 300
+SECONDS_PER_POINT = 4e-6
+SECONDS_PER_NODE = 2e-6
+NODES_PER_SURFACE_CELL = 8
+
+def estimate_spacing(points, sample=SPACING_SAMPLE, seed=0):
+    """
+    估计点云的典型点间距：抽样点到最近邻距离的中位数。
+    参数：
+        points (np.ndarray): 点云 (N, 3)
+        sample (int): 抽样点数
+        seed (int): 抽样随机种子
+    返回：
+        float: 点间距，点数不足2时为0
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 2:
+        return 0.0
+    query = points
+    if len(points) > sample:
+        query = points[np.random.default_rng(seed).choice(len(points), sample, replace=False)]
+    dists, _ = cKDTree(points).query(query, k=2)
+    positive = dists[:, 1][dists[:, 1] > 0]
+    return float(np.median(positive)) if len(positive) else 0.0
+
+def estimate_cost(n_points, depth, occupancy):
+    """
+    估计Poisson重建的峰值内存和耗时。
+    参数：
+        n_points (int): 参与重建的点数
+        depth (int): 八叉树深度
+        occupancy (float): 表面在 2**depth 格网投影中所占比例（0~1），由包围盒与点间距估计
+    返回：
+        memory_mb (float): 估计内存（MB）
+        seconds (float): 估计耗时（秒）
+    """
+    nodes = NODES_PER_SURFACE_CELL * occupancy * 4.0 ** depth
+    memory_mb = (n_points * BYTES_PER_POINT + nodes * BYTES_PER_NODE) / 1024 ** 2
+    seconds = n_points * SECONDS_PER_POINT + nodes * SECONDS_PER_NODE
+    return memory_mb, seconds
+
+def plan_resolution(points, memory_mb=DEFAULT_MEMORY_BUDGET_MB, seconds=None, max_points=None, scale=1.1):
+    """
+    根据点数、包围盒和实测点间距选择Poisson深度、下采样体素和点数目标。
+    深度从"格子边长约等于点间距"的深度开始（更深只会多出空节点），逐级降低，
+    每级的下采样体素取该深度格子边长的一半，直到估计的内存和耗时都在预算内。
+    参数：
+        points (np.ndarray): 点云 (N, 3)
+        memory_mb (float|None): 内存预算（MB），None表示不限
+        seconds (float|None): 耗时预算（秒），None表示不限
+        max_points (int|None): 点数上限，None表示不限
+        scale (float): Poisson重建缩放（包围盒放大系数）
+    返回：
+        dict: {"depth", "voxel_size"（None表示不下采样）, "target_points", "spacing", "normal_radius",
+               "memory_mb", "seconds", "within_budget"}
+    用法：
+        plan = plan_resolution(points, memory_mb=2048)
+        pcd = apply_plan(pcd, plan)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n == 0:
+        raise ValueError("点云数据为空")
+    spacing = estimate_spacing(points)
+    extent = float((points.max(axis=0) - points.min(axis=0)).max()) * scale
+    if spacing <= 0 or extent <= 0:
+        spacing = extent = max(extent, 1e-3)
+    # 表面投影面积（按点数*间距²估计）占格网截面的比例，随深度不变
+    occupancy = min(1.0, n * spacing ** 2 / extent ** 2)
+    finest = int(np.clip(np.ceil(np.log2(extent / spacing)), MIN_DEPTH, MAX_DEPTH))
+    plan = None
+    for depth in range(finest, MIN_DEPTH - 1, -1):
+        voxel_size = extent / 2 ** depth / 2
+        target = n if voxel_size <= spacing else max(1, int(n * (spacing / voxel_size) ** 2))
+        if max_points is not None and target > max_points:
+            target = int(max_points)
+            voxel_size = max(voxel_size, spacing * np.sqrt(n / target))
+        cost_mb, cost_s = estimate_cost(target, depth, occupancy)
+        plan = {
+            "depth": depth,
+            "voxel_size": float(voxel_size) if voxel_size > spacing else None,
+            "target_points": target,
+            "spacing": spacing,
+            "normal_radius": NORMAL_RADIUS_FACTOR * max(spacing, voxel_size),
+            "memory_mb": round(cost_mb, 1),
+            "seconds": round(cost_s, 2),
+            "within_budget": (memory_mb is None or cost_mb <= memory_mb) and (seconds is None or cost_s <= seconds),
+        }
+        if plan["within_budget"]:
+            break
+    if not plan["within_budget"]:
+        logger.warning(f"最低深度{MIN_DEPTH}仍超出预算（估计{plan['memory_mb']}MB，{plan['seconds']}s）")
+    logger.info(f"重建分辨率规划: 点数{n}，点间距{spacing:.4f}，深度{plan['depth']}，"
+                f"体素{plan['voxel_size']}，目标点数{plan['target_points']}")
+    return plan
+
+def apply_plan(pcd, plan):
+    """
+    按规划对Open3D点云下采样：先按体素，仍超过目标点数时再等间隔抽稀。
+    参数：
+        pcd (PointCloud): 输入点云
+        plan (dict): plan_resolution的结果
+    返回：
+        PointCloud: 下采样后的点云（无需下采样时为原点云）
+    """
+    if plan["voxel_size"] is not None:
+        pcd = pcd.voxel_down_sample(voxel_size=plan["voxel_size"])
+    n = len(pcd.points)
+    if n > plan["target_points"]:
+        pcd = pcd.uniform_down_sample(int(np.ceil(n / plan["target_points"])))
+    return pcd
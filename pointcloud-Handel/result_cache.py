@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(content_digest, params):
+    """
+    由输入文件内容摘要和处理参数生成缓存键。
+    参数：
+        content_digest (str): 输入文件内容的sha256十六进制摘要
+        params (dict): 影响结果的处理参数（需可JSON序列化）
+    返回：
+        str: 缓存键（sha256十六进制）
+    用法：
+        key = make_cache_key(digest, {"use_csf": False, "block_length": 200})
+    """
+    payload = json.dumps({"input": content_digest, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    基于内容寻址的结果缓存：每个条目是cache_dir下以缓存键命名的文件，
+    以文件修改时间作为最近访问时间，总大小超过max_bytes时按LRU淘汰。
+    on_evict(key) 在条目被淘汰后调用，用于清理与条目关联的派生文件（如八叉树瓦片）。
+    suffix可以是后缀元组，此时同一缓存保存多种格式的条目，共用一个大小上限；
+    get/put 不指定后缀时使用第一个。
+    用法：
+        cache = ResultCache('results/cache', 20 * 1024 ** 3)
+        path = cache.get(key) or cache.put(key, tmp_path)
+        cache = ResultCache('results/cache', 20 * 1024 ** 3, suffix=(".ply", ".las"))
+        path = cache.get(key, ".las") or cache.put(key, tmp_path, ".las")
+    """
+    def __init__(self, cache_dir, max_bytes, suffix=".ply", on_evict=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffixes = (suffix,) if isinstance(suffix, str) else tuple(suffix)
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+
+    def path_for(self, key, suffix=None):
+        """
+        返回缓存条目的文件路径（不保证存在）。
+        参数：
+            key (str): 缓存键
+            suffix (str|None): 条目后缀，None为第一个后缀
+        返回：
+            Path: 条目路径
+        """
+        suffix = self.suffixes[0] if suffix is None else suffix
+        if suffix not in self.suffixes:
+            raise ValueError(f"不支持的缓存条目后缀: {suffix}")
+        return self.cache_dir / f"{key}{suffix}"
+
+    def get(self, key, suffix=None):
+        """
+        查询缓存，命中时刷新访问时间。
+        参数：
+            key (str): 缓存键
+            suffix (str|None): 条目后缀，None为第一个后缀
+        返回：
+            Path|None: 命中的结果文件路径，未命中为None
+        """
+        path = self.path_for(key, suffix)
+        with self._lock:
+            if not path.exists():
+                return None
+            os.utime(path)
+        logger.info(f"结果缓存命中: {path.name}")
+        return path
+
+    def put(self, key, src_path, suffix=None):
+        """
+        把结果文件移动到缓存中，并按总大小淘汰旧条目。
+        参数：
+            key (str): 缓存键
+            src_path (str|Path): 结果文件路径
+            suffix (str|None): 条目后缀，None为第一个后缀
+        返回：
+            Path: 缓存条目路径
+        """
+        path = self.path_for(key, suffix)
+        with self._lock:
+            shutil.move(str(src_path), str(path))
+            os.utime(path)
+            self._evict(keep=path)
+        return path
+
+    def _evict(self, keep=None):
+        entries = []
+        for suffix in self.suffixes:
+            for entry in self.cache_dir.glob(f"*{suffix}"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry, suffix))
+        total = sum(size for _, size, _, _ in entries)
+        # 最久未访问的先淘汰
+        for _, size, entry, suffix in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            try:
+                entry.unlink()
+                total -= size
+                logger.info(f"结果缓存淘汰: {entry.name}")
+            except FileNotFoundError:
+                continue
+            if self.on_evict is not None:
+                self.on_evict(entry.name[:-len(suffix)])
@@ -0,0 +1,113 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+class SpatialIndex:
+    """
+    点集上的共享空间索引：KD树只构建一次（首次查询时），同时服务kNN和半径查询。
+    kNN结果按最大k缓存，较小k的查询直接截取已有的邻居列表，不再重复搜索。
+    查询点即索引点本身，邻居列表第一列为点自身（距离0），与
+    NearestNeighbors.kneighbors(X) 和 Open3D 的 SearchKNN 一致。
+    用法：
+        index = SpatialIndex(points)
+        dists, indices = index.knn(20)
+        graph = index.radius_graph(3.0, subset=high_idx)
+    """
+    def __init__(self, points):
+        self.points = np.asarray(points)
+        self._tree = None
+        self._knn = None
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def tree(self):
+        """
+        KD树（延迟构建）。
+        """
+        if self._tree is None:
+            self._tree = cKDTree(self.points)
+        return self._tree
+
+    def knn(self, k, subset=None):
+        """
+        查询每个点的k近邻（含自身）。
+        参数：
+            k (int): 邻居数
+            subset (np.ndarray|None): 只返回这部分点（索引）的邻居；已有缓存时直接截取，
+                否则只查询这些点且不缓存
+        返回：
+            dists (np.ndarray): 邻居距离 (N, k)，按距离升序
+            indices (np.ndarray): 邻居索引 (N, k)，为全部点中的索引
+        """
+        k = min(int(k), len(self.points))
+        cached = self._knn is not None and self._knn[1].shape[1] >= k
+        if subset is not None:
+            if cached:
+                return self._knn[0][subset, :k], self._knn[1][subset, :k]
+            dists, indices = self.tree.query(self.points[subset], k=k)
+            return dists.reshape(len(dists), -1), indices.reshape(len(indices), -1)
+        if not cached:
+            dists, indices = self.tree.query(self.points, k=k)
+            if k == 1:
+                dists, indices = dists[:, None], indices[:, None]
+            self._knn = (dists, indices)
+        dists, indices = self._knn
+        return dists[:, :k], indices[:, :k]
+
+    def mean_knn_distance(self, k, chunk_size=65536):
+        """
+        每个点到k近邻（含自身）的平均距离。已有缓存的kNN结果时直接复用，
+        否则分批查询且不缓存，内存占用只与chunk_size有关（适合整幅点云）。
+        参数：
+            k (int): 邻居数
+            chunk_size (int): 每批查询的点数
+        返回：
+            avg (np.ndarray): 平均距离 (N,)
+        """
+        k = min(int(k), len(self.points))
+        if self._knn is not None and self._knn[0].shape[1] >= k:
+            return self._knn[0][:, :k].mean(axis=1)
+        avg = np.empty(len(self.points), dtype=np.float64)
+        for start in range(0, len(self.points), chunk_size):
+            dists, _ = self.tree.query(self.points[start:start + chunk_size], k=k)
+            avg[start:start + chunk_size] = dists.reshape(len(dists), -1).mean(axis=1)
+        return avg
+
+    def radius_graph(self, radius, subset=None):
+        """
+        构建半径邻域图，可直接作为 DBSCAN(metric='precomputed') 的输入。
+        参数：
+            radius (float): 查询半径
+            subset (np.ndarray|None): 只在这部分点（索引）之间建图；为None时使用全部点。
+                子集较小时只对子集建一棵临时树做点对查询，比在全集树上逐点查询再过滤快得多
+        返回：
+            graph (scipy.sparse.csr_matrix): (m, m) 稀疏距离矩阵，只存储距离不超过radius的点对
+                （重合点的0距离也会显式保存）
+        """
+        tree = self.tree if subset is None else cKDTree(self.points[np.asarray(subset)])
+        return tree.sparse_distance_matrix(tree, radius, output_type='coo_matrix').tocsr()
+
+def remove_outliers_with_index(index, nb_neighbors=20, std_ratio=2.0):
+    """
+    基于共享索引的统计滤波，判定规则与 Open3D remove_statistical_outlier 相同：
+    点到k个近邻（含自身）的平均距离小于 全局均值 + std_ratio*标准差 时保留。
+    与Open3D一致，平均距离为0的点（k个近邻全部重合）不计入均值和标准差的累加，但分母仍为全部点数，
+    且这些点不保留；LAS数据中的重复点因此不会拉低阈值。
+    参数：
+        index (SpatialIndex): 点集索引
+        nb_neighbors (int): 邻域点数
+        std_ratio (float): 标准差倍数
+    返回：
+        ind (np.ndarray): 保留点的索引
+    用法：
+        ind = remove_outliers_with_index(SpatialIndex(points))
+    """
+    if len(index) == 0:
+        return np.empty(0, dtype=np.int64)
+    avg = index.mean_knn_distance(nb_neighbors)
+    positive = avg > 0
+    mean = avg[positive].sum() / len(avg)
+    std = np.sqrt(((avg[positive] - mean) ** 2).sum() / (len(avg) - 1)) if len(avg) > 1 else 0.0
+    threshold = mean + std_ratio * std
+    return np.flatnonzero(positive & (avg < threshold))
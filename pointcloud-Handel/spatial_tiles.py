@@ -0,0 +1,163 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+TILE_LEVELS = 10  # Morton格网每轴 2**TILE_LEVELS 格
+HALO_GRID_LEVELS = 20  # 重叠点查找格网每轴最多 2**HALO_GRID_LEVELS 格，保证格号线性化不溢出
+
+def _spread_bits(values):
+    # 把21位整数的各位间隔两位展开，用于三维Morton交织
+    v = values.astype(np.uint64) & np.uint64(0x1fffff)
+    v = (v | v << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+    v = (v | v << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+    v = (v | v << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+    v = (v | v << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+    v = (v | v << np.uint64(2)) & np.uint64(0x1249249249249249)
+    return v
+
+def _sorted_unique(values):
+    # 排序后去重，整数数组上比np.unique的哈希去重快
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]]
+
+def morton_encode(cells):
+    """
+    三维格网坐标的Morton（Z序）编码，每轴最多21位。
+    参数：
+        cells (np.ndarray): 非负整数格网坐标 (N, 3)
+    返回：
+        np.ndarray: Morton码 (N,)，uint64
+    """
+    cells = np.asarray(cells)
+    return (_spread_bits(cells[:, 0]) << np.uint64(2)) | (_spread_bits(cells[:, 1]) << np.uint64(1)) | \
+        _spread_bits(cells[:, 2])
+
+class MortonTiling:
+    """
+    按Morton码把点云划分为空间连续的瓦片：八叉树节点点数超过max_points时继续细分，
+    叶节点按Morton顺序合并到不超过max_points，每个瓦片是一段连续的Morton码区间。
+    各区间首尾相接覆盖整个编码空间，因此任意位置（包括下采样生成的新点）都恰好属于一个瓦片。
+    pickle时只保存格网参数和区间起点，可以廉价地传给工作进程。
+    参数：
+        points (np.ndarray): 点云 (N, 3)
+        max_points (int): 每个瓦片的核心点数上限（最深一层的单个格子可能超出）
+        levels (int): Morton格网层数
+    用法：
+        tiling = MortonTiling(points, 100000)
+        for points_with_halo in tiling.tiles(points, overlap=0.2):
+            ...
+        owned = tiling.tile_of(new_points) == idx
+    """
+    def __init__(self, points, max_points, levels=TILE_LEVELS):
+        points = np.asarray(points, dtype=np.float64)
+        self.levels = int(levels)
+        self.origin = points.min(axis=0)
+        extent = float((points.max(axis=0) - self.origin).max())
+        self.cell_size = max(extent, 1e-9) / (2 ** self.levels) * (1 + 1e-9)
+        self._codes = self.codes(points)
+        self._order = np.argsort(self._codes, kind='stable')
+        self.starts = self._partition(self._codes[self._order], int(max_points))
+
+    def __getstate__(self):
+        # 传给工作进程时不带整幅点云的编码和排序
+        state = self.__dict__.copy()
+        state['_codes'] = state['_order'] = None
+        return state
+
+    def codes(self, points):
+        """
+        计算点的Morton码（超出格网范围的点截断到边界格）。
+        参数：
+            points (np.ndarray): 点云 (N, 3)
+        返回：
+            np.ndarray: Morton码 (N,)
+        """
+        cells = np.floor((np.asarray(points, dtype=np.float64) - self.origin) / self.cell_size)
+        return morton_encode(np.clip(cells, 0, 2 ** self.levels - 1).astype(np.int64))
+
+    def _partition(self, sorted_codes, max_points):
+        # 深度优先按Morton顺序遍历八叉树，得到点数不超过max_points的叶节点区间，再顺序合并
+        leaves = []
+        stack = [(0, 0)]  # (层级, 节点前缀)
+        while stack:
+            level, prefix = stack.pop()
+            shift = 3 * (self.levels - level)
+            lo, hi = np.searchsorted(sorted_codes, np.array([prefix << shift, (prefix + 1) << shift], dtype=np.uint64))
+            if hi == lo:
+                continue
+            if hi - lo <= max_points or level == self.levels:
+                leaves.append((prefix << shift, hi - lo))
+                continue
+            stack.extend((level + 1, (prefix << 3) | child) for child in range(7, -1, -1))
+        starts, total = [0], 0
+        for start, count in leaves:
+            if total > 0 and total + count > max_points:
+                starts.append(start)
+                total = 0
+            total += count
+        return np.array(starts, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def tile_of(self, points=None, codes=None):
+        """
+        返回点所属的瓦片序号。
+        参数：
+            points (np.ndarray|None): 点云 (N, 3)
+            codes (np.ndarray|None): 已计算的Morton码，给出时忽略points
+        返回：
+            np.ndarray: 瓦片序号 (N,)
+        """
+        if codes is None:
+            codes = self.codes(points)
+        return np.searchsorted(self.starts, codes, side='right') - 1
+
+    def tiles(self, points, overlap=0.0):
+        """
+        按瓦片切分建立本对象时的点云，每块附带与某个核心点各轴相差都不超过overlap的其他瓦片点。
+        重叠点从核心点所在格子及其相邻格子（格子边长不小于overlap）中查找，再按切比雪夫距离精确筛选，
+        不随Morton区间的包围盒膨胀（斜向走廊的区间包围盒可能比核心点大得多）。
+        参数：
+            points (np.ndarray): 建立本对象时的点云 (N, 3)
+            overlap (float): 重叠区宽度
+        返回：
+            blocks (list): 每个瓦片的点 (n, 3)，核心点在前、重叠点在后，与瓦片序号一一对应
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if self._codes is None:
+            raise ValueError("瓦片划分已传给工作进程，不再保存原点云的编码")
+        tile_ids = self.tile_of(codes=self._codes)
+        bounds = np.searchsorted(tile_ids[self._order], np.arange(len(self) + 1))
+        if overlap > 0:
+            cells, neighbour_offsets, cell_order, sorted_cells = self._halo_grid(points, overlap)
+        blocks = []
+        for t in range(len(self)):
+            # 每个区间至少含一个非空叶节点，核心点不为空
+            core = self._order[bounds[t]:bounds[t + 1]]
+            members = core
+            if overlap > 0:
+                near = _sorted_unique((_sorted_unique(cells[core])[:, None] + neighbour_offsets).reshape(-1))
+                lo = np.searchsorted(sorted_cells, near, side='left')
+                counts = np.searchsorted(sorted_cells, near, side='right') - lo
+                # 把各格子在排序数组中的区间拼接成一个索引数组
+                offsets = np.cumsum(counts) - counts
+                candidates = cell_order[np.repeat(lo - offsets, counts) + np.arange(counts.sum())]
+                candidates = candidates[tile_ids[candidates] != t]
+                distances, _ = cKDTree(points[core]).query(points[candidates], p=np.inf,
+                                                            distance_upper_bound=np.nextafter(overlap, np.inf))
+                members = np.concatenate([core, candidates[np.isfinite(distances)]])
+            blocks.append(points[members])
+        return blocks
+
+    def _halo_grid(self, points, overlap):
+        # 重叠点查找格网：返回每个点的线性格号、26邻格和自身的格号偏移，以及按格号排序的点索引和格号。
+        # 格网四周各留一格空白，邻格格号不会越界或绕到另一行
+        extent = float(np.ptp(points, axis=0).max())
+        size = max(overlap, extent / 2 ** HALO_GRID_LEVELS)
+        grid = np.floor((points - points.min(axis=0)) / size).astype(np.int64) + 1
+        dims = grid.max(axis=0) + 2
+        strides = np.array([dims[1] * dims[2], dims[2], 1], dtype=np.int64)
+        cells = grid @ strides
+        steps = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+        cell_order = np.argsort(cells, kind='stable')
+        return cells, steps @ strides, cell_order, cells[cell_order]
@@ -3,7 +3,6 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from api import app
-from pointcloud_predictor import PointCloudHandler
 
 # 创建static目录（如果不存在）
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
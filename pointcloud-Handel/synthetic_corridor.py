@@ -0,0 +1,153 @@
+import numpy as np
+from las_io import CLASS_CONDUCTOR, CLASS_GROUND, CLASS_TOWER
+
+CLASS_HIGH_VEGETATION = 5  # ASPRS高植被（真值中使用，提取流程应输出为未分类）
+
+DEFAULT_CORRIDOR_PARAMS = {
+    'width': 80.0,  # 走廊宽度（米）
+    'span': 250.0,  # 档距（米）
+    'ground_density': 4.0,  # 地面点密度（点/平方米）
+    'conductor_density': 40.0,  # 每根导线的点密度（点/米）
+    'tower_density': 30.0,  # 塔材点密度（点/米）
+    'tower_height': 36.0,  # 塔高（米）
+    'phase_spacing': 6.0,  # 相间距（米）
+    'catenary': 1200.0,  # 悬链线参数a（米），档中弧垂约 span^2/(8a)
+    'trees_per_hectare': 30.0,  # 植被株数（株/公顷）
+    'tree_points': 400,  # 每株植被点数
+    'noise': 0.03,  # 坐标噪声标准差（米）
+}
+
+def _segments_points(rng, segments, density, noise):
+    # 沿线段按线密度均匀采样
+    starts, ends = segments[:, 0], segments[:, 1]
+    lengths = np.linalg.norm(ends - starts, axis=1)
+    counts = np.maximum(1, np.round(lengths * density)).astype(np.int64)
+    seg = np.repeat(np.arange(len(segments)), counts)
+    t = rng.random(len(seg))[:, None]
+    points = starts[seg] + (ends[seg] - starts[seg]) * t
+    return points + rng.normal(0, noise, points.shape)
+
+def _lattice_tower(base, height, base_half=3.5, top_half=1.0, arm_half=8.0):
+    """
+    生成一基格构塔的塔材线段：四根主材、每层水平横材和交叉斜材、两层横担。
+    参数：
+        base (np.ndarray): 塔基中心 (3,)
+        height (float): 塔高
+        base_half (float): 塔基半宽
+        top_half (float): 塔顶半宽
+        arm_half (float): 横担半长
+    返回：
+        segments (np.ndarray): (m, 2, 3) 线段端点
+    """
+    levels = np.linspace(0, height, 9)
+    half = base_half + (top_half - base_half) * levels / height
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=np.float64)
+    rings = base + np.concatenate([corners[None] * half[:, None, None],
+                                   np.broadcast_to(levels[:, None, None], (len(levels), 4, 1))], axis=2)
+    segments = []
+    for i in range(4):
+        j = (i + 1) % 4
+        segments.append(np.stack([rings[:-1, i], rings[1:, i]], axis=1))  # 主材
+        segments.append(np.stack([rings[:, i], rings[:, j]], axis=1))  # 横材
+        segments.append(np.stack([rings[:-1, i], rings[1:, j]], axis=1))  # 斜材
+        segments.append(np.stack([rings[:-1, j], rings[1:, i]], axis=1))
+    for z in (height - 1.0, height - 5.0):
+        arm = np.array([[[0, -arm_half, z], [0, arm_half, z]], [[0, -arm_half, z - 1.5], [0, arm_half, z - 1.5]]])
+        segments.append(base + arm)
+    return np.concatenate(segments)
+
+def make_corridor(length=1000.0, density_scale=1.0, seed=0, **params):
+    """
+    生成确定性的输电走廊合成点云及逐点真值：起伏地形、格构塔、悬链线导线和走廊两侧植被。
+    线路沿x轴，塔按档距等间距排列；同一seed和参数总是得到相同的点云。
+    参数：
+        length (float): 走廊长度（米）
+        density_scale (float): 所有点密度的统一倍数，用于生成不同规模的数据
+        seed (int): 随机种子
+        **params: 覆盖DEFAULT_CORRIDOR_PARAMS中的参数
+    返回：
+        points (np.ndarray): float64坐标 (N, 3)，已平移到投影坐标量级
+        labels (np.ndarray): uint8 ASPRS分类码 (N,)：地面2、高植被5、导线14、电力塔15
+    用法：
+        points, labels = make_corridor(2000, density_scale=2.0)
+    """
+    p = dict(DEFAULT_CORRIDOR_PARAMS, **params)
+    rng = np.random.default_rng(seed)
+    width, span, noise = p['width'], p['span'], p['noise']
+    waves = rng.uniform(0, 2 * np.pi, 4)
+
+    def terrain(x, y):
+        return (0.01 * x + 3.0 * np.sin(x / 180.0 + waves[0]) + 1.5 * np.sin(x / 55.0 + waves[1])
+                + 0.8 * np.sin(y / 25.0 + waves[2]) + 0.3 * np.sin((x + y) / 9.0 + waves[3]))
+
+    parts, labels = [], []
+    # 地面
+    n_ground = int(length * width * p['ground_density'] * density_scale)
+    x = rng.uniform(0, length, n_ground)
+    y = rng.uniform(-width / 2, width / 2, n_ground)
+    parts.append(np.c_[x, y, terrain(x, y) + rng.normal(0, noise, n_ground)])
+    labels.append(np.full(n_ground, CLASS_GROUND, dtype=np.uint8))
+    # 电力塔
+    tower_x = np.arange(span / 2, length, span)
+    height = p['tower_height']
+    for tx in tower_x:
+        base = np.array([tx, 0.0, terrain(tx, 0.0)])
+        points = _segments_points(rng, _lattice_tower(base, height), p['tower_density'] * density_scale, noise)
+        parts.append(points)
+        labels.append(np.full(len(points), CLASS_TOWER, dtype=np.uint8))
+    # 导线：相邻两塔横担端点之间的悬链线，两层横担各三相
+    a = p['catenary']
+    offsets = [(y0, z0) for z0 in (height - 1.5, height - 6.5) for y0 in (-p['phase_spacing'], 0.0, p['phase_spacing'])]
+    for x0, x1 in zip(tower_x[:-1], tower_x[1:]):
+        z0s, z1s = terrain(x0, 0.0), terrain(x1, 0.0)
+        for y0, dz in offsets:
+            n = int((x1 - x0) * p['conductor_density'] * density_scale)
+            xs = rng.uniform(x0, x1, n)
+            mid = (x0 + x1) / 2
+            sag = a * (np.cosh((xs - mid) / a) - np.cosh((x1 - mid) / a))
+            zs = z0s + dz + (z1s - z0s) * (xs - x0) / (x1 - x0) + sag
+            parts.append(np.c_[xs, y0 + rng.normal(0, noise, n), zs + rng.normal(0, noise, n)])
+            labels.append(np.full(n, CLASS_CONDUCTOR, dtype=np.uint8))
+    # 植被：走廊两侧的树（树干+椭球树冠），避开线路保护区
+    n_trees = int(length * width / 10000.0 * p['trees_per_hectare'])
+    if n_trees > 0:
+        tx = rng.uniform(0, length, n_trees)
+        ty = rng.choice([-1.0, 1.0], n_trees) * rng.uniform(15.0, width / 2, n_trees)
+        tree_h = rng.uniform(4.0, 14.0, n_trees)
+        m = max(1, int(p['tree_points'] * density_scale))
+        tree = np.repeat(np.arange(n_trees), m)
+        crown_r = (tree_h / 4)[tree]
+        u = rng.normal(size=(len(tree), 3))
+        u *= (rng.random(len(tree)) ** (1 / 3) / np.linalg.norm(u, axis=1))[:, None]
+        crown = np.c_[u[:, 0] * crown_r, u[:, 1] * crown_r, u[:, 2] * crown_r * 1.3]
+        trunk = rng.random(len(tree)) < 0.1
+        crown[trunk] = np.c_[np.zeros((trunk.sum(), 2)), -rng.random(trunk.sum()) * (tree_h[tree][trunk] * 0.6)]
+        base_z = terrain(tx, ty)[tree]
+        points = np.c_[tx[tree], ty[tree], base_z + tree_h[tree] * 0.7] + crown + rng.normal(0, noise, (len(tree), 3))
+        points[:, 2] = np.maximum(points[:, 2], base_z + 0.6)
+        parts.append(points)
+        labels.append(np.full(len(points), CLASS_HIGH_VEGETATION, dtype=np.uint8))
+    points = np.vstack(parts) + np.array([500000.0, 3000000.0, 100.0])
+    labels = np.concatenate(labels)
+    # 打乱点序，避免分块或聚类结果依赖生成顺序
+    order = rng.permutation(len(points))
+    return points[order], labels[order]
+
+def write_corridor_las(path, points, labels=None, scale=0.001):
+    """
+    把合成点云写为LAS 1.2（点格式1），可选写入真值分类码。
+    参数：
+        path (str): 输出路径
+        points (np.ndarray): 坐标 (N, 3)
+        labels (np.ndarray|None): 分类码 (N,)
+        scale (float): 坐标精度（米）
+    """
+    import laspy
+    header = laspy.LasHeader(point_format=1, version="1.2")
+    header.scales = np.array([scale] * 3)
+    header.offsets = np.floor(points.min(axis=0))
+    las = laspy.LasData(header)
+    las.x, las.y, las.z = points[:, 0], points[:, 1], points[:, 2]
+    if labels is not None:
+        las.classification = labels
+    las.write(str(path))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 被测模块位于 pointcloud-Handel 根目录（非包），测试时加入导入路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+import os
+import numpy as np
+from block_cache import BlockCache
+
+def _block(seed):
+    return np.random.default_rng(seed).uniform(0, 10, (100, 3))
+
+def test_round_trip(tmp_path):
+    cache = BlockCache(tmp_path, _block(0))
+    assert cache.load('features') is None
+    features = np.arange(12, dtype=np.float32).reshape(4, 3)
+    cache.save('features', features)
+    np.testing.assert_array_equal(BlockCache(tmp_path, _block(0)).load('features'), features)
+    arrays = [np.ones((2, 3)), np.zeros((0, 3)), np.full((1, 3), 2.0)]
+    cache.save_list('towers', arrays)
+    loaded = cache.load_list('towers')
+    assert [len(a) for a in loaded] == [2, 0, 1]
+
+def test_evicts_least_recently_used_blocks(tmp_path):
+    payload = np.zeros(1000, dtype=np.float64)
+    caches = [BlockCache(tmp_path, _block(seed), max_bytes=3 * payload.nbytes + 1024) for seed in range(3)]
+    for age, cache in enumerate(caches):
+        cache.save('features', payload)
+        os.utime(cache.block_dir, (age, age))
+    # 读取最早的块使其成为最近访问
+    assert caches[0].load('features') is not None
+    newest = BlockCache(tmp_path, _block(3), max_bytes=3 * payload.nbytes + 1024)
+    newest.save('features', payload)
+    remaining = {entry.name for entry in tmp_path.iterdir()}
+    assert caches[1].block_dir.name not in remaining
+    assert {caches[0].block_dir.name, caches[2].block_dir.name, newest.block_dir.name} <= remaining
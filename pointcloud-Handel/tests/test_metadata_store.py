@@ -0,0 +1,50 @@
+import json
+import pytest
+from metadata_store import ReconstructionStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReconstructionStore(tmp_path / "reconstructions.db")
+    yield store
+    store.close()
+
+def test_cursor_pages_through_equal_timestamps(store):
+    # 同一秒内的多条记录按id区分，翻页不重复也不遗漏
+    store.add_many([{"filename": f"r{i}.ply", "original_filename": "a.las" if i % 2 else "b.las",
+                     "timestamp": "20240101_120000" if i < 7 else "20240102_080000", "triangle_count": i}
+                    for i in range(10)])
+    seen, cursor = [], None
+    while True:
+        items, cursor = store.list(limit=3, cursor=cursor)
+        seen.extend(item["filename"] for item in items)
+        if cursor is None:
+            break
+    assert seen == [f"r{i}.ply" for i in (9, 8, 7, 6, 5, 4, 3, 2, 1, 0)]
+    items, cursor = store.list(limit=2, original_filename="a.las", until="20240101_120000")
+    assert [item["filename"] for item in items] == ["r5.ply", "r3.ply"]
+    items, cursor = store.list(limit=2, cursor=cursor, original_filename="a.las", until="20240101_120000")
+    assert [item["filename"] for item in items] == ["r1.ply"] and cursor is None
+    # 不在独立列中的字段保存在extra中
+    assert store.get("r4.ply")["triangle_count"] == 4
+    with pytest.raises(ValueError):
+        store.list(cursor="not-a-cursor")
+
+def test_import_json_runs_once(store, tmp_path):
+    json_path = tmp_path / "reconstruction_metadata.json"
+    legacy = [{"filename": "old.ply", "original_filename": "old.las", "timestamp": "20230101_000000",
+               "point_count": 10, "triangle_count": 5},
+              {"filename": "broken.ply"}]
+    json_path.write_text(json.dumps({"reconstructions": legacy}), encoding="utf-8")
+    assert store.import_json(json_path) == 1
+    assert not json_path.exists()
+    assert (tmp_path / "reconstruction_metadata.json.imported").exists()
+    assert store.get("old.ply")["triangle_count"] == 5
+    assert store.get("broken.ply") is None
+    # 已改名，再次调用不重复导入
+    assert store.import_json(json_path) == 0
+    items, _ = store.list()
+    assert [item["filename"] for item in items] == ["old.ply"]
+    # 记录保存在数据库文件中，重新打开后仍在
+    reopened = ReconstructionStore(tmp_path / "reconstructions.db")
+    assert reopened.get("old.ply")["point_count"] == 10
+    reopened.close()
@@ -0,0 +1,22 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from las_io import CLASS_GROUND
+from normal_orientation import orient_normals_voxel
+from synthetic_corridor import make_corridor
+
+def _estimate_normals(points, k=20):
+    # 邻域协方差最小特征值对应的特征向量，符号任意
+    _, indices = cKDTree(points).query(points, k=k)
+    neighbors = points[indices] - points[indices].mean(axis=1, keepdims=True)
+    return np.linalg.eigh(np.einsum('nki,nkj->nij', neighbors, neighbors))[1][:, :, 0]
+
+def test_voxel_ground_normals_point_up():
+    # 地面与塔身、树冠之间的接近垂直的体素边不传播符号，地面法向应全部朝上
+    points, truth = make_corridor(1000.0, seed=0)
+    rng = np.random.default_rng(0)
+    sample = np.sort(rng.choice(len(points), 100000, replace=False))
+    local = points[sample] - points[sample].mean(axis=0)
+    normals = _estimate_normals(local) * rng.choice([-1.0, 1.0], len(sample))[:, None]
+    oriented = orient_normals_voxel(local, normals)
+    assert np.mean(oriented[truth[sample] == CLASS_GROUND, 2] > 0) > 0.99
+    np.testing.assert_allclose(np.abs(oriented), np.abs(normals))
@@ -0,0 +1,28 @@
+import json
+import numpy as np
+from octree_tiles import METADATA_NAME, OctreeTileWriter, load_node
+from pointcloud_predictor import PointCloudHandler
+from synthetic_corridor import make_corridor, write_corridor_las
+
+def test_tiles_keep_millimetre_precision_with_large_offsets(tmp_path):
+    # Y≈4e6时float32大地坐标只有0.25米分辨率，瓦片应由局部坐标构建后再加回原点
+    import laspy
+    points, _ = make_corridor(200.0, seed=1)
+    points[:, 1] += 4e6
+    path = tmp_path / "corridor.las"
+    write_corridor_las(path, points)
+    handler = PointCloudHandler()
+    origin = handler.point_cloud_origin(str(path))
+    writer = OctreeTileWriter(tmp_path / "tiles", node_budget=2000, chunk_points=20000)
+    writer.build(lambda: handler.iter_point_chunks(str(path), chunk_size=10000, origin=origin), origin=origin)
+    with open(tmp_path / "tiles" / METADATA_NAME, encoding='utf-8') as f:
+        metadata = json.load(f)
+    tiled = np.concatenate([load_node(tmp_path / "tiles", name, metadata)[0] for name in metadata["nodes"]])
+    las = laspy.read(str(path))
+    world = np.c_[las.x, las.y, las.z]
+    assert len(tiled) == len(world) == metadata["point_count"]
+    # 两边按字典序排序后逐点比较
+    tiled = tiled[np.lexsort(tiled.T[::-1])]
+    world = world[np.lexsort(world.T[::-1])]
+    assert np.abs(tiled - world).max() < 1e-3
+    assert np.all(np.array(metadata["bounding_box"]["min"]) <= world.min(axis=0) + 1e-6)
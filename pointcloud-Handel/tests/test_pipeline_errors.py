@@ -0,0 +1,11 @@
+import pytest
+from pointcloud_predictor import PointCloudHandler
+
+@pytest.mark.parametrize("output_name", ["result.ply", "classified.las"])
+def test_extraction_raises_on_corrupt_input(tmp_path, output_name):
+    # 损坏的上传文件应让任务失败，而不是被当作"未检测到有效点"
+    path = tmp_path / "corrupt.las"
+    path.write_bytes(b"LASF" + b"\x00" * 50)
+    with pytest.raises(Exception):
+        PointCloudHandler().extract_powerlines_csf_pca_blockwise(str(path), str(tmp_path / output_name),
+                                                                 use_csf=False)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from las_io import iter_las_chunks, las_origin
+from pointcloud_predictor import PointCloudHandler
+from synthetic_corridor import make_corridor, write_corridor_las
+
+@pytest.fixture
+def corridor_las(tmp_path):
+    # Y≈4e6时float32大地坐标的分辨率为0.25米
+    points, _ = make_corridor(300.0, seed=0)
+    points[:, 1] += 1e6
+    path = tmp_path / "corridor.las"
+    write_corridor_las(path, points)
+    import laspy
+    las = laspy.read(str(path))
+    return path, np.c_[las.x, las.y, las.z]
+
+def test_local_chunks_keep_millimetre_precision(corridor_las):
+    path, world = corridor_las
+    origin = las_origin(path)
+    local = np.vstack([points for points, _, _ in iter_las_chunks(path, 100000, origin=origin)])
+    assert local.dtype == np.float32
+    assert np.abs(local + origin - world).max() < 1e-3
+
+def test_read_point_store_precision_and_block_views(corridor_las):
+    path, world = corridor_las
+    handler = PointCloudHandler()
+    store = handler.read_point_store(str(path))
+    index = store.column('index')
+    assert np.abs(store.xyz + store.origin - world[index]).max() < 1e-3
+    blocks = handler.split_point_store(store, block_length=100, with_index=True)
+    assert len(blocks) > 1
+    assert sum(len(block) for block, _ in blocks) == len(store)
+    for block, block_index in blocks:
+        assert np.shares_memory(block, store.xyz)
+        np.testing.assert_allclose(block + store.origin, world[block_index], atol=1e-3)
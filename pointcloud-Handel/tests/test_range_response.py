@@ -0,0 +1,92 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from range_response import parse_range, file_response
+
+DATA = bytes(range(256)) * 40  # 10240字节
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "mesh.ply"
+    path.write_bytes(DATA)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def get_file(request: Request, compress: bool = False):
+        return file_response(request, path, filename="mesh.ply", compress=compress)
+
+    return TestClient(app)
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-1023", (0, 1023)),
+    ("bytes=1024-", (1024, 10239)),
+    ("bytes=-500", (9740, 10239)),
+    ("bytes=-20000", (0, 10239)),
+    ("bytes=10000-20000", (10000, 10239)),
+    ("bytes = 5 - 9", (5, 9)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-1", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(DATA)) == expected
+
+@pytest.mark.parametrize("header", ["bytes=10240-", "bytes=20-10", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, len(DATA))
+
+def test_full_and_partial_responses(client):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["accept-ranges"] == "bytes"
+    response = client.get("/file", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+    assert response.content == DATA[100:200]
+    response = client.get("/file", headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.content == DATA[-10:]
+
+def test_unsatisfiable_range_returns_416(client):
+    response = client.get("/file", headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+def test_conditional_requests_return_304(client):
+    headers = client.get("/file").headers
+    response = client.get("/file", headers={"If-None-Match": headers["etag"]})
+    assert response.status_code == 304
+    assert response.content == b""
+    response = client.get("/file", headers={"If-Modified-Since": headers["last-modified"]})
+    assert response.status_code == 304
+    # If-None-Match优先于If-Modified-Since
+    response = client.get("/file", headers={"If-None-Match": '"other"', "If-Modified-Since": headers["last-modified"]})
+    assert response.status_code == 200
+
+def test_if_range(client):
+    headers = client.get("/file").headers
+    # 验证器一致时按Range返回206，不一致（文件已变化）时忽略Range返回完整文件
+    for validator in (headers["etag"], headers["last-modified"]):
+        response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": validator})
+        assert response.status_code == 206
+        assert response.content == DATA[:10]
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+def test_gzip_is_not_used_for_ranges(client):
+    response = client.get("/file?compress=true", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    # httpx按content-encoding自动解压
+    assert response.content == DATA
+    response = client.get("/file?compress=true", headers={"Accept-Encoding": "gzip", "Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert response.content == DATA[:10]
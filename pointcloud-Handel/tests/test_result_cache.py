@@ -0,0 +1,22 @@
+import os
+from result_cache import ResultCache, make_cache_key
+
+def test_formats_have_separate_keys_and_share_the_size_limit(tmp_path):
+    # 结果格式是缓存键参数的一部分，不同格式的条目各自命中，按总大小一起淘汰
+    evicted = []
+    cache = ResultCache(tmp_path / "cache", 150, suffix=(".ply", ".las", ".laz"), on_evict=evicted.append)
+    ply_key = make_cache_key("digest", {"output_format": "ply"})
+    las_key = make_cache_key("digest", {"output_format": "las"})
+    assert ply_key != las_key
+    for key, suffix in ((ply_key, ".ply"), (las_key, ".las")):
+        src = tmp_path / f"result{suffix}"
+        src.write_bytes(b"x" * 100)
+        path = cache.put(key, src, suffix)
+        assert path.name == f"{key}{suffix}"
+        if suffix == ".ply":
+            # 把先放入的条目标记为更早访问
+            os.utime(path, (1, 1))
+    assert cache.get(las_key, ".las") is not None
+    assert cache.get(las_key, ".ply") is None
+    assert cache.get(ply_key) is None
+    assert evicted == [ply_key]
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from spatial_index import SpatialIndex, remove_outliers_with_index
+
+def _points_with_duplicates(seed=0):
+    # 平面上的随机点 + 一簇完全重合的重复点（平均近邻距离为0）+ 几个远离的离群点
+    rng = np.random.default_rng(seed)
+    points = np.column_stack([rng.uniform(0, 50, (3000, 2)), rng.normal(0, 0.05, 3000)])
+    duplicates = np.repeat(points[:1], 40, axis=0)
+    outliers = rng.uniform(200, 300, (5, 3))
+    return np.vstack([points, duplicates, outliers])
+
+def _open3d_rule(points, nb_neighbors=20, std_ratio=2.0):
+    # Open3D PointCloud::RemoveStatisticalOutliers 的逐行转写
+    from scipy.spatial import cKDTree
+    dists, _ = cKDTree(points).query(points, k=nb_neighbors)
+    avg = dists.mean(axis=1)
+    mean = sum(d for d in avg if d > 0) / len(avg)
+    sq_sum = sum((d - mean) ** 2 for d in avg if d > 0)
+    threshold = mean + std_ratio * np.sqrt(sq_sum / (len(avg) - 1))
+    return np.array([i for i, d in enumerate(avg) if d > 0 and d < threshold])
+
+def test_duplicates_follow_open3d_rule():
+    points = _points_with_duplicates()
+    ind = remove_outliers_with_index(SpatialIndex(points))
+    np.testing.assert_array_equal(ind, _open3d_rule(points))
+    avg = SpatialIndex(points).mean_knn_distance(20)
+    assert not np.isin(np.flatnonzero(avg == 0), ind).any()
+    assert not np.isin(np.arange(len(points) - 5, len(points)), ind).any()
+
+def test_matches_open3d():
+    try:
+        import open3d as o3d
+    except ImportError:
+        pytest.skip("open3d不可用")
+    points = _points_with_duplicates(seed=1)
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points)
+    _, expected = pcd.remove_statistical_outlier(nb_neighbors=20, std_ratio=2.0)
+    np.testing.assert_array_equal(remove_outliers_with_index(SpatialIndex(points)), np.asarray(expected))
@@ -0,0 +1,27 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from spatial_tiles import MortonTiling
+
+def _sorted_rows(points):
+    return points[np.lexsort(points.T)]
+
+def test_diagonal_corridor_halo_is_exact_and_small():
+    # 斜向走廊上Morton区间的包围盒远大于核心点，重叠点应只取核心点overlap范围内的点
+    rng = np.random.default_rng(0)
+    n = 200000
+    along = rng.uniform(0, 1000, n)
+    across = rng.uniform(-15, 15, n)
+    points = np.c_[(along - across) / np.sqrt(2), (along + across) / np.sqrt(2), rng.uniform(0, 40, n)]
+    points += [5e5, 4e6, 0]
+    tiling = MortonTiling(points, 20000)
+    blocks = tiling.tiles(points, overlap=1.0)
+    tile_ids = tiling.tile_of(points)
+    assert sum(len(block) for block in blocks) < n * 1.02
+    for t, block in enumerate(blocks):
+        core = points[tile_ids == t]
+        assert np.array_equal(_sorted_rows(block[:len(core)]), _sorted_rows(core))
+        distances, _ = cKDTree(core).query(points[tile_ids != t], p=np.inf, distance_upper_bound=1.0 + 1e-9)
+        expected = points[tile_ids != t][np.isfinite(distances)]
+        halo = block[len(core):]
+        assert len(halo) == len(expected)
+        assert np.array_equal(_sorted_rows(halo), _sorted_rows(expected))
@@ -0,0 +1,30 @@
+import numpy as np
+from las_io import CLASS_LOW_NOISE
+from pointcloud_predictor import PointCloudHandler
+from synthetic_corridor import make_corridor, write_corridor_las
+
+def test_spill_matches_in_memory_with_large_offsets(tmp_path):
+    # Y≈4e6时float32大地坐标只有0.25米分辨率，两条路径都应在局部坐标下处理
+    import laspy
+    points, _ = make_corridor(400.0, seed=0)
+    points[:, 1] += 1e6
+    path = tmp_path / "corridor.las"
+    write_corridor_las(path, points)
+    handler = PointCloudHandler()
+    block_paths, origin = handler.split_pointcloud_to_disk(str(path), str(tmp_path / "blocks"), block_length=100,
+                                                           with_index=True)
+    las = laspy.read(str(path))
+    world = np.c_[las.x, las.y, las.z]
+    for block_path in block_paths:
+        block = handler.load_block(block_path)
+        assert np.abs(block + origin - world[handler.load_block_index(block_path)]).max() < 1e-3
+    outputs = {}
+    for name, spill_dir in (("memory", None), ("spill", str(tmp_path / "spill"))):
+        out_path = tmp_path / f"{name}.las"
+        handler.extract_powerlines_csf_pca_blockwise(str(path), str(out_path), use_csf=False, block_length=100,
+                                                     spill_dir=spill_dir)
+        outputs[name] = np.asarray(laspy.read(str(out_path)).classification)
+    # 离群点按整幅/按块去除，其余点的分类应一致
+    memory, spill = outputs["memory"], outputs["spill"]
+    kept = (memory != CLASS_LOW_NOISE) & (spill != CLASS_LOW_NOISE)
+    assert np.mean(memory[kept] == spill[kept]) > 0.999
@@ -0,0 +1,17 @@
+import numpy as np
+from benchmark import cluster_accuracy
+from las_io import CLASS_GROUND, CLASS_TOWER
+from pointcloud_predictor import PointCloudHandler
+from synthetic_corridor import make_corridor
+
+def test_grid_towers_on_synthetic_corridor():
+    # 1000米走廊按250米档距有4基塔，两侧植被高4~14米，不应被当作电力塔
+    points, truth = make_corridor(1000.0, seed=0)
+    non_ground = np.flatnonzero(truth != CLASS_GROUND)
+    clusters = PointCloudHandler().fit_towers_grid(points[non_ground].astype(np.float32), return_indices=True)
+    accuracy = cluster_accuracy(truth[non_ground], clusters)
+    assert accuracy["towers"] == 4
+    assert accuracy["precision"] > 0.95
+    assert accuracy["recall"] > 0.9
+    for cluster in clusters:
+        assert (truth[non_ground][cluster] == CLASS_TOWER).mean() > 0.9